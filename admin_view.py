@@ -0,0 +1,130 @@
+import io
+from typing import Optional, Dict, Any, Callable, Iterable
+
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from analytics import bucket_counts, trend_bucket
+from pivot import Pivot
+from report import EXPORT_FORMATS, report_cache
+from schema import get_kst_now
+from timing import recorder
+
+# --- 관리자 화면 전용 도우미 (리포트 파일 지연 생성 / 그래프) ---
+# app.py는 관리자 화면에 들어갈 때 이 모듈을 처음 불러온다 → 키오스크 화면은 plotly / xlsxwriter를 읽지 않고,
+# 캐시 함수 정의도 재실행마다 다시 만들지 않는다.
+
+
+def _report_key(fmt: str, meta: Dict[str, Any], data_version: Any):
+    return (fmt, data_version, tuple(meta.items()))
+
+
+def lazy_report(
+    fmt: str,
+    chunks: Callable[[], Iterable[pd.DataFrame]],
+    meta: Dict[str, Any],
+    data_version: Any,
+    aggregates: Optional[Callable[[], Dict[str, pd.Series]]] = None,
+):
+    # 다운로드 버튼을 눌렀을 때만 생성 (재실행마다 파일을 만들지 않는다)
+    # 같은 형식 + 같은 데이터 버전 + 같은 필터면 캐시된 파일을 그대로 돌려준다(추출시각은 최초 생성 시각).
+    # chunks: 원본 로그 조각을 내주는 함수 → 스트리밍으로 기록해 메모리 사용량이 행 수와 무관
+    # aggregates: 집계 시트용 카운트를 내주는 함수(사전 집계 테이블)
+    write = EXPORT_FORMATS[fmt][0]
+
+    def build() -> bytes:
+        full_meta = dict(meta)
+        full_meta["추출시각(KST)"] = get_kst_now().strftime("%Y-%m-%d %H:%M:%S")
+        output = io.BytesIO()
+        with recorder.event(f"{fmt}_report", target=meta.get("대상")) as ev:
+            ev["rows"] = write(
+                chunks(),
+                output,
+                meta=full_meta,
+                aggregates=aggregates() if aggregates else None,
+            )
+        return output.getvalue()
+
+    key = _report_key(fmt, meta, data_version)
+    return lambda: report_cache.get_or_build(key, build)
+
+
+def report_caption(fmt: str, meta: Dict[str, Any], data_version: Any) -> str:
+    # 같은 데이터/필터로 마지막에 만든 시간과 크기 (아직 안 만들었으면 안내만)
+    info = report_cache.last_build(_report_key(fmt, meta, data_version))
+    if info is None:
+        return "누르면 생성"
+    seconds, size = info
+    return f"생성 {seconds:.1f}s · {size / 1024:,.0f}KB"
+
+
+def export_buttons(
+    key_prefix: str,
+    file_stem: str,
+    chunks: Callable[[], Iterable[pd.DataFrame]],
+    meta: Dict[str, Any],
+    data_version: Any,
+    aggregates: Optional[Callable[[], Dict[str, pd.Series]]] = None,
+) -> None:
+    # 엑셀 외 분석용 형식 (CSV 묶음 / Parquet / Arrow): 같은 원본 행 + 같은 집계
+    formats = [fmt for fmt in EXPORT_FORMATS if fmt != "xlsx"]
+    for col, fmt in zip(st.columns(len(formats)), formats):
+        _, ext, mime, label = EXPORT_FORMATS[fmt]
+        with col:
+            st.download_button(
+                f"📥 {label}",
+                data=lazy_report(fmt, chunks, meta, data_version, aggregates),
+                file_name=f"{file_stem}.{ext}",
+                mime=mime,
+                use_container_width=True,
+                key=f"{key_prefix}_{fmt}",
+                on_click="ignore",
+            )
+            st.caption(report_caption(fmt, meta, data_version))
+
+
+# 그래프는 미리 센 Series로 만들고 (데이터 버전, 필터, 기간)별로 보관한다 → 조회 기간을 바꿔도 다시 만들지 않는다
+# _로 시작하는 인자(Series)는 캐시 키에서 빠지므로 키가 되는 값을 함께 넘긴다
+TREND_AXES = {
+    # 구간: (x축 제목, 눈금 간격, 눈금 형식, 마우스 오버 형식)
+    "day": ("날짜", 86_400_000, "%-m/%-d", "|%Y-%m-%d"),
+    "week": ("주(시작일)", 7 * 86_400_000, "%-m/%-d", "|%Y-%m-%d 주"),
+    "month": ("월", "M1", "%Y/%m", "|%Y-%m"),
+}
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def trend_figure(_per_day: pd.Series, data_version: Any, filter_key: tuple, chart_start, chart_end):
+    chart_days = _per_day[
+        (_per_day.index >= pd.Timestamp(chart_start)) & (_per_day.index <= pd.Timestamp(chart_end))
+    ]
+    if chart_days.empty:
+        return None
+    # 35일 이상은 주 단위, 120일 이상은 월 단위로 합쳐서 보낸다 (여러 해 기간도 점 수십 개)
+    bucket = trend_bucket((chart_end - chart_start).days + 1)
+    title, dtick, tickformat, hover = TREND_AXES[bucket]
+    trend = bucket_counts(chart_days, bucket).rename_axis("날짜").reset_index(name="방문자 수")
+    fig = px.line(trend, x="날짜", y="방문자 수", markers=True, hover_data={"날짜": hover})
+    fig.update_xaxes(title_text=title, dtick=dtick, tickformat=tickformat)
+    return fig
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def share_pie(_counts: pd.Series, data_version: Any, filter_key: tuple, title: str):
+    return px.pie(names=_counts.index, values=_counts.values, title=title, hole=0.4)
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def heatmap_figure(_pivot: Pivot, data_version: Any, filter_key: tuple, title: str):
+    # 2차원 교차 집계 → 히트맵 (행 = 첫 차원, 열 = 둘째 차원)
+    frame = _pivot.frame()
+    fig = px.imshow(
+        frame,
+        labels={"x": _pivot.dims[1], "y": _pivot.dims[0], "color": "방문자 수"},
+        title=title,
+        aspect="auto",
+        color_continuous_scale="Blues",
+    )
+    fig.update_xaxes(dtick=1, type="category")
+    return fig
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype
+
+from schema import WEEKDAYS
+
+# --- 파생 컬럼 계산 (리포트 요약 / 일자별 추이 / 엑셀 내보내기 공용) ---
+# 일시는 한 번만 파싱하고, 날짜에만 의존하는 문자열 컬럼(월-일, 연-주, 주(기간) 등)은
+# 고유 날짜에 대해서만 계산한 뒤 코드 배열로 펼친다(Categorical). 행 단위 apply/strftime 없음.
+FEATURE_COLUMNS = [
+    "날짜", "요일", "연도", "월", "일자", "시간",
+    "월-일", "연월", "ISO연도", "ISO주차", "연-주", "주(기간)",
+]
+
+
+def date_features(days: pd.DatetimeIndex) -> pd.DataFrame:
+    # 날짜(자정) 목록 → 날짜 단위 파생 컬럼. days는 보통 고유 날짜라 짧다.
+    days = pd.DatetimeIndex(days)
+    iso = days.isocalendar()
+    iso_year = iso["year"].to_numpy(dtype="int64")
+    iso_week = iso["week"].to_numpy(dtype="int64")
+    # 문자열 조각은 모두 astype(str)로 맞춘다: 날짜가 없으면 strftime이 object Index를 돌려주고,
+    # pandas 3에서는 str + object 더하기가 TypeError다
+    year_week = pd.Index(iso_year).astype(str) + "-W" + pd.Index(iso_week).astype(str).str.zfill(2)
+    # ISO 주의 월요일 ~ 일요일
+    week_start = days - pd.to_timedelta(days.weekday, unit="D")
+    week_end = week_start + pd.Timedelta(days=6)
+    week_label = (
+        year_week
+        + " ("
+        + week_start.strftime("%Y-%m-%d").astype(str)
+        + "~"
+        + week_end.strftime("%Y-%m-%d").astype(str)
+        + ")"
+    )
+    return pd.DataFrame(
+        {
+            "월-일": days.strftime("%m-%d"),
+            "연월": days.strftime("%Y-%m"),
+            "ISO연도": iso_year,
+            "ISO주차": iso_week,
+            "연-주": year_week,
+            "주(기간)": week_label,
+        },
+        index=days,
+    )
+
+
+def _take(values: np.ndarray, codes: np.ndarray, fill=None) -> np.ndarray:
+    # codes == -1(일시 파싱 실패)은 fill로
+    out = np.append(values.astype(object), fill)
+    return out[codes]
+
+
+def _take_categorical(values: np.ndarray, codes: np.ndarray) -> pd.Categorical:
+    # 날짜별 문자열 → 행별 Categorical (문자열은 카테고리로 한 번씩만 저장). 카테고리는 사전순.
+    sub_codes, categories = pd.factorize(values, sort=True)
+    # 일시가 모두 파싱 실패면 날짜가 하나도 없다 → 유효한 코드만 골라 옮긴다
+    row_codes = np.full(len(codes), -1, dtype=np.int64)
+    valid = codes >= 0
+    row_codes[valid] = sub_codes[codes[valid]]
+    return pd.Categorical.from_codes(row_codes, categories=categories)
+
+
+def derive_features(df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
+    # 일시 파싱 + FEATURE_COLUMNS 추가. inplace=True면 새로 읽은 프레임에 바로 붙인다(복사 없음).
+    out = df if inplace else df.copy()
+    ts = out["일시"]
+    if not is_datetime64_any_dtype(ts):
+        ts = pd.to_datetime(ts, errors="coerce")
+        out["일시"] = ts
+
+    days = ts.dt.normalize()
+    codes, uniq = pd.factorize(days)
+    feats = date_features(pd.DatetimeIndex(uniq))
+
+    out["날짜"] = days
+    out["요일"] = pd.Categorical.from_codes(
+        np.where(codes >= 0, ts.dt.weekday.fillna(-1).astype(int), -1), categories=WEEKDAYS
+    )
+    # 작은 정수형(nullable: 일시 파싱 실패 행은 <NA>)
+    out["연도"] = ts.dt.year.astype("Int16")
+    out["월"] = ts.dt.month.astype("Int8")
+    out["일자"] = ts.dt.day.astype("Int8")
+    out["시간"] = ts.dt.hour.astype("Int8")
+    for col in ("월-일", "연월", "연-주", "주(기간)"):
+        out[col] = _take_categorical(feats[col].to_numpy(), codes)
+    for col, dtype in (("ISO연도", "Int16"), ("ISO주차", "Int8")):
+        out[col] = pd.array(_take(feats[col].to_numpy(), codes, fill=pd.NA), dtype=dtype)
+    return out
+
+
+def has_features(df: pd.DataFrame) -> bool:
+    return all(c in df.columns for c in FEATURE_COLUMNS)
+
+
+# --- 일별 방문자 수(Series, index=날짜)에서 만드는 요약 표 ---
+def monthly_table(per_day: pd.Series) -> pd.DataFrame:
+    feats = date_features(per_day.index)
+    out = per_day.groupby(feats["연월"].to_numpy()).sum().reset_index()
+    out.columns = ["월", "방문자 수"]
+    return out
+
+
+def weekly_table(per_day: pd.Series) -> pd.DataFrame:
+    feats = date_features(per_day.index)
+    out = (
+        per_day.groupby([feats["ISO연도"].to_numpy(), feats["ISO주차"].to_numpy(), feats["주(기간)"].to_numpy()])
+        .sum()
+        .rename_axis(["ISO연도", "ISO주차", "주(기간)"])
+        .reset_index(name="방문자 수")
+        .sort_values(["ISO연도", "ISO주차"])
+    )
+    return out[["주(기간)", "방문자 수"]]
+
+
+# --- 일자별 추이 그래프: 기간이 길면 주/월 단위로 합쳐 점 수를 줄인다 ---
+# 기준은 그래프 눈금 간격을 바꾸던 35일 / 120일 그대로
+WEEKLY_TREND_DAYS = 35
+MONTHLY_TREND_DAYS = 120
+
+
+def trend_bucket(total_days: int) -> str:
+    if total_days >= MONTHLY_TREND_DAYS:
+        return "month"
+    if total_days >= WEEKLY_TREND_DAYS:
+        return "week"
+    return "day"
+
+
+def bucket_counts(per_day: pd.Series, bucket: str) -> pd.Series:
+    # 주는 월요일 시작(ISO 주와 같음), 월은 1일 시작. index = 구간 시작일
+    if bucket == "day" or per_day.empty:
+        return per_day
+    rule = "MS" if bucket == "month" else "W-MON"
+    return per_day.resample(rule, label="left", closed="left").sum()
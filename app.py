@@ -1,21 +1,21 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-from datetime import datetime, timedelta, date
+from datetime import datetime, timedelta
+import functools
 import os
-import io
-import time
+import queue
 import streamlit.components.v1 as components
-from typing import Optional, Dict, Any
+from typing import Dict, Any
 
-# --- 1. 기본 설정 및 데이터 로드 ---
-DB_FILE = "visitor_log.csv"
-AGE_GROUPS = ["7세 이하", "초등", "중등", "고등", "만 20세~24세", "만 25세 이상"]
-PURPOSES = ["놀이", "휴식", "식사", "친목", "기타"]
+from schema import AGE_GROUPS, COLUMNS, GENDERS, PURPOSES, SITE_COLUMN, WEEKDAYS, get_kst_now
+from storage import CubeUpdateError, diff_frames, get_storage
+from write_queue import get_write_queue
+from timing import recorder
 
-if not os.path.exists(DB_FILE):
-    df_init = pd.DataFrame(columns=["일시", "요일", "월", "성별", "연령대", "이용목록"])
-    df_init.to_csv(DB_FILE, index=False, encoding="utf-8-sig")
+# --- 1. 기본 설정 및 데이터 로드 ---
+store = get_storage()
+# 체크인은 쓰기 큐로 (기록 스레드 하나가 모아서 한 번에 기록)
+write_queue = get_write_queue(store)
 
 # 세션 기본값
 if "is_admin" not in st.session_state:
@@ -25,6 +25,10 @@ if "is_admin" not in st.session_state:
     else:
         st.session_state.is_admin = False
 
+# 키오스크 모드(?kiosk=true): 선택 화면은 브라우저 컴포넌트가 처리하고 방문 1건당 한 번만 제출
+if "kiosk_mode" not in st.session_state:
+    st.session_state.kiosk_mode = st.query_params.get("kiosk") == "true"
+
 if "page" not in st.session_state:
     st.session_state.page = "gender"
 if "temp_data" not in st.session_state:
@@ -32,210 +36,53 @@ if "temp_data" not in st.session_state:
 
 st.set_page_config(page_title="라미그라운드 방명록", layout="wide")
 
-# --- 2. CSS (기본 디자인) ---
-st.markdown(
-    """
-    <style>
-    [data-testid="stHorizontalBlock"] { gap: 20px !important; }
-    .center-text { text-align: center; padding: 20px; }
-    .welcome-title { font-size: 48px; font-weight: 900; margin-bottom: 10px; }
-    .sub-title { font-size: 26px; color: #444; margin-bottom: 50px; font-weight: 600; }
-    </style>
-    """,
-    unsafe_allow_html=True,
-)
-
-# --- 2-1. 버튼 사이즈 강제 고정 (JS: Streamlit DOM 변화에도 유지) ---
-def inject_button_sizer():
-    kiosk_texts = ["남성", "여성"] + AGE_GROUPS + PURPOSES
-    kiosk_js_array = "[" + ",".join([f'"{t}"' for t in kiosk_texts]) + "]"
-
-    admin_texts = [
-        "💾 변경사항 최종 저장",
-        "📥 전체 데이터 엑셀(원본+집계)",
-        "📥 필터링 데이터 엑셀(원본+집계+필터정보)",
-        "로그인",
-        "로그아웃",
-    ]
-    admin_js_array = "[" + ",".join([f'"{t}"' for t in admin_texts]) + "]"
-
-    page = st.session_state.get("page", "gender")
-    is_admin = bool(st.session_state.get("is_admin", False))
-    is_admin_page_js = "true" if (is_admin and page == "admin") else "false"
-
-    components.html(
-        f"""
-        <script>
-        (function() {{
-            const kioskTexts = {kiosk_js_array};
-            const adminTexts = {admin_js_array};
-            const isAdminPage = {is_admin_page_js};
-
-            function applyStyles() {{
-                const main = window.parent.document.querySelector('[data-testid="stMain"]');
-                if (!main) return;
-
-                const buttons = main.querySelectorAll('button');
-                buttons.forEach(btn => {{
-                    const t = (btn.innerText || "").trim();
-
-                    // reset (잔상 방지)
-                    btn.style.width = "";
-                    btn.style.height = "";
-                    btn.style.minWidth = "";
-                    btn.style.minHeight = "";
-                    btn.style.maxWidth = "";
-                    btn.style.maxHeight = "";
-                    btn.style.fontSize = "";
-                    btn.style.fontWeight = "";
-                    btn.style.borderRadius = "";
-                    btn.style.display = "";
-                    btn.style.alignItems = "";
-                    btn.style.justifyContent = "";
-                    btn.style.boxShadow = "";
-                    btn.style.backgroundColor = "";
-                    btn.style.color = "";
-                    btn.style.border = "";
-                    btn.style.marginTop = "";
-
-                    if (isAdminPage) {{
-                        if (adminTexts.includes(t)) {{
-                            btn.style.height = "50px";
-                            btn.style.fontSize = "16px";
-                            btn.style.fontWeight = "600";
-                            btn.style.borderRadius = "8px";
-                        }}
-                        return;
-                    }}
-
-                    // kiosk big buttons
-                    if (kioskTexts.includes(t)) {{
-                        btn.style.width = "180px";
-                        btn.style.height = "180px";
-                        btn.style.minWidth = "180px";
-                        btn.style.minHeight = "180px";
-                        btn.style.maxWidth = "180px";
-                        btn.style.maxHeight = "180px";
-                        btn.style.fontSize = "24px";
-                        btn.style.fontWeight = "800";
-                        btn.style.borderRadius = "25px";
-                        btn.style.display = "flex";
-                        btn.style.alignItems = "center";
-                        btn.style.justifyContent = "center";
-                        btn.style.boxShadow = "0 6px 14px rgba(0,0,0,0.15)";
-                    }}
-
-                    // back button: ✅ 노란색 제거 + ✅ 세로 간격 30px
-                    if (t === "뒤로 가기") {{
-                        btn.style.width = "180px";
-                        btn.style.height = "60px";
-                        btn.style.minWidth = "180px";
-                        btn.style.minHeight = "60px";
-                        btn.style.maxWidth = "180px";
-                        btn.style.maxHeight = "60px";
-                        btn.style.fontSize = "20px";
-                        btn.style.fontWeight = "800";
-                        btn.style.borderRadius = "12px";
-                        btn.style.marginTop = "30px";
-                        // 색상/테두리 강제 없음(기본 Streamlit 테마 적용)
-                    }}
-                }});
-            }}
-
-            applyStyles();
-            setTimeout(applyStyles, 50);
-            setTimeout(applyStyles, 200);
-            setTimeout(applyStyles, 500);
-
-            const root = window.parent.document.body;
-            if (root && !window.parent.__kioskButtonObserver) {{
-                const obs = new MutationObserver(() => applyStyles());
-                obs.observe(root, {{ childList: true, subtree: true }});
-                window.parent.__kioskButtonObserver = obs;
-            }}
-        }})();
-        </script>
-        """,
-        height=0,
-        width=0,
-    )
+# 재실행 구간 계측 (timing.py). 진단 패널에서 프로파일을 요청했으면 이번 재실행 전체를 cProfile로 잰다
+if st.session_state.is_admin and st.session_state.page == "admin":
+    current_page = "admin"
+elif st.session_state.kiosk_mode:
+    current_page = "kiosk"
+else:
+    current_page = st.session_state.page
+timer = recorder.start(st.session_state, current_page, profile=st.session_state.pop("profile_next", False))
 
-inject_button_sizer()
+# --- 2. CSS (app.css: 기본 디자인 + 위젯 key 기준 버튼 스타일) ---
+# 파일은 프로세스당 한 번만 읽고, 재실행마다 같은 <style> 하나만 보낸다 (iframe/JS 없음)
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# --- 3. 유틸리티 함수 ---
-def get_kst_now() -> datetime:
-    return datetime.utcnow() + timedelta(hours=9)
+@st.cache_resource
+def load_stylesheet() -> str:
+    with open(os.path.join(APP_DIR, "app.css"), encoding="utf-8") as f:
+        return f.read()
+
+st.markdown(f"<style>\n{load_stylesheet()}\n</style>", unsafe_allow_html=True)
 
+# --- 3. 유틸리티 함수 ---
 def get_korean_weekday(dt: datetime) -> str:
-    days = ["월", "화", "수", "목", "금", "토", "일"]
-    return days[dt.weekday()]
-
-def iso_week_date_range(year: int, week: int) -> tuple[date, date]:
-    start = date.fromisocalendar(year, week, 1)
-    end = date.fromisocalendar(year, week, 7)
-    return start, end
-
-def create_excel_report(df: pd.DataFrame, meta: Optional[Dict[str, Any]] = None) -> bytes:
-    output = io.BytesIO()
-    temp_df = df.copy()
-
-    if temp_df.empty:
-        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-            pd.DataFrame().to_excel(writer, index=False, sheet_name="원본데이터")
-            if meta:
-                pd.DataFrame([meta]).to_excel(writer, index=False, sheet_name="필터정보")
-        return output.getvalue()
-
-    temp_df["일시"] = pd.to_datetime(temp_df["일시"], errors="coerce")
-
-    temp_df["연도"] = temp_df["일시"].dt.year
-    temp_df["월"] = temp_df["일시"].dt.month
-    temp_df["일자"] = temp_df["일시"].dt.day
-    temp_df["시간"] = temp_df["일시"].dt.hour
-    temp_df["월-일"] = temp_df["일시"].dt.strftime("%m-%d")
-
-    iso = temp_df["일시"].dt.isocalendar()
-    temp_df["ISO연도"] = iso.year.astype(int)
-    temp_df["ISO주차"] = iso.week.astype(int)
-    temp_df["연-주"] = temp_df["ISO연도"].astype(str) + "-W" + temp_df["ISO주차"].astype(str).str.zfill(2)
-
-    daily = temp_df["월-일"].value_counts().sort_index().reset_index()
-    daily.columns = ["월-일", "방문자 수"]
-
-    monthly = temp_df["일시"].dt.to_period("M").astype(str).value_counts().sort_index().reset_index()
-    monthly.columns = ["월", "방문자 수"]
-
-    weekly = temp_df["연-주"].value_counts().sort_index().reset_index()
-    weekly.columns = ["연-주", "방문자 수"]
-
-    purpose = temp_df["이용목록"].value_counts().reset_index()
-    purpose.columns = ["이용목록", "방문자 수"]
-
-    gender = temp_df["성별"].value_counts().reset_index()
-    gender.columns = ["성별", "방문자 수"]
-
-    age = temp_df["연령대"].value_counts().reset_index()
-    age.columns = ["연령대", "방문자 수"]
-
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        export_cols = [
-            "일시", "요일",
-            "연도", "월", "일자", "시간",
-            "월-일", "ISO연도", "ISO주차", "연-주",
-            "성별", "연령대", "이용목록",
-        ]
-        existing_cols = [c for c in export_cols if c in temp_df.columns]
-        temp_df[existing_cols].to_excel(writer, index=False, sheet_name="원본데이터")
-        daily.to_excel(writer, index=False, sheet_name="일자집계(월-일)")
-        monthly.to_excel(writer, index=False, sheet_name="월별집계")
-        weekly.to_excel(writer, index=False, sheet_name="주별집계(ISO)")
-        purpose.to_excel(writer, index=False, sheet_name="목적집계")
-        gender.to_excel(writer, index=False, sheet_name="성별집계")
-        age.to_excel(writer, index=False, sheet_name="연령집계")
-        if meta:
-            pd.DataFrame([meta]).to_excel(writer, index=False, sheet_name="필터정보")
-
-    return output.getvalue()
+    return WEEKDAYS[dt.weekday()]
+
+def make_visit_row(gender: str, age: str, purpose: str) -> Dict[str, Any]:
+    now = get_kst_now()
+    return {
+        "일시": now.strftime("%Y-%m-%d %H:%M:%S"),
+        "요일": get_korean_weekday(now),
+        "월": now.month,
+        "성별": gender,
+        "연령대": age,
+        "이용목록": purpose,
+    }
+
+def record_visit(row: Dict[str, Any]) -> None:
+    # 큐에 넣고 바로 돌아간다. 큐가 가득 찬 채로 대기 시간을 넘기면 직접 기록해서 잃지 않는다
+    with recorder.event("checkin_submit", rows=1, queued=True) as ev:
+        try:
+            write_queue.submit(row)
+        except queue.Full:
+            ev["queued"] = False
+            try:
+                store.append(row)
+            except CubeUpdateError as e:
+                # 로그에는 기록됐다 (집계 테이블은 관리자 화면 검증이 맞춘다) → 체크인은 성공으로 처리
+                ev["cube_error"] = str(e)
 
 # --- 4. 사이드바(관리자 로그인/로그아웃) ---
 with st.sidebar:
@@ -245,7 +92,7 @@ with st.sidebar:
         if st.checkbox("관리자 모드 접속"):
             admin_id = st.text_input("아이디")
             admin_pw = st.text_input("비밀번호", type="password")
-            if st.button("로그인"):
+            if st.button("로그인", key="login"):
                 if admin_id == "jgyouth" and admin_pw == "youth2250!!":
                     st.session_state.is_admin = True
                     st.session_state.page = "admin"
@@ -255,71 +102,287 @@ with st.sidebar:
                     st.error("정보가 틀립니다.")
     else:
         st.success("로그인 성공")
-        if st.button("로그아웃"):
+        if st.button("로그아웃", key="logout"):
             st.session_state.is_admin = False
             st.session_state.page = "gender"
             st.query_params.clear()
             st.rerun()
 
+        # 체크인 저널 → 원본 로그 정리(compaction)
+        pending_bytes = store.pending_size()
+        st.caption(f"미정리 체크인 저널: {pending_bytes:,} bytes")
+        if st.button("🧹 저널 정리", disabled=pending_bytes == 0):
+            moved = store.compact()
+            st.success(f"{moved:,}건을 원본 로그로 옮겼습니다.")
+
+timer.lap("setup")
+
 # =========================
 # [A] 관리자 페이지
 # =========================
 if st.session_state.is_admin and st.session_state.page == "admin":
-    st.title("📊 데이터 통합 분석 센터")
+    # 관리자 전용 모듈(plotly, xlsxwriter, 로그 캐시/리포트/그래프)은 여기서 처음 불러온다
+    from admin_view import export_buttons, heatmap_figure, lazy_report, report_caption, share_pie, trend_figure
+    from analytics import monthly_table, weekly_table
+    from cube import counts_by, cube_matches, daily_counts, excel_aggregates
+    from live import REFRESH_SECONDS, live_counter
+    from log_cache import log_cache
+    from pivot import PIVOT_DIMS, pivot_counts
+    from report import iter_frame_chunks, report_cache
 
-    df = pd.read_csv(DB_FILE)
-    if not df.empty:
-        df["일시"] = pd.to_datetime(df["일시"], errors="coerce")
+    st.title("📊 데이터 통합 분석 센터")
 
-    if df.empty:
-        st.info("데이터가 없습니다.")
-    else:
-        # ============================================================
-        # ✅ 1) 데이터 편집/삭제 (상세 필터링과 무관하게 전체 데이터)
-        # ============================================================
+    def admin_data(t):
+        # 프로세스 공유 캐시: 바뀐 게 없으면 재파싱 없이, 체크인만 늘었으면 그 부분만 읽는다
+        df, data_version = log_cache.load_with_version(store)
+        t.lap("load_log", rows=len(df))
+        # 사전 집계 테이블이 로그와 어긋났으면(편집/외부 수정/이전 버전 데이터) 다시 만든다
+        # 데이터 버전이 바뀔 때만, 합계가 아니라 칸마다 확인한다 (방금 읽은 로그로 다시 만든다)
+        if st.session_state.get("cube_checked_version") != data_version:
+            if not cube_matches(store.cube(), df):
+                store.rebuild_cube(df)
+            st.session_state.cube_checked_version = data_version
+        t.lap("cube_check")
+        return df, data_version
+
+    def admin_fragment(name, reload=False):
+        # 섹션 하나 = 조각(st.fragment) 하나: 안의 위젯을 바꾸면 그 섹션만 다시 돈다(페이지 전체 재실행 없음).
+        # 전체 재실행 때는 이번 재실행 기록에 lap을 이어 찍고, 조각만 돌 때는 "admin/<name>" 기록으로 따로 남는다.
+        # reload: 조각만 돌 때 (df, data_version) 인자 대신 공유 캐시에서 최신 로그를 다시 받는다
+        def decorate(fn):
+            @functools.wraps(fn)
+            def run(*args):
+                with recorder.fragment(st.session_state, f"admin/{name}") as t:
+                    # t가 전체 재실행 타이머(timer)가 아니면 이 조각만 다시 도는 중
+                    if reload and t is not timer:
+                        args = admin_data(t) + args[2:]
+                        if args[0].empty:
+                            st.info("데이터가 없습니다.")
+                            return
+                    fn(t, *args)
+
+            return st.fragment(run)
+
+        return decorate
+
+    df, data_version = admin_data(timer)
+
+    cache_stats = log_cache.stats()
+    report_stats = report_cache.stats()
+    st.caption(
+        f"로그 캐시: hit {cache_stats['hits']:,} · "
+        f"tail {cache_stats['tail_loads']:,} · miss {cache_stats['misses']:,}"
+        f" | 리포트 캐시: {report_stats['entries']}개 · {report_stats['bytes'] / 1024:,.0f}KB · "
+        f"hit {report_stats['hits']:,} · 생성 {report_stats['builds']:,}"
+    )
+    queue_stats = write_queue.stats()
+    st.caption(
+        f"쓰기 큐: 대기 {queue_stats['depth']:,}건 · 커밋 {queue_stats['commits']:,}회"
+        f"(평균 {queue_stats['avg_batch']:.1f}건) · 지연 평균 {queue_stats['avg_latency_ms']:.0f}ms"
+        f" / 최대 {queue_stats['max_latency_ms']:.0f}ms · 거절 {queue_stats['rejected']:,}건"
+    )
+    if queue_stats["failed"]:
+        st.error(
+            f"체크인 {queue_stats['failed']:,}건을 기록하지 못했습니다(서버 로그 visitor.write_queue에 행이 남아 있습니다): "
+            f"{queue_stats['last_error']}"
+        )
+    elif queue_stats["last_error"]:
+        st.warning(f"체크인 기록 중 오류가 있었습니다: {queue_stats['last_error']}")
+
+    # ============================================================
+    # ✅ 0) 오늘 실시간 현황 (이 부분만 REFRESH_SECONDS마다 다시 실행, 새로 들어온 체크인만 읽는다)
+    # ============================================================
+    @st.fragment(run_every=REFRESH_SECONDS)
+    def live_today():
+        now = get_kst_now()
+        live = live_counter.refresh(store, now)
+        st.subheader("📡 오늘 실시간 현황")
+        l1, l2, l3 = st.columns(3)
+        l1.metric("오늘 방문", f"{live['total']:,}명")
+        l2.metric(f"이번 시간({live['hour']}시)", f"{live['this_hour']:,}명")
+        top = max(live["by_purpose"].items(), key=lambda kv: kv[1], default=None)
+        l3.metric("오늘 최다 이용목적", top[0] if top else "-", f"{top[1]:,}명" if top else None)
+        for col, purp in zip(st.columns(len(PURPOSES)), PURPOSES):
+            count = live["by_purpose"].get(purp, 0)
+            share = count / live["total"] * 100 if live["total"] else 0
+            col.metric(purp, f"{count:,}명", f"{share:.0f}%", delta_color="off")
+        read_note = {
+            "reset": "오늘 기록 다시 셈",
+            "tail": f"새 체크인 {live['last_read']:,}건 반영",
+            "idle": "새 체크인 없음",
+        }[live["mode"]]
+        st.caption(f"{now:%H:%M:%S} 갱신 · {read_note} · {REFRESH_SECONDS}초마다 자동 갱신")
+
+    live_today()
+    st.divider()
+    timer.lap("live_today")
+
+    # ============================================================
+    # ✅ 1) 데이터 편집/삭제 (상세 필터링과 무관하게 전체 데이터)
+    # ============================================================
+    # 기간/페이지를 바꾸면 편집기만 다시 그린다
+    @admin_fragment("editor", reload=True)
+    def editor_section(t, df, data_version):
         st.subheader("🗑️ 데이터 편집 및 삭제 (전체 데이터)")
-        df_all = df.copy()
-
-        edited_all_df = st.data_editor(
-            df_all,
+        # 전체 로그를 한 번에 보내지 않고 기간 + 페이지 단위로 편집한다.
+        # 저장할 때는 바뀐 행만 행 ID(df.index) 기준으로 반영 → 편집 중 들어온 체크인은 그대로 남는다.
+        first_day, last_day = df["날짜"].min(), df["날짜"].max()
+        if pd.isna(last_day):
+            first_day = last_day = pd.Timestamp(get_kst_now().date())
+        e1, e2, e3 = st.columns([2, 1, 1])
+        with e1:
+            edit_range = st.date_input(
+                "편집 기간",
+                [max(first_day, last_day - pd.Timedelta(days=6)).date(), last_day.date()],
+                key="edit_date_range",
+            )
+        with e2:
+            page_size = st.selectbox("페이지당 행 수", [100, 200, 500, 1000], index=1, key="edit_page_size")
+
+        edit_start, edit_end = pd.Timestamp(edit_range[0]), pd.Timestamp(edit_range[-1])
+        # 일시를 알 수 없는 행은 어느 기간에도 속하지 않으므로 항상 함께 보여준다(수정/삭제할 수 있도록)
+        # 지점별 샤드 저장소면 지점도 보여준다(읽기 전용, 새로 추가한 행은 이 서버의 지점으로 저장)
+        edit_cols = COLUMNS + [SITE_COLUMN] if SITE_COLUMN in df.columns else COLUMNS
+        window = log_cache.filter_index(store, df).frame(
+            df, start=edit_start.date(), end=edit_end.date(), include_undated=True
+        )[edit_cols]
+        page_count = max(1, -(-len(window) // page_size))
+        if st.session_state.get("edit_page", 1) > page_count:
+            st.session_state.edit_page = page_count
+        with e3:
+            page_no = st.number_input("페이지", min_value=1, max_value=page_count, step=1, key="edit_page")
+        st.caption(f"{len(window):,}건 중 {page_no} / {page_count} 페이지 (전체 {len(df):,}건)")
+
+        page_df = window.iloc[(page_no - 1) * page_size : page_no * page_size]
+        edited_page_df = st.data_editor(
+            page_df,
             num_rows="dynamic",
+            disabled=[SITE_COLUMN],
             use_container_width=True,
-            key="data_editor_all",
+            key=f"data_editor_{edit_start:%Y%m%d}_{edit_end:%Y%m%d}_{page_size}_{page_no}",
         )
+        t.lap("data_editor", rows=len(page_df))
 
         save_col, excel_col = st.columns(2)
         with save_col:
             if st.button("💾 변경사항 최종 저장", use_container_width=True, key="save_all"):
                 try:
-                    cols = ["일시", "요일", "월", "성별", "연령대", "이용목록"]
-                    for c in cols:
-                        if c not in edited_all_df.columns:
-                            edited_all_df[c] = None
-                    edited_all_df[cols].to_csv(DB_FILE, index=False, encoding="utf-8-sig")
-                    st.success("저장 완료!")
-                    time.sleep(1)
-                    st.rerun()
+                    updates, deletes, inserts = diff_frames(page_df, edited_page_df)
+                    if not (updates or deletes or inserts):
+                        st.info("변경된 행이 없습니다.")
+                    else:
+                        store.apply_changes(data_version, updates, deletes, inserts)
+                        t.lap("save", rows=len(updates) + len(deletes) + len(inserts))
+                        # toast는 재실행 후에도 남아 있으므로 기다리지 않고 바로 새로고침
+                        # (로그가 바뀌었으므로 조각이 아니라 페이지 전체를 다시 실행)
+                        st.toast(f"저장 완료! (수정 {len(updates)} · 삭제 {len(deletes)} · 추가 {len(inserts)})", icon="✅")
+                        st.rerun(scope="app")
                 except Exception as e:
                     st.error(f"오류: {e}")
 
         with excel_col:
             meta_all = {
                 "대상": "전체 데이터(편집/삭제 섹션 기준)",
-                "추출시각(KST)": get_kst_now().strftime("%Y-%m-%d %H:%M:%S"),
             }
+            all_aggregates = lambda: excel_aggregates(store.cube())
             st.download_button(
                 "📥 전체 데이터 엑셀(원본+집계)",
-                data=create_excel_report(df_all, meta=meta_all),
+                data=lazy_report("xlsx", store.iter_chunks, meta_all, data_version, all_aggregates),
                 file_name="전체데이터_현황.xlsx",
                 use_container_width=True,
                 key="download_all_excel",
+                on_click="ignore",
             )
+            st.caption(report_caption("xlsx", meta_all, data_version))
+            export_buttons("download_all", "전체데이터_현황", store.iter_chunks, meta_all, data_version, all_aggregates)
+
+    # ---------------------------
+    # ✅ 일자별 방문 추이 (기간이 길면 주/월 단위) — 조회 기간만 바꾸면 이 그래프만 다시 그린다
+    # ---------------------------
+    @admin_fragment("trend")
+    def trend_section(t, per_day, data_version, filter_key):
+        st.subheader("📅 일자별 방문 추이")
+
+        f_min = per_day.index.min().date()
+        f_max = per_day.index.max().date()
+
+        period_option = st.radio(
+            "조회 기간",
+            options=["최근 1주", "최근 1달", "기간 설정"],
+            horizontal=True,
+            key="trend_period",
+        )
 
-        st.divider()
+        if period_option == "기간 설정":
+            chart_range = st.date_input(
+                "그래프 기간(필터 결과 범위 내에서 선택)",
+                value=[f_min, f_max],
+                min_value=f_min,
+                max_value=f_max,
+                key="trend_range",
+            )
+            if isinstance(chart_range, (list, tuple)) and len(chart_range) == 2:
+                chart_start, chart_end = chart_range[0], chart_range[1]
+            else:
+                chart_start, chart_end = f_min, f_max
+        else:
+            today_kst = get_kst_now().date()
+            if period_option == "최근 1주":
+                chart_start = max(today_kst - timedelta(days=6), f_min)
+                chart_end = min(today_kst, f_max)
+            else:
+                chart_start = max(today_kst - timedelta(days=29), f_min)
+                chart_end = min(today_kst, f_max)
 
-        # ============================================================
-        # ✅ 2) 상세 필터링 설정 (리포트/그래프용)
-        # ============================================================
+        fig_daily = trend_figure(per_day, data_version, filter_key, chart_start, chart_end)
+        if fig_daily is None:
+            st.info("선택한 기간에 해당하는 데이터가 없습니다.")
+        else:
+            st.plotly_chart(fig_daily, use_container_width=True)
+        t.lap("chart_daily", rows=len(fig_daily.data[0].x) if fig_daily else 0)
+
+    # ---------------------------
+    # ✅ 성별/이용 목적 비중
+    # ---------------------------
+    @admin_fragment("pies")
+    def pie_section(t, cube_df, data_version, filter_key):
+        r1, r2 = st.columns(2)
+        with r1:
+            st.plotly_chart(
+                share_pie(counts_by(cube_df, "성별"), data_version, filter_key, "성별 비중"),
+                use_container_width=True,
+            )
+        with r2:
+            st.plotly_chart(
+                share_pie(counts_by(cube_df, "이용목록"), data_version, filter_key, "이용 목적 비중"),
+                use_container_width=True,
+            )
+        t.lap("chart_pies")
+
+    # ---------------------------
+    # ✅ 교차표 — 행/열 차원만 바꾸면 교차표만 다시 센다
+    # ---------------------------
+    @admin_fragment("pivot")
+    def pivot_section(t, cube_df):
+        x1, x2 = st.columns([2, 1])
+        with x1:
+            row_dims = st.multiselect("행", options=PIVOT_DIMS, default=["연월", "연령대"], key="pivot_rows")
+        with x2:
+            col_dim = st.selectbox("열", options=PIVOT_DIMS, index=PIVOT_DIMS.index("이용목록"), key="pivot_col")
+        pivot_dims = [d for d in row_dims if d != col_dim] + [col_dim]
+        crosstab = pivot_counts(cube_df, pivot_dims, weights="방문자 수").frame()
+        if len(pivot_dims) > 2:
+            # 행 차원이 여럿이면 방문이 없는 조합은 숨긴다
+            crosstab = crosstab[crosstab.sum(axis=1) > 0]
+        st.dataframe(crosstab, use_container_width=True)
+        t.lap("pivot", rows=int(crosstab.size))
+
+    # ============================================================
+    # ✅ 2) 상세 필터링 설정 (리포트/그래프용)
+    # ============================================================
+    # 필터를 바꾸면 이 섹션(요약 + 안쪽의 추이/비중/교차표 조각)만 다시 돈다. 편집기는 그대로
+    @admin_fragment("report", reload=True)
+    def report_section(t, df, data_version):
         st.subheader("🔍 상세 필터링 설정 (리포트/그래프용)")
         with st.expander("필터 열기/닫기", expanded=True):
             f1, f2 = st.columns(2)
@@ -332,8 +395,8 @@ if st.session_state.is_admin and st.session_state.page == "admin":
             with f2:
                 selected_gender = st.multiselect(
                     "성별",
-                    options=["남성", "여성"],
-                    default=["남성", "여성"],
+                    options=GENDERS,
+                    default=GENDERS,
                     key="filter_gender",
                 )
 
@@ -353,181 +416,151 @@ if st.session_state.is_admin and st.session_state.page == "admin":
                     key="filter_purposes",
                 )
 
-        mask = (
-            (df["일시"].dt.date >= date_range[0])
-            & (df["일시"].dt.date <= date_range[1])
-            & (df["성별"].isin(selected_gender))
-            & (df["연령대"].isin(selected_ages))
-            & (df["이용목록"].isin(selected_purposes))
+            # 지점이 둘 이상이면(샤드 저장소) 지점 필터: 고르지 않은 지점의 로그는 읽지 않는다
+            site_options = store.sites()
+            selected_sites = None
+            if len(site_options) > 1:
+                selected_sites = st.multiselect(
+                    "지점",
+                    options=site_options,
+                    default=site_options,
+                    key="filter_sites",
+                )
+
+        # 날짜 범위/성별/연령대/목적 → 사전 집계 테이블 질의 (요약/그래프는 원본 행을 읽지 않는다)
+        # (종료일 선택 전에는 시작일 하루만 조회)
+        range_start, range_end = date_range[0], date_range[-1]
+        filters = dict(
+            start=range_start,
+            end=range_end,
+            genders=selected_gender,
+            ages=selected_ages,
+            purposes=selected_purposes,
         )
-        f_df = df[mask].copy()
+        report_store = store.for_sites(selected_sites)
+        cube_df = report_store.cube(**filters)
+        t.lap("filter_cube", rows=len(cube_df))
 
         meta_filtered = {
             "대상": "필터링 데이터(리포트/그래프 기준)",
-            "시작일": str(date_range[0]),
-            "종료일": str(date_range[1]),
+            "시작일": str(range_start),
+            "종료일": str(range_end),
             "성별": ", ".join(selected_gender),
             "연령대": ", ".join(selected_ages),
             "이용목적": ", ".join(selected_purposes),
-            "추출시각(KST)": get_kst_now().strftime("%Y-%m-%d %H:%M:%S"),
         }
+        if selected_sites is not None:
+            meta_filtered["지점"] = ", ".join(selected_sites)
+        # 원본 행은 다운로드를 누를 때만 거른다
+        filtered_chunks = lambda: iter_frame_chunks(log_cache.query(report_store, **filters))
+        filtered_aggregates = lambda: excel_aggregates(report_store.cube(**filters))
         st.download_button(
             "📥 필터링 데이터 엑셀(원본+집계+필터정보)",
-            data=create_excel_report(f_df, meta=meta_filtered),
+            data=lazy_report("xlsx", filtered_chunks, meta_filtered, data_version, filtered_aggregates),
             file_name="필터링_현황.xlsx",
             use_container_width=True,
             key="download_filtered_excel",
+            on_click="ignore",
+        )
+        st.caption(report_caption("xlsx", meta_filtered, data_version))
+        export_buttons(
+            "download_filtered", "필터링_현황", filtered_chunks, meta_filtered, data_version, filtered_aggregates
         )
 
         st.divider()
 
-        if f_df.empty:
+        if cube_df.empty:
             st.info("필터 조건에 해당하는 데이터가 없습니다.")
-        else:
-            # ---------------------------
-            # ✅ 리포트 요약
-            # ---------------------------
-            st.subheader("🧾 리포트 요약")
-
-            temp = f_df.copy()
-            temp["일시"] = pd.to_datetime(temp["일시"], errors="coerce")
-            temp = temp.dropna(subset=["일시"])
-            temp["날짜"] = temp["일시"].dt.date
-            temp["월"] = temp["일시"].dt.to_period("M").astype(str)
-
-            iso = temp["일시"].dt.isocalendar()
-            temp["ISO연도"] = iso.year.astype(int)
-            temp["ISO주차"] = iso.week.astype(int)
-
-            total_visits = len(temp)
-            daily_avg = round(total_visits / max(1, temp["날짜"].nunique()), 2)
-
-            peak_day_row = temp["날짜"].value_counts().head(1)
-            peak_day = str(peak_day_row.index[0]) if len(peak_day_row) else "-"
-            peak_day_cnt = int(peak_day_row.iloc[0]) if len(peak_day_row) else 0
-
-            top_purpose_row = temp["이용목록"].value_counts().head(1)
-            top_purpose = str(top_purpose_row.index[0]) if len(top_purpose_row) else "-"
-            top_purpose_cnt = int(top_purpose_row.iloc[0]) if len(top_purpose_row) else 0
-
-            m1, m2, m3, m4 = st.columns(4)
-            m1.metric("총 방문", f"{total_visits:,}명")
-            m2.metric("일평균 방문", f"{daily_avg:,}명")
-            m3.metric("최다 방문일", peak_day, f"{peak_day_cnt:,}명")
-            m4.metric("최다 이용목적", top_purpose, f"{top_purpose_cnt:,}명")
-
-            c1, c2 = st.columns(2)
-            with c1:
-                st.markdown("**📌 월별 방문**")
-                monthly = temp["월"].value_counts().sort_index().reset_index()
-                monthly.columns = ["월", "방문자 수"]
-                st.dataframe(monthly, use_container_width=True, hide_index=True)
-
-            with c2:
-                st.markdown("**📌 주별 방문 (ISO 주차 + 기간)**")
-                weekly_raw = (
-                    temp.groupby(["ISO연도", "ISO주차"])
-                    .size()
-                    .reset_index(name="방문자 수")
-                    .sort_values(["ISO연도", "ISO주차"])
-                )
+            return
 
-                def make_week_label(row):
-                    y = int(row["ISO연도"])
-                    w = int(row["ISO주차"])
-                    s, e = iso_week_date_range(y, w)
-                    return f"{y}-W{w:02d} ({s.isoformat()}~{e.isoformat()})"
+        # ---------------------------
+        # ✅ 리포트 요약
+        # ---------------------------
+        st.subheader("🧾 리포트 요약")
 
-                weekly_raw["주(기간)"] = weekly_raw.apply(make_week_label, axis=1)
-                weekly = weekly_raw[["주(기간)", "방문자 수"]]
-                st.dataframe(weekly, use_container_width=True, hide_index=True)
+        per_day = daily_counts(cube_df)
 
-            st.divider()
+        total_visits = int(per_day.sum())
+        daily_avg = round(total_visits / max(1, len(per_day)), 2)
 
-            # ---------------------------
-            # ✅ 일자별 방문 추이 (2/3 형태 + 자동 간격)
-            # ---------------------------
-            st.subheader("📅 일자별 방문 추이")
+        peak_day = str(per_day.idxmax().date())
+        peak_day_cnt = int(per_day.max())
 
-            f_df2 = f_df.copy()
-            f_df2["일시"] = pd.to_datetime(f_df2["일시"], errors="coerce")
-            f_df2 = f_df2.dropna(subset=["일시"])
+        top_purpose_row = counts_by(cube_df, "이용목록").head(1)
+        top_purpose = str(top_purpose_row.index[0]) if len(top_purpose_row) else "-"
+        top_purpose_cnt = int(top_purpose_row.iloc[0]) if len(top_purpose_row) else 0
 
-            if f_df2.empty:
-                st.info("그래프를 그릴 데이터가 없습니다(일시 파싱 실패 또는 데이터 없음).")
-            else:
-                f_min = f_df2["일시"].min().date()
-                f_max = f_df2["일시"].max().date()
-
-                period_option = st.radio(
-                    "조회 기간",
-                    options=["최근 1주", "최근 1달", "기간 설정"],
-                    horizontal=True,
-                    key="trend_period",
-                )
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("총 방문", f"{total_visits:,}명")
+        m2.metric("일평균 방문", f"{daily_avg:,}명")
+        m3.metric("최다 방문일", peak_day, f"{peak_day_cnt:,}명")
+        m4.metric("최다 이용목적", top_purpose, f"{top_purpose_cnt:,}명")
 
-                if period_option == "기간 설정":
-                    chart_range = st.date_input(
-                        "그래프 기간(필터 결과 범위 내에서 선택)",
-                        value=[f_min, f_max],
-                        min_value=f_min,
-                        max_value=f_max,
-                        key="trend_range",
-                    )
-                    if isinstance(chart_range, (list, tuple)) and len(chart_range) == 2:
-                        chart_start, chart_end = chart_range[0], chart_range[1]
-                    else:
-                        chart_start, chart_end = f_min, f_max
-                else:
-                    today_kst = get_kst_now().date()
-                    if period_option == "최근 1주":
-                        chart_start = max(today_kst - timedelta(days=6), f_min)
-                        chart_end = min(today_kst, f_max)
-                    else:
-                        chart_start = max(today_kst - timedelta(days=29), f_min)
-                        chart_end = min(today_kst, f_max)
+        c1, c2 = st.columns(2)
+        with c1:
+            st.markdown("**📌 월별 방문**")
+            st.dataframe(monthly_table(per_day), use_container_width=True, hide_index=True)
+        t.lap("summary", rows=len(per_day))
 
-                chart_df = f_df2[(f_df2["일시"].dt.date >= chart_start) & (f_df2["일시"].dt.date <= chart_end)].copy()
+        with c2:
+            st.markdown("**📌 주별 방문 (ISO 주차 + 기간)**")
+            weekly = weekly_table(per_day)
+            st.dataframe(weekly, use_container_width=True, hide_index=True)
+        t.lap("weekly_table", rows=len(weekly))
 
-                if chart_df.empty:
-                    st.info("선택한 기간에 해당하는 데이터가 없습니다.")
-                else:
-                    daily_counts = (
-                        chart_df.assign(날짜=chart_df["일시"].dt.floor("D"))
-                        .groupby("날짜")
-                        .size()
-                        .reset_index(name="방문자 수")
-                        .sort_values("날짜")
-                    )
-
-                    fig_daily = px.line(
-                        daily_counts,
-                        x="날짜",
-                        y="방문자 수",
-                        markers=True,
-                        hover_data={"날짜": "|%Y-%m-%d"},
-                    )
-
-                    fig_daily.update_xaxes(
-                        tickformat="%-m/%-d",  # 2/3 형태 (환경에 따라 02/03)
-                        title_text="날짜",
-                    )
-
-                    total_days = (chart_end - chart_start).days + 1
-                    if total_days >= 120:
-                        fig_daily.update_xaxes(dtick="M1", tickformat="%Y/%m")
-                    elif total_days >= 35:
-                        fig_daily.update_xaxes(dtick="D5", tickformat="%-m/%-d")
-                    else:
-                        fig_daily.update_xaxes(dtick="D1", tickformat="%-m/%-d")
+        st.divider()
 
-                    st.plotly_chart(fig_daily, use_container_width=True)
+        filter_key = tuple(meta_filtered.items())
+        trend_section(per_day, data_version, filter_key)
+        pie_section(cube_df, data_version, filter_key)
 
-            r1, r2 = st.columns(2)
-            with r1:
-                st.plotly_chart(px.pie(f_df, names="성별", title="성별 비중", hole=0.4), use_container_width=True)
-            with r2:
-                st.plotly_chart(px.pie(f_df, names="이용목록", title="이용 목적 비중", hole=0.4), use_container_width=True)
+        st.divider()
+
+        # ---------------------------
+        # ✅ 교차 분석 (집계 테이블 → 코드 배열 + bincount 한 번)
+        # ---------------------------
+        st.subheader("🧮 교차 분석")
+        st.plotly_chart(
+            heatmap_figure(
+                pivot_counts(cube_df, ["요일", "시간"], weights="방문자 수"),
+                data_version,
+                filter_key,
+                "요일 × 시간대 방문",
+            ),
+            use_container_width=True,
+        )
+        t.lap("heatmap")
+        pivot_section(cube_df)
+
+    if df.empty:
+        st.info("데이터가 없습니다.")
+    else:
+        editor_section(df, data_version)
+        st.divider()
+        report_section(df, data_version)
+
+# =========================
+# [K] 키오스크 모드 (브라우저에서 진행, 서버는 제출 1회만 처리)
+# =========================
+elif st.session_state.kiosk_mode:
+    # 컴포넌트(kiosk_component/index.html)는 키오스크 모드에서만 등록한다
+    kiosk_component = components.declare_component(
+        "kiosk",
+        path=os.path.join(APP_DIR, "kiosk_component"),
+    )
+    visit = kiosk_component(
+        genders=GENDERS,
+        ages=AGE_GROUPS,
+        purposes=PURPOSES,
+        thanks_ms=2000,
+        key="kiosk",
+        default=None,
+    )
+    # 컴포넌트 값은 다음 재실행에도 그대로 돌아오므로 제출 id로 한 번만 기록
+    if visit and visit.get("id") != st.session_state.get("kiosk_last_id"):
+        st.session_state.kiosk_last_id = visit.get("id")
+        if visit.get("gender") in GENDERS and visit.get("age") in AGE_GROUPS and visit.get("purpose") in PURPOSES:
+            record_visit(make_visit_row(visit["gender"], visit["age"], visit["purpose"]))
 
 # =========================
 # [B] 사용자 페이지: 성별
@@ -588,18 +621,12 @@ elif st.session_state.page == "purpose":
         c1, c2, c3 = st.columns(3)
         for i, purp in enumerate(PURPOSES):
             if [c1, c2, c3][i % 3].button(purp, key=f"purp_{i}"):
-                now = get_kst_now()
-                new_row = {
-                    "일시": now.strftime("%Y-%m-%d %H:%M:%S"),
-                    "요일": get_korean_weekday(now),
-                    "월": now.month,
-                    "성별": st.session_state.temp_data["gender"],
-                    "연령대": st.session_state.temp_data["age"],
-                    "이용목록": purp,
-                }
-                df2 = pd.read_csv(DB_FILE)
-                df2 = pd.concat([df2, pd.DataFrame([new_row])], ignore_index=True)
-                df2.to_csv(DB_FILE, index=False, encoding="utf-8-sig")
+                new_row = make_visit_row(
+                    st.session_state.temp_data["gender"],
+                    st.session_state.temp_data["age"],
+                    purp,
+                )
+                record_visit(new_row)
                 st.session_state.page = "complete"
                 st.rerun()
 
@@ -621,6 +648,60 @@ elif st.session_state.page == "complete":
         "</div>",
         unsafe_allow_html=True,
     )
-    time.sleep(2.0)
-    st.session_state.page = "gender"
-    st.rerun()
+
+    # 완료 화면을 2초 보여준 뒤 처음으로. 타이머는 브라우저가 돌리고 서버 스레드는 기다리지 않는다.
+    @st.fragment(run_every=2.0)
+    def return_to_start():
+        if st.session_state.get("complete_shown"):
+            st.session_state.complete_shown = False
+            st.session_state.page = "gender"
+            st.rerun()
+        st.session_state.complete_shown = True
+
+    return_to_start()
+
+# =========================
+# [Z] 성능 진단 패널 (관리자 사이드바, 선택)
+# =========================
+# 이번 재실행 기록을 먼저 마무리한다 → 패널 그리는 시간은 계측에 들어가지 않는다
+rerun_record = recorder.finish(st.session_state)
+
+if st.session_state.is_admin:
+    with st.sidebar:
+        if st.checkbox("⏱️ 성능 진단", key="show_diagnostics"):
+            if rerun_record:
+                st.caption(f"이번 재실행({rerun_record['page']}): {rerun_record['total_ms']:,.0f}ms")
+                st.dataframe(
+                    pd.DataFrame(rerun_record["sections"], columns=["name", "ms", "rows"]).rename(
+                        columns={"name": "구간", "rows": "행 수"}
+                    ),
+                    use_container_width=True,
+                    hide_index=True,
+                )
+            st.caption(f"최근 재실행 {len(recorder.reruns)}회 + 엑셀/체크인 {len(recorder.events)}건 (전체 세션)")
+            st.dataframe(pd.DataFrame(recorder.section_stats()), use_container_width=True, hide_index=True)
+            # 관리자 화면은 섹션별 조각으로 나뉜다: 위젯 하나 바꿨을 때 도는 건 "admin/<섹션>" 재실행뿐
+            st.caption("페이지별 재실행 (admin/… = 그 섹션만 다시 실행)")
+            st.dataframe(pd.DataFrame(recorder.page_stats()), use_container_width=True, hide_index=True)
+            diag_queue = write_queue.stats()
+            st.caption(
+                f"체크인 기록 지연: 최근 {diag_queue['last_latency_ms']:.0f}ms · "
+                f"평균 {diag_queue['avg_latency_ms']:.0f}ms · 최대 {diag_queue['max_latency_ms']:.0f}ms"
+            )
+
+            # 누르면 콜백이 먼저 돌고 바로 이어지는 재실행 전체를 프로파일한다
+            st.button(
+                "🔬 다음 재실행 프로파일",
+                key="profile_rerun",
+                on_click=lambda: st.session_state.update(profile_next=True),
+            )
+            profile = st.session_state.get("profile_report")
+            if profile:
+                st.caption(f"프로파일: {profile['page']} · {profile['ts']} · {profile['total_ms']:,.0f}ms")
+                st.download_button(
+                    "📥 프로파일(.prof)",
+                    data=profile["prof"],
+                    file_name="rerun.prof",
+                    key="download_profile",
+                )
+                st.code(profile["text"])
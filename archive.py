@@ -0,0 +1,169 @@
+import os
+import shutil
+import time
+from typing import Optional, List, Any, Tuple, Iterator
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from schema import COLUMNS
+
+# --- 월 단위 Parquet 보관소 ---
+# 지난 달 기록은 ARCHIVE_DIR/month=YYYY-MM/part-*.parquet 로 옮기고 원본 CSV에는 이번 달만 남긴다.
+# 조회할 때는 기간 밖의 월 폴더는 열지 않고(파티션 가지치기),
+# 파일 안에서는 행 그룹 통계로 조건을 걸러(조건 푸시다운) 필요한 컬럼만 읽는다.
+# 편집 저장으로 전체를 바꾸면 ARCHIVE_DIR/v-<시각>/month=... 새 버전을 만들고 CURRENT 파일이 그 버전을 가리킨다.
+ARCHIVE_DIR = os.environ.get("VISITOR_ARCHIVE_DIR", "visitor_archive")
+CURRENT_FILE = "CURRENT"
+ROW_GROUP_ROWS = 50_000
+
+_DICT = pa.dictionary(pa.int32(), pa.string())
+# 일시는 SQLite 백엔드와 같이 "YYYY-MM-DD HH:MM:SS" 문자열 (사전순 = 시간순이라 범위 조건이 그대로 통한다)
+ARCHIVE_SCHEMA = pa.schema(
+    [
+        ("일시", pa.string()),
+        ("요일", _DICT),
+        ("월", pa.int64()),
+        ("성별", _DICT),
+        ("연령대", _DICT),
+        ("이용목록", _DICT),
+    ]
+)
+
+
+def _to_table(df: pd.DataFrame) -> pa.Table:
+    out = df[COLUMNS].copy()
+    out["월"] = pd.to_numeric(out["월"], errors="coerce").astype("Int64")
+    return pa.Table.from_pandas(out, schema=ARCHIVE_SCHEMA, preserve_index=False)
+
+
+class ParquetArchive:
+    def __init__(self, root: str = ARCHIVE_DIR):
+        self.root = root
+
+    def _base(self) -> str:
+        # 지금 버전의 폴더 (CURRENT가 없으면 교체한 적 없는 보관소 → root 바로 아래)
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE), encoding="utf-8") as f:
+                return os.path.join(self.root, f.read().strip())
+        except FileNotFoundError:
+            return self.root
+
+    def _month_dir(self, month: str, base: Optional[str] = None) -> str:
+        return os.path.join(base or self._base(), f"month={month}")
+
+    def months(self, base: Optional[str] = None) -> List[str]:
+        base = base or self._base()
+        if not os.path.isdir(base):
+            return []
+        return sorted(name[len("month="):] for name in os.listdir(base) if name.startswith("month="))
+
+    def _files(self, months: List[str], base: Optional[str] = None) -> List[str]:
+        # 한 번 읽는 동안에는 같은 버전(base)만 본다
+        base = base or self._base()
+        files = []
+        for month in months:
+            folder = self._month_dir(month, base)
+            files.extend(os.path.join(folder, f) for f in sorted(os.listdir(folder)) if f.endswith(".parquet"))
+        return files
+
+    def state(self) -> Tuple[Any, ...]:
+        # 캐시 버전용: 파일 목록 + 크기/수정 시각
+        out = []
+        base = self._base()
+        for path in self._files(self.months(base), base):
+            st = os.stat(path)
+            out.append((path, st.st_size, st.st_mtime_ns))
+        return tuple(out)
+
+    def count(self) -> int:
+        base = self._base()
+        return sum(pq.ParquetFile(path).metadata.num_rows for path in self._files(self.months(base), base))
+
+    def write(self, df: pd.DataFrame, name: str) -> int:
+        # 저장 형식 프레임을 월별 part-<name>.parquet로 기록한다. 일시는 정규화된 문자열이어야 한다.
+        # 같은 name으로 다시 쓰면 덮어쓰므로, 보관 도중 중단되어 재시도해도 중복되지 않는다.
+        base = self._base()
+        for month, part in df.groupby(df["일시"].str[:7], sort=True):
+            folder = self._month_dir(month, base)
+            os.makedirs(folder, exist_ok=True)
+            path = os.path.join(folder, f"part-{name}.parquet")
+            tmp = path + ".tmp"
+            pq.write_table(_to_table(part), tmp, row_group_size=ROW_GROUP_ROWS)
+            os.replace(tmp, path)
+        return len(df)
+
+    def replace(self, df: pd.DataFrame, name: str) -> None:
+        # 보관소 전체 교체 (관리자 편집 저장). 새 버전 폴더를 다 만든 뒤 CURRENT 파일을 os.replace로 바꾼다
+        # → 읽는 쪽은 항상 이전 버전 아니면 새 버전 전체를 본다 (폴더 이름 두 번 바꾸기는 그 사이에 보관소가 비어 보였다).
+        # 바로 전 버전은 그 순간 읽고 있던 다른 프로세스를 위해 다음 교체 때까지 남겨 둔다.
+        os.makedirs(self.root, exist_ok=True)
+        prev = self._base()
+        version = f"v-{time.time_ns()}"
+        new = ParquetArchive(os.path.join(self.root, version))
+        os.makedirs(new.root)
+        new.write(df, name)
+
+        tmp = os.path.join(self.root, CURRENT_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.root, CURRENT_FILE))
+
+        keep = {CURRENT_FILE, version, os.path.basename(prev)}
+        for entry in os.listdir(self.root):
+            # 교체한 적 없는 보관소였다면 root 바로 아래 month=... 가 바로 전 버전
+            if entry in keep or (prev == self.root and entry.startswith("month=")):
+                continue
+            path = os.path.join(self.root, entry)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+
+    def read(
+        self,
+        lo: Optional[str] = None,
+        hi: Optional[str] = None,
+        genders: Optional[List[str]] = None,
+        ages: Optional[List[str]] = None,
+        purposes: Optional[List[str]] = None,
+        columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        # [lo, hi) 일자 경계("YYYY-MM-DD", storage._day_bounds)와 항목 조건으로 읽는다
+        columns = list(columns or COLUMNS)
+        if any(values is not None and not values for values in (genders, ages, purposes)):
+            return pd.DataFrame(columns=columns)
+        base = self._base()
+        months = self.months(base)
+        if lo is not None:
+            months = [m for m in months if m >= lo[:7]]
+        if hi is not None:
+            months = [m for m in months if f"{m}-01" < hi]
+        files = self._files(months, base)
+        if not files:
+            return pd.DataFrame(columns=columns)
+
+        cond, terms = None, []
+        if lo is not None:
+            terms.append(ds.field("일시") >= lo)
+        if hi is not None:
+            terms.append(ds.field("일시") < hi)
+        for col, values in (("성별", genders), ("연령대", ages), ("이용목록", purposes)):
+            if values is not None:
+                terms.append(ds.field(col).isin(list(values)))
+        for term in terms:
+            cond = term if cond is None else cond & term
+
+        dataset = ds.dataset(files, schema=ARCHIVE_SCHEMA, format="parquet")
+        return dataset.to_table(columns=columns, filter=cond).to_pandas()
+
+    def iter_chunks(self, chunk_rows: int = 50_000) -> Iterator[pd.DataFrame]:
+        # 월 순서 → 파일 순서대로
+        base = self._base()
+        for path in self._files(self.months(base), base):
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+                yield batch.to_pandas()
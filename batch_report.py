@@ -0,0 +1,161 @@
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional, Dict, Any, List, Tuple
+
+import pandas as pd
+
+from filter_index import FilterIndex
+from log_cache import log_cache
+from report import iter_frame_chunks, write_excel_report
+from schema import AGE_GROUPS, GENDERS, PURPOSES, get_kst_now
+from storage import get_storage
+
+# --- 기간별 엑셀 리포트 일괄 생성 (Streamlit 없이) ---
+# 관리자 페이지의 "필터링 데이터 엑셀"과 같은 파일을 기간마다 만든다.
+# 로그는 부모 프로세스에서 한 번만 파싱하고(필터 인덱스 포함), 작업 프로세스들이 나눠 쓴다.
+# fork가 되는 환경(Linux)에서는 복사 없이 그대로 물려받고, 아니면 작업 프로세스당 한 번 넘긴다.
+#   python batch_report.py --year 2025 -o reports
+#   python batch_report.py --month 2025-03 --month 2025-04 --genders 여성 --jobs 2
+#   python batch_report.py --range 2025-01-01 2025-06-30 --purposes 놀이,휴식
+#   VISITOR_STORAGE=sharded python batch_report.py --year 2025 --sites 본관,분관
+
+
+@dataclass
+class ReportJob:
+    label: str
+    path: str
+    filters: Dict[str, Any]
+    meta: Dict[str, Any]
+
+
+_LOG: Optional[pd.DataFrame] = None
+_INDEX: Optional[FilterIndex] = None
+
+
+def _share(df: Optional[pd.DataFrame]) -> None:
+    # 작업 프로세스 초기화 (fork면 df=None: 부모가 이미 채워 둔 전역을 그대로 쓴다)
+    global _LOG, _INDEX
+    if df is not None:
+        _LOG, _INDEX = df, FilterIndex(df)
+
+
+def _build(job: ReportJob) -> Tuple[str, int, float]:
+    t0 = time.perf_counter()
+    rows = write_excel_report(
+        iter_frame_chunks(_LOG.iloc[_INDEX.select(**job.filters)]),
+        job.path,
+        meta=job.meta,
+    )
+    return job.path, rows, time.perf_counter() - t0
+
+
+def month_periods(months: List[str]) -> List[Tuple[str, date, date]]:
+    out = []
+    for m in months:
+        p = pd.Period(m, freq="M")
+        out.append((str(p), p.start_time.date(), p.end_time.date()))
+    return out
+
+
+def make_jobs(
+    periods: List[Tuple[str, date, date]],
+    out_dir: str,
+    genders: Optional[List[str]] = None,
+    ages: Optional[List[str]] = None,
+    purposes: Optional[List[str]] = None,
+    sites: Optional[List[str]] = None,
+) -> List[ReportJob]:
+    # 메타(필터정보 시트)는 관리자 페이지 필터링 엑셀과 같은 항목
+    extracted = get_kst_now().strftime("%Y-%m-%d %H:%M:%S")
+    jobs = []
+    for label, start, end in periods:
+        meta = {
+            "대상": "필터링 데이터(리포트/그래프 기준)",
+            "시작일": str(start),
+            "종료일": str(end),
+            "성별": ", ".join(genders or GENDERS),
+            "연령대": ", ".join(ages or AGE_GROUPS),
+            "이용목적": ", ".join(purposes or PURPOSES),
+        }
+        if sites is not None:
+            meta["지점"] = ", ".join(sites)
+        meta["추출시각(KST)"] = extracted
+        jobs.append(
+            ReportJob(
+                label=label,
+                path=os.path.join(out_dir, f"현황_{label}.xlsx"),
+                filters=dict(start=start, end=end, genders=genders, ages=ages, purposes=purposes),
+                meta=meta,
+            )
+        )
+    return jobs
+
+
+def run_jobs(df: pd.DataFrame, jobs: List[ReportJob], workers: int = 0) -> List[Tuple[str, int, float]]:
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    _share(df)
+    if workers <= 1:
+        return [_build(job) for job in jobs]
+    if "fork" in multiprocessing.get_all_start_methods():
+        ctx, initargs = multiprocessing.get_context("fork"), (None,)
+    else:
+        ctx, initargs = multiprocessing.get_context("spawn"), (df,)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_share, initargs=initargs) as pool:
+        return list(pool.map(_build, jobs))
+
+
+def _split(value: Optional[str], allowed: List[str], name: str) -> Optional[List[str]]:
+    if value is None:
+        return None
+    values = [v.strip() for v in value.split(",") if v.strip()]
+    unknown = [v for v in values if v not in allowed]
+    if unknown:
+        raise SystemExit(f"알 수 없는 {name}: {', '.join(unknown)} (가능: {', '.join(allowed)})")
+    return values
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="기간별 방명록 엑셀 리포트 일괄 생성")
+    parser.add_argument("--year", type=int, action="append", default=[], help="그 해 1~12월 각각")
+    parser.add_argument("--month", action="append", default=[], help="YYYY-MM (여러 번 가능)")
+    parser.add_argument(
+        "--range", nargs=2, action="append", default=[], metavar=("START", "END"), help="YYYY-MM-DD YYYY-MM-DD"
+    )
+    parser.add_argument("--genders", help="쉼표로 구분 (기본: 전체)")
+    parser.add_argument("--ages", help="쉼표로 구분 (기본: 전체)")
+    parser.add_argument("--purposes", help="쉼표로 구분 (기본: 전체)")
+    parser.add_argument("--sites", help="지점, 쉼표로 구분 (샤드 저장소, 기본: 전체)")
+    parser.add_argument("-o", "--output", default="reports", help="저장 폴더")
+    parser.add_argument("--jobs", type=int, default=0, help="작업 프로세스 수 (기본: CPU 수)")
+    args = parser.parse_args()
+
+    periods = month_periods([f"{y}-{m:02d}" for y in args.year for m in range(1, 13)] + args.month)
+    for start, end in args.range:
+        periods.append((f"{start}_{end}", date.fromisoformat(start), date.fromisoformat(end)))
+    if not periods:
+        parser.error("--year / --month / --range 중 하나 이상 필요합니다.")
+
+    store = get_storage()
+    sites = _split(args.sites, store.sites(), "지점")
+    os.makedirs(args.output, exist_ok=True)
+    jobs = make_jobs(
+        periods,
+        args.output,
+        genders=_split(args.genders, GENDERS, "성별"),
+        ages=_split(args.ages, AGE_GROUPS, "연령대"),
+        purposes=_split(args.purposes, PURPOSES, "이용 목적"),
+        sites=sites,
+    )
+
+    t0 = time.perf_counter()
+    # 지점을 고르면 그 지점 샤드만 읽는다
+    log = log_cache.load(store.for_sites(sites))
+    print(f"로그 {len(log):,}행 로드 ({time.perf_counter() - t0:.1f}s)")
+    for path, rows, seconds in run_jobs(log, jobs, args.jobs):
+        print(f"{rows:>10,}행  {seconds:6.1f}s  {path}")
+    print(f"{len(jobs)}개 파일 완료 ({time.perf_counter() - t0:.1f}s)")
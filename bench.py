@@ -0,0 +1,441 @@
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Callable, Tuple
+
+import pandas as pd
+
+from timing import quiet_by_default
+
+quiet_by_default()
+
+import synth
+from analytics import monthly_table, weekly_table
+from filter_index import FilterIndex
+from cube import counts_by, daily_counts, excel_aggregates
+from log_cache import parse_log
+from pivot import PIVOT_SHEETS, pivot_counts
+from report import EXPORT_FORMATS, iter_frame_chunks, write_excel_report
+from schema import AGE_GROUPS
+from storage import CsvStorage, filter_frame
+from write_queue import WriteQueue
+
+# --- 데이터 경로 벤치마크 ---
+# synth.py로 만든 visitor_log.csv(행 수별)에 대해 체크인 기록 / 관리자 로드 / 필터 / 리포트 요약 / 엑셀을
+# 재고, 단계별 경과 시간(중앙값)과 최대 RSS를 JSON으로 남긴다. compare로 이전 결과와 비교한다.
+#   python bench.py run --rows 10000 100000 1000000 -o bench.json
+#   python bench.py compare base.json bench.json --threshold 0.2
+DEFAULT_ROWS = [10_000, 100_000]
+REPEAT = 3
+CHECKINS = 200
+EXCEL_ROWS = 100_000
+SAMPLE_SECONDS = 0.005
+
+_PAGE_MB = os.sysconf("SC_PAGE_SIZE") / 1024 / 1024 if hasattr(os, "sysconf") else 0
+
+
+def rss_mb() -> float:
+    # 현재 RSS (Linux /proc). 없으면 지금까지의 최대 RSS로 대신한다
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_MB
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+class PeakRss:
+    # with 블록 동안 RSS를 주기적으로 읽어 최대값을 기록한다
+    def __init__(self, interval: float = SAMPLE_SECONDS):
+        self.interval = interval
+        self.start_mb = 0.0
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, rss_mb())
+
+    def __enter__(self) -> "PeakRss":
+        self.start_mb = self.peak_mb = rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, rss_mb())
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Tuple[Any, Dict[str, Any]]:
+    walls = []
+    result = None
+    with PeakRss() as rss:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            result = fn()
+            walls.append(time.perf_counter() - t0)
+    walls.sort()
+    record = {
+        "wall_s": walls[len(walls) // 2],
+        "min_s": walls[0],
+        "max_s": walls[-1],
+        "repeat": repeat,
+        "rss_start_mb": round(rss.start_mb, 1),
+        "peak_rss_mb": round(rss.peak_mb, 1),
+    }
+    return result, record
+
+
+def _summary(cube_df: pd.DataFrame) -> Dict[str, Any]:
+    # app.py 리포트 요약과 같은 계산 (사전 집계 테이블)
+    per_day = daily_counts(cube_df)
+    return {
+        "total": int(per_day.sum()),
+        "peak_day": per_day.idxmax() if len(per_day) else None,
+        "top_purpose": counts_by(cube_df, "이용목록").head(1),
+        "monthly": monthly_table(per_day),
+        "weekly": weekly_table(per_day),
+        "gender": counts_by(cube_df, "성별"),
+    }
+
+
+def _summary_frame(df: pd.DataFrame) -> Dict[str, Any]:
+    # 같은 요약을 원본 행에서 (사전 집계 테이블이 없을 때의 비용)
+    per_day = df.groupby("날짜", observed=True).size()
+    return {
+        "total": len(df),
+        "peak_day": per_day.idxmax() if len(per_day) else None,
+        "top_purpose": df["이용목록"].value_counts().head(1),
+        "monthly": monthly_table(per_day),
+        "weekly": weekly_table(per_day),
+        "gender": df["성별"].value_counts(),
+    }
+
+
+def _checkin_rows(n: int) -> List[Dict[str, Any]]:
+    now = datetime.now()
+    row = {
+        "일시": now.strftime("%Y-%m-%d %H:%M:%S"),
+        "요일": "월",
+        "월": now.month,
+        "성별": "여성",
+        "연령대": "초등",
+        "이용목록": "놀이",
+    }
+    return [dict(row) for _ in range(n)]
+
+
+def _queued_checkins(store: CsvStorage, n: int) -> None:
+    wq = WriteQueue(store)
+    for row in _checkin_rows(n):
+        wq.submit(row)
+    wq.close()
+
+
+def bench_rows(rows: int, workdir: str, repeat: int = REPEAT, excel_rows: int = EXCEL_ROWS) -> List[Dict[str, Any]]:
+    path = os.path.join(workdir, f"visitor_log_{rows}.csv")
+    synth.write_csv(path, rows, seed=rows)
+    store = CsvStorage(db_path=path, journal_path=path + ".journal", cube_path=path + ".cube.db")
+    store.ensure()
+    results = []
+
+    def step(name: str, fn: Callable[[], Any], times: int = repeat, **extra) -> Any:
+        result, record = measure(fn, times)
+        record.update({"rows": rows, "step": name}, **extra)
+        results.append(record)
+        print(f"  {name:<28} {record['wall_s'] * 1000:>10.1f} ms   peak {record['peak_rss_mb']:>8.1f} MB", flush=True)
+        return result
+
+    print(f"[{rows:,}행] {path}", flush=True)
+    # 1) 관리자 로드: 초기 app.py 방식(read_csv + to_datetime) / 현재 방식(저장소 스냅샷 + 압축/파생 컬럼)
+    step("load_read_csv_to_datetime", lambda: pd.to_datetime(pd.read_csv(path)["일시"], errors="coerce"))
+    df = step("load_parse_log", lambda: parse_log(store.snapshot()[0]))
+    step("cube_rebuild", store.rebuild_cube, times=1)
+
+    # 2) 필터: 최근 30일 + 성별 1개 + 연령대 3개 (전체 스캔 마스크 / 필터 인덱스)
+    last = df["날짜"].max()
+    filters = dict(
+        start=(last - pd.Timedelta(days=29)).date(),
+        end=last.date(),
+        genders=["여성"],
+        ages=AGE_GROUPS[:3],
+        purposes=None,
+    )
+    filtered = step("filter_mask", lambda: filter_frame(df, **filters))
+    # 필터 인덱스(관리자 화면 경로): 데이터 버전당 한 번 만들고, 필터마다 select
+    index = step("filter_index_build", lambda: FilterIndex(df))
+    step("filter_index_select", lambda: index.select(**filters), rows_selected=len(filtered))
+
+    # 3) 리포트 요약: 사전 집계 테이블(app.py 경로) / 원본 행
+    step("summary_cube", lambda: _summary(store.cube(**filters)))
+    step("summary_frame", lambda: _summary_frame(filtered))
+    # 교차 집계 (연월 × 연령대 × 이용목록): 집계 테이블 가중치 / 원본 행
+    step("pivot_cube", lambda: pivot_counts(store.cube(**filters), PIVOT_SHEETS[1][1], weights="방문자 수"))
+    step("pivot_frame", lambda: pivot_counts(filtered, PIVOT_SHEETS[1][1]))
+
+    # 4) 엑셀 리포트 (필터링 데이터, app.py와 같이 집계 시트는 집계 테이블에서)
+    excel_df = filtered.iloc[:excel_rows]
+
+    def excel() -> int:
+        output = io.BytesIO()
+        write_excel_report(
+            iter_frame_chunks(excel_df),
+            output,
+            meta={"대상": "bench"},
+            aggregates=excel_aggregates(store.cube(**filters)),
+        )
+        return output.tell()
+
+    step("excel_report", excel, excel_rows=len(excel_df))
+
+    # 엑셀 외 내보내기 형식: 필터링된 행 전체 (출력 바이트 수가 결과값)
+    for fmt in ("csv", "parquet", "arrow"):
+        write = EXPORT_FORMATS[fmt][0]
+
+        def export(write=write) -> int:
+            output = io.BytesIO()
+            write(
+                iter_frame_chunks(filtered),
+                output,
+                meta={"대상": "bench"},
+                aggregates=excel_aggregates(store.cube(**filters)),
+            )
+            return output.tell()
+
+        step(f"{fmt}_report", export, export_rows=len(filtered))
+
+    # 5) 체크인 기록 (건당 시간은 per_checkin_ms): 한 건씩 직접 / 쓰기 큐 그룹 커밋
+    for name, fn in (
+        ("checkin_append", lambda: [store.append(r) for r in _checkin_rows(CHECKINS)]),
+        ("checkin_queue", lambda: _queued_checkins(store, CHECKINS)),
+    ):
+        step(name, fn, checkins=CHECKINS)
+        results[-1]["per_checkin_ms"] = results[-1]["wall_s"] * 1000 / CHECKINS
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(rows_list: List[int], repeat: int, excel_rows: int, workdir: Optional[str], keep: bool) -> Dict[str, Any]:
+    own_dir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="visitor_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        results = []
+        for rows in rows_list:
+            results.extend(bench_rows(rows, workdir, repeat, excel_rows))
+    finally:
+        if own_dir and not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return {"meta": _meta(repeat), "results": results}
+
+
+def _meta(repeat: int) -> Dict[str, Any]:
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "repeat": repeat,
+    }
+
+
+# --- 시작 시간: 키오스크 화면의 첫 실행(새 프로세스) / 재실행 ---
+# 측정은 깨끗한 인터프리터에서 한다 (이 파일은 pandas 등을 이미 불러와서 첫 실행 시간이 줄어 보인다).
+# streamlit 자체 import는 서버에 이미 올라와 있으므로 빼고, app.py 첫 실행(모듈 import 포함)부터 잰다.
+STARTUP_PAGES = ["kiosk", "gender"]
+STARTUP_RERUNS = 30
+HEAVY_MODULES = ["pandas", "numpy", "pyarrow", "pyarrow.dataset", "plotly.express", "xlsxwriter"]
+_STARTUP_PROBE = """
+import json, os, shutil, sys, tempfile, time
+app, page, reruns, heavy = sys.argv[1], sys.argv[2], int(sys.argv[3]), sys.argv[4].split(",")
+workdir = tempfile.mkdtemp(prefix="visitor_startup_")
+os.chdir(workdir)
+sys.path.insert(0, os.path.dirname(app))
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(app, default_timeout=120)
+if page == "kiosk":
+    at.query_params["kiosk"] = "true"
+t0 = time.perf_counter(); at.run(); cold = time.perf_counter() - t0
+loaded = [m for m in heavy if m in sys.modules]
+walls = []
+for _ in range(reruns):
+    t0 = time.perf_counter(); at.run(); walls.append(time.perf_counter() - t0)
+try:
+    from timing import recorder
+    scripts = [r["total_ms"] / 1000 for r in list(recorder.reruns)[1:]]
+except ImportError:
+    scripts = []
+shutil.rmtree(workdir, ignore_errors=True)
+print(json.dumps({"cold": cold, "walls": walls, "scripts": scripts, "loaded": loaded, "error": bool(at.exception)}))
+"""
+
+
+def startup_probe(app: str, page: str, reruns: int = STARTUP_RERUNS) -> Dict[str, Any]:
+    env = dict(os.environ, VISITOR_TIMING_LOG="0")
+    out = subprocess.run(
+        [sys.executable, "-c", _STARTUP_PROBE, os.path.abspath(app), page, str(reruns), ",".join(HEAVY_MODULES)],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def startup(app: str, repeat: int, reruns: int = STARTUP_RERUNS) -> Dict[str, Any]:
+    # 페이지별: 첫 실행(프로세스 repeat개의 중앙값) / 재실행(AppTest 포함 벽시계, 스크립트 자체 시간)
+    results = []
+    for page in STARTUP_PAGES:
+        probes = [startup_probe(app, page, reruns) for _ in range(repeat)]
+        if any(p["error"] for p in probes):
+            raise RuntimeError(f"{page} 화면 실행 중 예외")
+        samples = {
+            "cold_start": [p["cold"] for p in probes],
+            "rerun": [w for p in probes for w in p["walls"]],
+            "rerun_script": [s for p in probes for s in p["scripts"]],
+        }
+        print(f"[{page}] 불러온 무거운 모듈: {', '.join(probes[0]['loaded']) or '-'}")
+        for name, values in samples.items():
+            if not values:
+                continue
+            values.sort()
+            record = {
+                "rows": 0,
+                "step": f"{page}_{name}",
+                "wall_s": values[len(values) // 2],
+                "min_s": values[0],
+                "max_s": values[-1],
+                "repeat": len(values),
+                "rss_start_mb": 0.0,
+                "peak_rss_mb": 0.0,
+                "heavy_modules": probes[0]["loaded"],
+            }
+            results.append(record)
+            print(f"  {record['step']:<28} {record['wall_s'] * 1000:>10.1f} ms", flush=True)
+    return {"meta": dict(_meta(repeat), app=os.path.abspath(app)), "results": results}
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], threshold: float, min_seconds: float) -> List[Dict[str, Any]]:
+    # (행 수, 단계)별 경과 시간 비율. threshold(예: 0.2 = 20%)보다 느려지면 regression
+    # min_seconds보다 짧은 단계는 측정 잡음이 커서 판정하지 않는다
+    old = {(r["rows"], r["step"]): r for r in base["results"]}
+    rows = []
+    for r in new["results"]:
+        b = old.get((r["rows"], r["step"]))
+        if b is None:
+            continue
+        ratio = r["wall_s"] / b["wall_s"] if b["wall_s"] > 0 else float("inf")
+        if max(r["wall_s"], b["wall_s"]) < min_seconds:
+            status = "noise"
+        elif ratio > 1 + threshold:
+            status = "REGRESSION"
+        elif ratio < 1 - threshold:
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append(
+            {
+                "rows": r["rows"],
+                "step": r["step"],
+                "base_s": b["wall_s"],
+                "new_s": r["wall_s"],
+                "ratio": ratio,
+                "base_peak_mb": b["peak_rss_mb"],
+                "new_peak_mb": r["peak_rss_mb"],
+                "status": status,
+            }
+        )
+    return rows
+
+
+def print_comparison(rows: List[Dict[str, Any]]) -> None:
+    print(f"{'rows':>10}  {'step':<28} {'base ms':>10} {'new ms':>10} {'ratio':>7}  {'peak MB':>17}  status")
+    for r in rows:
+        print(
+            f"{r['rows']:>10,}  {r['step']:<28} {r['base_s'] * 1000:>10.1f} {r['new_s'] * 1000:>10.1f} "
+            f"{r['ratio']:>7.2f}  {r['base_peak_mb']:>8.1f}→{r['new_peak_mb']:<8.1f}  {r['status']}"
+        )
+
+
+def _load(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="방명록 데이터 경로 벤치마크")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_run = sub.add_parser("run", help="합성 로그로 벤치마크 실행")
+    p_run.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+    p_run.add_argument("--repeat", type=int, default=REPEAT)
+    p_run.add_argument("--excel-rows", type=int, default=EXCEL_ROWS)
+    p_run.add_argument("-o", "--output", default="bench.json")
+    p_run.add_argument("--workdir", default=None, help="합성 로그를 둘 폴더 (기본: 임시 폴더, 끝나면 삭제)")
+    p_run.add_argument("--keep", action="store_true", help="임시 폴더를 지우지 않는다")
+    p_run.add_argument("--compare", default=None, help="이 결과(JSON)와 비교")
+    p_run.add_argument("--threshold", type=float, default=0.2)
+    p_run.add_argument("--min-seconds", type=float, default=0.005)
+
+    p_start = sub.add_parser("startup", help="키오스크 화면 첫 실행 / 재실행 시간")
+    p_start.add_argument("--app", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py"))
+    p_start.add_argument("--repeat", type=int, default=5, help="첫 실행을 잴 새 프로세스 수")
+    p_start.add_argument("--reruns", type=int, default=STARTUP_RERUNS)
+    p_start.add_argument("-o", "--output", default="startup.json")
+    p_start.add_argument("--compare", default=None, help="이 결과(JSON)와 비교")
+    p_start.add_argument("--threshold", type=float, default=0.2)
+    p_start.add_argument("--min-seconds", type=float, default=0.001)
+
+    p_cmp = sub.add_parser("compare", help="두 결과(JSON) 비교")
+    p_cmp.add_argument("base")
+    p_cmp.add_argument("new")
+    p_cmp.add_argument("--threshold", type=float, default=0.2)
+    p_cmp.add_argument("--min-seconds", type=float, default=0.005)
+
+    args = parser.parse_args()
+    if args.cmd in ("run", "startup"):
+        if args.cmd == "run":
+            report = run(args.rows, args.repeat, args.excel_rows, args.workdir, args.keep)
+        else:
+            report = startup(args.app, args.repeat, args.reruns)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"결과 → {args.output}")
+        base_path = args.compare
+        new = report
+    else:
+        base_path = args.base
+        new = _load(args.new)
+
+    if base_path:
+        table = compare(_load(base_path), new, args.threshold, args.min_seconds)
+        print_comparison(table)
+        regressions = [r for r in table if r["status"] == "REGRESSION"]
+        if regressions:
+            print(f"regression {len(regressions)}건 (기준 +{args.threshold:.0%})")
+            sys.exit(1)
@@ -0,0 +1,203 @@
+import sqlite3
+from collections import Counter
+from datetime import date, datetime
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+
+import pandas as pd
+
+from analytics import date_features
+from pivot import PIVOT_SHEETS, pivot_counts
+
+# --- 사전 집계 테이블 (일 × 시간 × 성별 × 연령대 × 이용목록 → 방문자 수) ---
+# 체크인 때마다 해당 칸을 +1 하고, 관리자 요약/엑셀 집계 시트는 여기서 답한다.
+# 조회 비용은 방문 수가 아니라 (일수 × 조합 수)에 비례한다.
+CUBE_COLUMNS = ["날짜", "시간", "성별", "연령대", "이용목록", "방문자 수"]
+
+
+def ensure_cube(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS visit_counts (
+            day TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            gender TEXT NOT NULL,
+            age TEXT NOT NULL,
+            purpose TEXT NOT NULL,
+            visits INTEGER NOT NULL,
+            PRIMARY KEY (day, hour, gender, age, purpose)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+def _label(value: Any) -> str:
+    # 빈 값(None/NaN)은 "" — 체크인 행(dict)과 로그 DataFrame(rebuild_cube)이 같은 칸에 모이도록
+    return "" if value is None or pd.isna(value) else str(value)
+
+
+def _labels(values: pd.Series) -> pd.Series:
+    # _label의 열 단위 버전 (astype(str)는 NaN을 "nan"으로 바꾼다)
+    values = values.astype(object)
+    return values.where(values.notna(), "").astype(str)
+
+
+def _cell_key(row: Dict[str, Any]) -> Optional[Tuple[str, int, str, str, str]]:
+    # "YYYY-MM-DD HH:MM:SS" → (일, 시간, 성별, 연령대, 이용목록). 일시를 알 수 없으면 None
+    value = row.get("일시")
+    try:
+        # 체크인 형식은 strptime으로 바로 (pd.to_datetime은 건당 수백 µs라 그룹 커밋에서 눈에 띈다)
+        ts = datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        ts = pd.to_datetime(value, errors="coerce")
+        if pd.isna(ts):
+            return None
+    return (
+        ts.strftime("%Y-%m-%d"),
+        int(ts.hour),
+        _label(row.get("성별")),
+        _label(row.get("연령대")),
+        _label(row.get("이용목록")),
+    )
+
+
+def _log_cells(df: pd.DataFrame) -> pd.Series:
+    # 로그 → 칸별 방문자 수 (색인: day, hour, gender, age, purpose). 일시를 알 수 없는 행은 뺀다
+    ts = pd.to_datetime(df["일시"], errors="coerce")
+    ok = ts.notna()
+    keys = pd.DataFrame(
+        {
+            "day": ts[ok].dt.strftime("%Y-%m-%d"),
+            "hour": ts[ok].dt.hour.astype(int),
+            "gender": _labels(df.loc[ok, "성별"]),
+            "age": _labels(df.loc[ok, "연령대"]),
+            "purpose": _labels(df.loc[ok, "이용목록"]),
+        }
+    )
+    return keys.groupby(list(keys.columns)).size()
+
+
+def _upsert(conn: sqlite3.Connection, cells: Iterable[Tuple[Tuple[str, int, str, str, str], int]]) -> None:
+    conn.executemany(
+        "INSERT INTO visit_counts (day, hour, gender, age, purpose, visits) VALUES (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(day, hour, gender, age, purpose) DO UPDATE SET visits = visits + excluded.visits",
+        [key + (n,) for key, n in cells],
+    )
+
+
+def add_to_cube(conn: sqlite3.Connection, rows: List[Dict[str, Any]]) -> None:
+    # 체크인 행들을 해당 칸에 더한다 (호출 측 트랜잭션 안에서 실행)
+    cells = Counter(k for k in (_cell_key(r) for r in rows) if k is not None)
+    _upsert(conn, cells.items())
+
+
+def remove_from_cube(conn: sqlite3.Connection, rows: List[Dict[str, Any]]) -> None:
+    # 수정/삭제된 행의 이전 값을 해당 칸에서 뺀다 (0이 된 칸은 지운다)
+    cells = Counter(k for k in (_cell_key(r) for r in rows) if k is not None)
+    _upsert(conn, ((key, -n) for key, n in cells.items()))
+    conn.execute("DELETE FROM visit_counts WHERE visits <= 0")
+
+
+def rebuild_cube(conn: sqlite3.Connection, df: pd.DataFrame) -> int:
+    # 원본 로그 전체로 집계 테이블을 다시 만든다 (관리자 편집/삭제 후). 반환값: 칸 수
+    conn.execute("DELETE FROM visit_counts")
+    if df.empty:
+        return 0
+    grouped = _log_cells(df)
+    _upsert(conn, (((d, int(h), g, a, p), int(n)) for (d, h, g, a, p), n in grouped.items()))
+    return len(grouped)
+
+
+def cube_matches(cube_df: pd.DataFrame, df: pd.DataFrame) -> bool:
+    # 집계 테이블(query_cube 결과)이 로그와 칸마다 같은지. 합계만 비교하면 칸끼리 어긋난 것(예: 편집 후 성별만 바뀜)을 놓친다
+    expected = _log_cells(df) if not df.empty else pd.Series(dtype=int)
+    actual = pd.Series(dtype=int)
+    if not cube_df.empty:
+        # 지점별 집계를 이어 붙인 경우 같은 칸이 여러 번 나온다 → 합친다
+        actual = cube_df.groupby(
+            [
+                cube_df["날짜"].dt.strftime("%Y-%m-%d").rename("day"),
+                cube_df["시간"].astype(int).rename("hour"),
+                cube_df["성별"].rename("gender"),
+                cube_df["연령대"].rename("age"),
+                cube_df["이용목록"].rename("purpose"),
+            ]
+        )["방문자 수"].sum()
+        actual = actual[actual != 0]
+    if len(expected) != len(actual):
+        return False
+    if expected.empty:
+        return True
+    expected, actual = expected.align(actual, fill_value=0)
+    return bool((expected == actual).all())
+
+
+def cube_total(conn: sqlite3.Connection) -> int:
+    return int(conn.execute("SELECT COALESCE(SUM(visits), 0) FROM visit_counts").fetchone()[0])
+
+
+def query_cube(
+    conn: sqlite3.Connection,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    genders: Optional[List[str]] = None,
+    ages: Optional[List[str]] = None,
+    purposes: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    where, params = [], []
+    # day는 기본키 첫 컬럼이라 기간 조건이 인덱스 범위 탐색이 된다
+    if start is not None:
+        where.append("day >= ?")
+        params.append(start.isoformat())
+    if end is not None:
+        where.append("day <= ?")
+        params.append(end.isoformat())
+    for col, values in (("gender", genders), ("age", ages), ("purpose", purposes)):
+        if values is None:
+            continue
+        if not values:
+            return empty_cube()
+        where.append(f"{col} IN ({', '.join('?' * len(values))})")
+        params.extend(values)
+
+    query = "SELECT day, hour, gender, age, purpose, visits FROM visit_counts"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    out = pd.read_sql_query(query, conn, params=params)
+    out.columns = CUBE_COLUMNS
+    out["날짜"] = pd.to_datetime(out["날짜"])
+    return out
+
+
+def empty_cube() -> pd.DataFrame:
+    out = pd.DataFrame(columns=CUBE_COLUMNS)
+    out["날짜"] = pd.to_datetime(out["날짜"])
+    out["방문자 수"] = out["방문자 수"].astype(int)
+    return out
+
+
+# --- 집계 테이블에서 바로 답하는 요약 ---
+def counts_by(cube_df: pd.DataFrame, col: str) -> pd.Series:
+    # value_counts()와 같은 모양 (방문자 수 내림차순)
+    return cube_df.groupby(col)["방문자 수"].sum().sort_values(ascending=False, kind="stable")
+
+
+def daily_counts(cube_df: pd.DataFrame) -> pd.Series:
+    return cube_df.groupby("날짜")["방문자 수"].sum().sort_index()
+
+
+def excel_aggregates(cube_df: pd.DataFrame) -> Dict[str, pd.Series]:
+    # 엑셀 집계 시트용 카운트 (report.write_excel_report의 aggregates 인자)
+    per_day = daily_counts(cube_df)
+    feats = date_features(per_day.index)
+    out = {
+        "월-일": per_day.groupby(feats["월-일"].to_numpy()).sum(),
+        "월": per_day.groupby(feats["연월"].to_numpy()).sum(),
+        "연-주": per_day.groupby(feats["연-주"].to_numpy()).sum(),
+        "이용목록": counts_by(cube_df, "이용목록"),
+        "성별": counts_by(cube_df, "성별"),
+        "연령대": counts_by(cube_df, "연령대"),
+    }
+    # 교차 시트 (시트 이름 → 칸별 방문자 수)
+    for sheet_name, dims in PIVOT_SHEETS:
+        out[sheet_name] = pivot_counts(cube_df, dims, weights="방문자 수").series()
+    return out
@@ -0,0 +1,125 @@
+from datetime import date, timedelta
+from typing import Optional, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from schema import CATEGORIES, as_category
+
+# --- 관리자 필터 인덱스 (시간 정렬 + 카테고리별 비트맵) ---
+# 파싱된 로그 하나에 대해 한 번 만든다.
+#  - 일시: 시간 순으로 정렬한 정수 배열 → 날짜 범위는 searchsorted 두 번으로 [lo, hi) 구간이 된다.
+#  - 성별/연령대/이용목록: 카테고리마다 (정렬 순서 기준) 비트맵(np.packbits, 행당 1비트).
+#    선택한 카테고리 비트맵을 OR, 컬럼끼리 AND — 날짜 구간에 해당하는 바이트만 계산한다.
+# select()는 원래 프레임의 행 위치(iloc, 오름차순)를 돌려준다. 조건은 storage.filter_frame과 같다.
+FILTER_COLUMNS = {"genders": "성별", "ages": "연령대", "purposes": "이용목록"}
+
+
+class FilterIndex:
+    def __init__(self, df: pd.DataFrame):
+        self.size = len(df)
+        ts = df["일시"]
+        if not isinstance(ts.dtype, np.dtype) or ts.dtype.kind != "M":
+            ts = pd.to_datetime(ts, errors="coerce")
+        ts = ts.to_numpy()
+        self._unit = np.datetime_data(ts.dtype)[0]
+        nat = np.isnat(ts)
+        # 일시를 알 수 없는 행: 날짜 조건이 없을 때만 포함 (비교 결과가 항상 False)
+        self._undated = np.flatnonzero(nat)
+        order = np.flatnonzero(~nat)
+        times = ts[order].view("i8")
+        # 체크인은 시간 순으로 쌓이므로 보통은 이미 정렬돼 있다 → 확인만 하고 정렬은 건너뛴다
+        self._in_order = not (times.size and (np.diff(times) < 0).any())
+        if not self._in_order:
+            by_time = np.argsort(times, kind="stable")
+            order, times = order[by_time], times[by_time]
+        self._order = order
+        self._times = times
+
+        self._bitmaps: Dict[str, Dict[str, np.ndarray]] = {}
+        self._complete: Dict[str, bool] = {}
+        self._undated_codes: Dict[str, np.ndarray] = {}
+        self._categories: Dict[str, List[str]] = {}
+        for col, categories in CATEGORIES.items():
+            if col not in FILTER_COLUMNS.values():
+                continue
+            # 목록에 없는 값(관리자 편집)도 카테고리로 둔다 → 고를 수 있고, 고정 목록 "전체 선택"에서는 빠진다
+            cat = pd.Series(as_category(df[col], categories))
+            self._categories[col] = [str(c) for c in cat.cat.categories]
+            codes = cat.cat.codes.to_numpy()
+            sorted_codes = codes[order]
+            self._bitmaps[col] = {c: np.packbits(sorted_codes == i) for i, c in enumerate(self._categories[col])}
+            # 빈 값이 없으면 "전체 선택"은 조건이 아니다 → 계산을 건너뛴다
+            self._complete[col] = bool((sorted_codes >= 0).all())
+            self._undated_codes[col] = codes[self._undated]
+
+    def _bound(self, day: date) -> int:
+        return int(np.datetime64(pd.Timestamp(day).to_datetime64(), self._unit).view("i8"))
+
+    def _range(self, start: Optional[date], end: Optional[date]) -> Tuple[int, int]:
+        lo = 0 if start is None else int(np.searchsorted(self._times, self._bound(start), side="left"))
+        hi = len(self._times)
+        if end is not None:
+            hi = int(np.searchsorted(self._times, self._bound(end + timedelta(days=1)), side="left"))
+        return lo, max(lo, hi)
+
+    def _selections(self, **selected: Optional[List[str]]) -> Optional[List[Tuple[str, List[str]]]]:
+        # 실제로 거를 컬럼만. 빈 선택이 하나라도 있으면 None(결과 없음)
+        out = []
+        for arg, values in selected.items():
+            if values is None:
+                continue
+            col = FILTER_COLUMNS[arg]
+            values = [v for v in self._categories[col] if v in set(values)]
+            if not values:
+                return None
+            if self._complete[col] and len(values) == len(self._categories[col]):
+                continue
+            out.append((col, values))
+        return out
+
+    def select(
+        self,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        genders: Optional[List[str]] = None,
+        ages: Optional[List[str]] = None,
+        purposes: Optional[List[str]] = None,
+        include_undated: bool = False,
+    ) -> np.ndarray:
+        # include_undated: 날짜 조건이 있어도 일시를 알 수 없는 행을 포함 (편집기: 고칠 수 있도록)
+        selections = self._selections(genders=genders, ages=ages, purposes=purposes)
+        if selections is None:
+            return np.empty(0, dtype=np.intp)
+        lo, hi = self._range(start, end)
+
+        if not selections:
+            dated = self._order[lo:hi]
+        elif lo == hi:
+            dated = self._order[:0]
+        else:
+            # 구간을 덮는 바이트만 OR/AND 한 뒤 비트로 풀어 [lo, hi)만 남긴다
+            b0, b1 = lo // 8, -(-hi // 8)
+            acc = None
+            for col, values in selections:
+                words = self._bitmaps[col][values[0]][b0:b1].copy()
+                for v in values[1:]:
+                    words |= self._bitmaps[col][v][b0:b1]
+                acc = words if acc is None else acc & words
+            bits = np.unpackbits(acc, count=(b1 - b0) * 8)[lo - b0 * 8 : hi - b0 * 8]
+            dated = self._order[lo + np.flatnonzero(bits)]
+        if not self._in_order:
+            dated = np.sort(dated)
+
+        if self._undated.size and (include_undated or (start is None and end is None)):
+            keep = np.ones(self._undated.size, dtype=bool)
+            for col, values in selections:
+                wanted = [self._categories[col].index(v) for v in values]
+                keep &= np.isin(self._undated_codes[col], wanted)
+            if keep.any():
+                return np.sort(np.concatenate([dated, self._undated[keep]]))
+        return dated
+
+    def frame(self, df: pd.DataFrame, **filters) -> pd.DataFrame:
+        # df는 이 인덱스를 만든 프레임
+        return df.iloc[self.select(**filters)]
@@ -0,0 +1,92 @@
+import os
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+import pandas as pd
+
+from log_cache import log_cache
+from storage import VisitorStorage
+
+# --- 오늘 실시간 현황 (관리자 화면 자동 갱신 패널) ---
+# 마지막으로 읽은 위치(저장소 cursor: CSV 저널 바이트 위치 / SQLite 마지막 id)를 기억하고,
+# 갱신할 때는 그 뒤에 추가된 체크인만 읽어 카운터에 더한다 → 갱신 비용은 로그 크기와 무관.
+# 날짜가 바뀌거나 로그가 정리/편집되면(base 변경) 공유 로그 캐시에서 오늘 행만 다시 센다.
+REFRESH_SECONDS = int(os.environ.get("VISITOR_LIVE_SECONDS", "5"))
+
+
+@dataclass
+class _LiveState:
+    day: Optional[str] = None
+    base: Any = None
+    cursor: int = -1
+    total: int = 0
+    by_hour: Counter = field(default_factory=Counter)
+    by_purpose: Counter = field(default_factory=Counter)
+    last_read: int = 0
+
+
+class LiveCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states: Dict[int, _LiveState] = {}
+        self.tail_reads = 0
+        self.resets = 0
+
+    def refresh(self, store: VisitorStorage, now: datetime) -> Dict[str, Any]:
+        # now: 기준 시각(KST). 반환값: 오늘 합계 / 이번 시간 / 목적별 / 시간대별
+        day = now.strftime("%Y-%m-%d")
+        with self._lock:
+            state = self._states.setdefault(id(store), _LiveState())
+            base, cursor = store.state()
+            if state.day != day or state.base != base or cursor < state.cursor:
+                self._reset(store, state, now)
+                mode = "reset"
+            elif cursor != state.cursor:
+                tail, state.cursor = store.read_appended(state.cursor)
+                self._add(state, tail)
+                self.tail_reads += 1
+                mode = "tail"
+            else:
+                state.last_read = 0
+                mode = "idle"
+            return {
+                "day": state.day,
+                "total": state.total,
+                "hour": now.hour,
+                "this_hour": state.by_hour.get(now.hour, 0),
+                "by_hour": dict(sorted(state.by_hour.items())),
+                "by_purpose": dict(state.by_purpose),
+                "last_read": state.last_read,
+                "mode": mode,
+            }
+
+    def _reset(self, store: VisitorStorage, state: _LiveState, now: datetime) -> None:
+        # 공유 로그 캐시(보통 이미 올라와 있다)에서 오늘 행만: 필터 인덱스로 O(log N + 오늘 행 수)
+        df, (base, cursor) = log_cache.load_with_version(store)
+        today = df.iloc[log_cache.filter_index(store, df).select(start=now.date(), end=now.date())]
+        state.day, state.base, state.cursor = now.strftime("%Y-%m-%d"), base, cursor
+        state.total = len(today)
+        state.by_hour = Counter({int(h): int(n) for h, n in today["시간"].value_counts().items()})
+        state.by_purpose = Counter(
+            {str(p): int(n) for p, n in today["이용목록"].value_counts().items() if n > 0}
+        )
+        state.last_read = len(today)
+        self.resets += 1
+
+    def _add(self, state: _LiveState, tail: pd.DataFrame) -> None:
+        # 새 행(저장 형식, 일시 "YYYY-MM-DD HH:MM:SS") 중 오늘 것만 센다
+        state.last_read = len(tail)
+        if tail.empty:
+            return
+        ts = tail["일시"].astype(str)
+        today = ts.str.startswith(state.day)
+        hours = pd.to_numeric(ts[today].str[11:13], errors="coerce").dropna().astype(int)
+        state.total += int(today.sum())
+        state.by_hour.update(hours.tolist())
+        state.by_purpose.update(tail.loc[today, "이용목록"].dropna().astype(str).tolist())
+
+
+live_counter = LiveCounter()
@@ -0,0 +1,301 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+import numpy as np
+
+from timing import quiet_by_default
+
+quiet_by_default()
+
+# --- 키오스크 동시 접속 부하 테스트 ---
+# 태블릿 여러 대가 동시에 성별 → 연령대 → 이용 목적을 누르는 상황을 AppTest로 흉내 낸다.
+# 끝나면 저장소에 실제로 쌓인 행 수(조합별)와 집계 테이블 합계를 제출한 방문 수와 맞춰 보고(유실 검사),
+# 단계별 지연 p50/p95/p99, 처리량, 완료 화면 멈춤(재실행이 --stall초 넘게 걸림)을 JSON으로 남긴다.
+#   python loadtest.py --kiosks 8 --visits 20 --storage csv -o loadtest.json
+#   python loadtest.py --kiosks 6 --storage sharded --sites 3 --seed-rows 100000
+# AppTest는 프로세스 전역 Runtime을 쓰므로 한 프로세스에서 여러 세션을 동시에 돌릴 수 없다
+# → 키오스크 하나 = 프로세스 하나. 같은 작업 폴더의 저장소 파일을 함께 쓴다(프로세스마다 기록 큐 하나).
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+STORAGES = ["csv", "archive", "sqlite", "sharded"]
+STEPS = ["gender", "age", "submit", "complete"]
+PERCENTILES = [50, 95, 99]
+STALL_SECONDS = 1.0
+START_TIMEOUT = 300
+
+
+def _click(at, key: str, page: str) -> float:
+    # 버튼 하나 누르고 재실행 → 다음 화면이 page인지 확인. 반환: 재실행 벽시계 시간
+    t0 = time.perf_counter()
+    at.button(key=key).click().run()
+    elapsed = time.perf_counter() - t0
+    if at.exception:
+        raise RuntimeError(f"{key}: {at.exception[0].value}")
+    if at.session_state.page != page:
+        raise RuntimeError(f"{key}: {page} 화면이 아니라 {at.session_state.page}")
+    return elapsed
+
+
+def kiosk(no: int, workdir: str, visits: int, think: float, site: Optional[str], seed: int, barrier, results) -> None:
+    # 자식 프로세스: 저장소 선택(환경 변수) → 작업 폴더 → 앱 첫 실행 → 모두 준비되면 동시에 시작
+    if site:
+        os.environ["VISITOR_SITE"] = site
+    os.chdir(workdir)
+    sys.path.insert(0, os.path.dirname(APP))
+    from streamlit.testing.v1 import AppTest
+    from schema import AGE_GROUPS, GENDERS, PURPOSES
+
+    rng = random.Random(seed * 1000 + no)
+    out: Dict[str, Any] = {"kiosk": no, "site": site, "ok": 0, "errors": [], "visits": Counter()}
+    lat: Dict[str, List[float]] = {step: [] for step in STEPS}
+    at = AppTest.from_file(APP, default_timeout=120)
+    try:
+        at.run()
+    finally:
+        # 첫 실행이 실패해도 다른 키오스크가 기다리지 않게 장벽은 통과한다
+        barrier.wait(START_TIMEOUT)
+    out["start"] = time.time()
+    for _ in range(visits):
+        gender = rng.randrange(len(GENDERS))
+        age = rng.randrange(len(AGE_GROUPS))
+        purpose = rng.randrange(len(PURPOSES))
+        submitted = False
+        try:
+            lat["gender"].append(_click(at, "mf"[gender], "age"))
+            time.sleep(rng.uniform(0, think))
+            lat["age"].append(_click(at, f"age_{age}", "purpose"))
+            time.sleep(rng.uniform(0, think))
+            lat["submit"].append(_click(at, f"purp_{purpose}", "complete"))
+            submitted = True
+            out["visits"][f"{GENDERS[gender]}|{AGE_GROUPS[age]}|{PURPOSES[purpose]}"] += 1
+            # 완료 화면 타이머(fragment run_every)가 한 번 돈 것처럼 재실행 → 처음 화면으로 돌아와야 한다
+            t0 = time.perf_counter()
+            at.run()
+            lat["complete"].append(time.perf_counter() - t0)
+            if at.session_state.page != "gender":
+                raise RuntimeError(f"완료 화면에서 처음으로 돌아가지 않음: {at.session_state.page}")
+            out["ok"] += 1
+        except Exception as e:
+            out["errors"].append({"submitted": submitted, "error": repr(e)})
+            # 다음 방문은 새 세션(새로고침한 태블릿)으로
+            at = AppTest.from_file(APP, default_timeout=120)
+            at.run()
+    out["end"] = time.time()
+
+    # 이 프로세스의 기록 큐를 비우고 통계를 남긴다
+    from storage import get_storage
+    from write_queue import get_write_queue
+
+    wq = get_write_queue(get_storage())
+    out["flushed"] = wq.flush(30)
+    out["queue"] = wq.stats()
+    out["latency"] = lat
+    results.put(out)
+
+
+def _visit_counts(store) -> Counter:
+    df = store.snapshot()[0]
+    keys = df["성별"].astype(str) + "|" + df["연령대"].astype(str) + "|" + df["이용목록"].astype(str)
+    return Counter(keys.value_counts().to_dict())
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    p = np.percentile(np.asarray(values) * 1000, PERCENTILES)
+    return dict({f"p{q}_ms": float(v) for q, v in zip(PERCENTILES, p)}, max_ms=max(values) * 1000, n=len(values))
+
+
+def run(
+    kiosks: int,
+    visits: int,
+    storage: str,
+    think: float = 0.0,
+    sites: int = 1,
+    seed_rows: int = 0,
+    stall: float = STALL_SECONDS,
+    seed: int = 0,
+    workdir: Optional[str] = None,
+    keep: bool = False,
+) -> Dict[str, Any]:
+    own_dir = workdir is None
+    workdir = os.path.abspath(workdir or tempfile.mkdtemp(prefix="visitor_load_"))
+    os.makedirs(workdir, exist_ok=True)
+    # 자식 프로세스는 환경 변수를 물려받는다. storage 모듈은 import할 때 VISITOR_STORAGE를 읽으므로 그 전에 정한다
+    os.environ["VISITOR_STORAGE"] = storage
+    site_ids = [f"site{i + 1}" for i in range(sites)] if storage == "sharded" and sites > 1 else [None]
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import synth
+        from storage import get_storage
+
+        # 합성 로그는 CSV로 깔고, 다른 백엔드는 get_storage()의 첫 실행 이관으로 옮긴다
+        if seed_rows and not os.path.exists("visitor_log.csv"):
+            synth.write_csv("visitor_log.csv", seed_rows, seed=seed)
+        store = get_storage(storage)
+        store.ensure()
+        before = _visit_counts(store)
+        cube_before = store.cube_total()
+
+        ctx = mp.get_context("spawn")
+        barrier = ctx.Barrier(kiosks)
+        results = ctx.Queue()
+        procs = [
+            ctx.Process(
+                target=kiosk,
+                args=(no, workdir, visits, think, site_ids[no % len(site_ids)], seed, barrier, results),
+            )
+            for no in range(kiosks)
+        ]
+        for p in procs:
+            p.start()
+        # 결과를 먼저 꺼내야 자식이 큐에 막히지 않는다
+        outs = []
+        for p in procs:
+            try:
+                outs.append(results.get(timeout=START_TIMEOUT + visits * 60))
+            except Exception:
+                break
+        for p in procs:
+            p.join(10)
+            if p.is_alive():
+                p.terminate()
+        crashed = kiosks - len(outs)
+
+        # 다른 프로세스가 쓴 것까지 새로 읽는다 (sharded는 새 지점 폴더도 다시 찾는다)
+        store = get_storage(storage)
+        after = _visit_counts(store)
+        cube_after = store.cube_total()
+    finally:
+        os.chdir(cwd)
+        if own_dir and not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    submitted = Counter()
+    for o in outs:
+        submitted.update(o["visits"])
+    written = after - before
+    # 조합별로 맞춘다: 모자라면 유실, 남으면 중복/잘못 기록
+    lost = sum((submitted - written).values())
+    extra = sum((written - submitted).values())
+    # 제출 도중 예외가 난 방문(submitted=False)은 기록됐을 수도, 안 됐을 수도 있다 → 따로 센다
+    uncertain = sum(1 for o in outs for e in o["errors"] if not e["submitted"])
+    lat = {step: [v for o in outs for v in o["latency"][step]] for step in STEPS}
+    wall = (max(o["end"] for o in outs) - min(o["start"] for o in outs)) if outs else 0.0
+    total = sum(submitted.values())
+    report = {
+        "meta": {
+            "ts": datetime.now().isoformat(timespec="seconds"),
+            "storage": storage,
+            "kiosks": kiosks,
+            "visits_per_kiosk": visits,
+            "think_s": think,
+            "sites": [s for s in site_ids if s],
+            "seed_rows": seed_rows,
+            "cpus": os.cpu_count(),
+            "python": sys.version.split()[0],
+            "workdir": workdir if keep or not own_dir else None,
+        },
+        "submitted": total,
+        "completed": sum(o["ok"] for o in outs),
+        "written": sum(written.values()),
+        "lost": lost,
+        "extra": extra,
+        "uncertain": uncertain,
+        "cube_written": cube_after - cube_before,
+        "crashed_kiosks": crashed,
+        "errors": [dict(e, kiosk=o["kiosk"]) for o in outs for e in o["errors"]],
+        "unflushed_kiosks": [o["kiosk"] for o in outs if not o["flushed"]],
+        "wall_s": wall,
+        "throughput_per_s": total / wall if wall > 0 else 0.0,
+        "latency": {step: _percentiles(values) for step, values in lat.items()},
+        "stalls": {step: sum(1 for v in values if v > stall) for step, values in lat.items()},
+        "stall_s": stall,
+        "queues": [dict(o["queue"], kiosk=o["kiosk"], site=o["site"]) for o in outs],
+    }
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    meta = report["meta"]
+    print(
+        f"[{meta['storage']}] 키오스크 {meta['kiosks']}대 × 방문 {meta['visits_per_kiosk']}회"
+        + (f" · 지점 {', '.join(meta['sites'])}" if meta["sites"] else "")
+    )
+    print(
+        f"  제출 {report['submitted']:,} · 기록 {report['written']:,} · 집계 {report['cube_written']:,}"
+        f" · 유실 {report['lost']} · 초과 {report['extra']} · 불확실 {report['uncertain']}"
+    )
+    print(f"  처리량 {report['throughput_per_s']:.1f}건/초 ({report['wall_s']:.1f}초)")
+    print(f"  {'step':<10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'stall':>6}")
+    for step, p in report["latency"].items():
+        if p:
+            print(
+                f"  {step:<10} {p['p50_ms']:>9.1f} {p['p95_ms']:>9.1f} {p['p99_ms']:>9.1f} {p['max_ms']:>9.1f}"
+                f" {report['stalls'][step]:>6}"
+            )
+    for e in report["errors"][:5]:
+        print(f"  오류(키오스크 {e['kiosk']}): {e['error']}")
+
+
+def failures(report: Dict[str, Any]) -> List[str]:
+    out = []
+    if report["lost"] or report["extra"] > report["uncertain"]:
+        out.append(f"기록 불일치 (유실 {report['lost']}, 초과 {report['extra']})")
+    if report["cube_written"] != report["written"]:
+        out.append(f"집계 테이블 합계 불일치 ({report['cube_written']} ≠ {report['written']})")
+    if report["crashed_kiosks"]:
+        out.append(f"결과 없이 끝난 키오스크 {report['crashed_kiosks']}대")
+    if report["errors"]:
+        out.append(f"화면 흐름 오류 {len(report['errors'])}건")
+    if report["stalls"].get("complete"):
+        out.append(f"완료 화면 멈춤 {report['stalls']['complete']}건 (>{report['stall_s']}초)")
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="키오스크 동시 접속 부하 테스트")
+    parser.add_argument("--kiosks", type=int, default=8, help="동시에 돌릴 키오스크(프로세스) 수")
+    parser.add_argument("--visits", type=int, default=10, help="키오스크당 방문 수")
+    parser.add_argument("--storage", choices=STORAGES, default=os.environ.get("VISITOR_STORAGE", "csv"))
+    parser.add_argument("--think", type=float, default=0.0, help="화면 사이 최대 대기(초, 균등 분포)")
+    parser.add_argument("--sites", type=int, default=1, help="sharded: 키오스크를 나눠 둘 지점 수")
+    parser.add_argument("--seed-rows", type=int, default=0, help="시작 전에 합성 로그를 이만큼 깔아 둔다")
+    parser.add_argument("--stall", type=float, default=STALL_SECONDS, help="이보다 오래 걸린 재실행은 멈춤으로 센다")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default="loadtest.json")
+    parser.add_argument("--workdir", default=None, help="저장소 파일을 둘 폴더 (기본: 임시 폴더, 끝나면 삭제)")
+    parser.add_argument("--keep", action="store_true", help="임시 폴더를 지우지 않는다")
+    args = parser.parse_args()
+
+    report = run(
+        args.kiosks,
+        args.visits,
+        args.storage,
+        think=args.think,
+        sites=args.sites,
+        seed_rows=args.seed_rows,
+        stall=args.stall,
+        seed=args.seed,
+        workdir=args.workdir,
+        keep=args.keep,
+    )
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print_report(report)
+    print(f"결과 → {args.output}")
+    problems = failures(report)
+    for p in problems:
+        print(f"실패: {p}")
+    if problems:
+        sys.exit(1)
@@ -0,0 +1,127 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional, Dict, Any, List, Tuple
+
+import pandas as pd
+
+from analytics import derive_features
+from filter_index import FilterIndex
+from schema import COMPACT_COLUMNS, concat_frames, to_compact
+from storage import VisitorStorage
+
+# --- 파싱된 방문 로그 공유 캐시 ---
+# Streamlit은 재실행마다 app.py만 다시 돌고 import된 모듈은 프로세스에 남는다.
+# 그래서 여기 둔 캐시는 관리자 재실행/세션 사이에서 공유된다.
+
+
+def parse_log(df: pd.DataFrame) -> pd.DataFrame:
+    # 압축 형식(일시 datetime64 + 카테고리) + 파생 컬럼(요일/월/ISO 주차/주(기간) 등)
+    # 데이터 버전당 한 번만 계산한다. index(행 ID)는 그대로 둔다.
+    return derive_features(to_compact(df), inplace=True)
+
+
+@dataclass
+class _Entry:
+    df: pd.DataFrame
+    base: Any
+    cursor: int
+    # df에 대한 필터 인덱스 (처음 거를 때 만든다, df가 바뀌면 버린다)
+    index: Optional[FilterIndex] = None
+
+
+class LogCache:
+    def __init__(self, max_queries: int = 16):
+        self._lock = threading.Lock()
+        self._entries: Dict[int, _Entry] = {}
+        # SQLite 필터 질의 결과: (버전, 필터) → DataFrame
+        self._queries: "OrderedDict[Tuple, pd.DataFrame]" = OrderedDict()
+        self._max_queries = max_queries
+        self.hits = 0
+        self.tail_loads = 0
+        self.misses = 0
+
+    def load(self, store: VisitorStorage) -> pd.DataFrame:
+        # 반환된 DataFrame은 공유 객체이므로 호출 측에서 수정하지 않는다 (필요하면 .copy())
+        return self._refresh(store)[0]
+
+    def load_with_version(self, store: VisitorStorage) -> Tuple[pd.DataFrame, Tuple[Any, int]]:
+        # (로그, 데이터 버전) — 버전은 리포트/그래프 캐시 키로 쓴다
+        return self._refresh(store)
+
+    def _refresh(self, store: VisitorStorage) -> Tuple[pd.DataFrame, Tuple[Any, int]]:
+        key = id(store)
+        with self._lock:
+            base, cursor = store.state()
+            entry = self._entries.get(key)
+            if entry is not None and entry.base == base:
+                if entry.cursor == cursor:
+                    self.hits += 1
+                    return entry.df, (entry.base, entry.cursor)
+                if cursor > entry.cursor:
+                    # 마지막 로드 이후 뒤에 추가된 행만 읽어 붙인다
+                    tail, new_cursor = store.read_tail(entry.cursor)
+                    if not tail.empty:
+                        entry.df = concat_frames([entry.df, parse_log(tail)], ignore_index=False)
+                        entry.index = None
+                    entry.cursor = new_cursor
+                    self.tail_loads += 1
+                    return entry.df, (entry.base, entry.cursor)
+
+            # 압축 형식 변환(일시 파싱)은 저장소가 읽으면서 한다 (샤드 저장소는 샤드마다 병렬로)
+            compact, base, cursor = store.snapshot_with(to_compact)
+            entry = _Entry(df=derive_features(compact, inplace=True), base=base, cursor=cursor)
+            self._entries[key] = entry
+            self.misses += 1
+            return entry.df, (entry.base, entry.cursor)
+
+    def query(
+        self,
+        store: VisitorStorage,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        genders: Optional[List[str]] = None,
+        ages: Optional[List[str]] = None,
+        purposes: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        filters = (start, end, genders, ages, purposes)
+        if not store.indexed_reads:
+            # CSV: 캐시된 전체 로그에서 필터 인덱스로 바로 거른다 (파일 재파싱 / 전체 스캔 없음)
+            df = self.load(store)
+            return self.filter_index(store, df).frame(
+                df, start=start, end=end, genders=genders, ages=ages, purposes=purposes
+            )
+
+        # SQLite/Parquet 보관소: 조건에 맞는 부분만 필요한 컬럼으로 읽고, 결과를 (버전, 필터) 단위로 보관
+        qkey = (id(store), store.state(), start, end) + tuple(
+            tuple(v) if v is not None else None for v in (genders, ages, purposes)
+        )
+        with self._lock:
+            if qkey in self._queries:
+                self._queries.move_to_end(qkey)
+                self.hits += 1
+                return self._queries[qkey]
+        df = parse_log(store.load(*filters, columns=COMPACT_COLUMNS))
+        with self._lock:
+            self.misses += 1
+            self._queries[qkey] = df
+            while len(self._queries) > self._max_queries:
+                self._queries.popitem(last=False)
+        return df
+
+    def filter_index(self, store: VisitorStorage, df: pd.DataFrame) -> FilterIndex:
+        # df(load()로 받은 공유 프레임)의 필터 인덱스. 그 사이 로그가 바뀌었으면 df 전용으로 새로 만든다
+        with self._lock:
+            entry = self._entries.get(id(store))
+            if entry is None or entry.df is not df:
+                return FilterIndex(df)
+            if entry.index is None:
+                entry.index = FilterIndex(df)
+            return entry.index
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "tail_loads": self.tail_loads, "misses": self.misses}
+
+
+log_cache = LogCache()
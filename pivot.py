@@ -0,0 +1,137 @@
+from dataclasses import dataclass
+from typing import Optional, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from schema import CATEGORIES, WEEKDAYS
+
+# --- 교차 집계 (성별/연령대/이용목록/요일/시간/연월 → N차원 방문자 수 배열) ---
+# 차원마다 값을 작은 정수 코드(0..k-1)로 바꾸고, 코드들을 하나의 평면 인덱스로 합쳐
+# numpy.bincount 한 번으로 센다 → 문자열 groupby(해시/정렬) 없이 차원 수와 무관하게 한 번 훑는다.
+# 원본 로그(행마다 1명)와 사전 집계 테이블(방문자 수 가중치) 모두 받는다.
+# 결과는 라벨 전체를 갖는 밀집 배열(0 칸 포함) → 히트맵/교차표로 바로 쓴다.
+PIVOT_DIMS = ["성별", "연령대", "이용목록", "요일", "시간", "연월"]
+HOURS = list(range(24))
+
+# 리포트 교차 시트 (시트 이름, 차원). 마지막 차원이 열
+PIVOT_SHEETS = [
+    ("요일×시간", ["요일", "시간"]),
+    ("연령×목적×월", ["연월", "연령대", "이용목록"]),
+]
+
+
+@dataclass
+class Pivot:
+    dims: List[str]
+    labels: List[list]
+    counts: np.ndarray
+
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    def series(self) -> pd.Series:
+        # 0이 아닌 칸만 (MultiIndex → 방문자 수). 조각별 결과를 더할 때 쓴다
+        index = pd.MultiIndex.from_product(self.labels, names=self.dims)
+        out = pd.Series(self.counts.ravel(), index=index, name="방문자 수")
+        return out[out > 0]
+
+    def frame(self) -> pd.DataFrame:
+        # 마지막 차원은 열, 나머지는 행 (1차원이면 방문자 수 한 열)
+        if len(self.dims) == 1:
+            return pd.DataFrame({"방문자 수": self.counts}, index=pd.Index(self.labels[0], name=self.dims[0]))
+        rows = pd.MultiIndex.from_product(self.labels[:-1], names=self.dims[:-1])
+        return pd.DataFrame(
+            self.counts.reshape(len(rows), -1),
+            index=rows if len(self.dims) > 2 else rows.get_level_values(0),
+            columns=pd.Index(self.labels[-1], name=self.dims[-1]),
+        )
+
+
+def _time_values(df: pd.DataFrame) -> np.ndarray:
+    # 원본 로그는 일시, 사전 집계 테이블은 날짜(+시간 컬럼)
+    col = "일시" if "일시" in df.columns else "날짜"
+    return pd.to_datetime(df[col], errors="coerce").to_numpy(dtype="datetime64[ns]")
+
+
+def _codes(df: pd.DataFrame, dim: str, times) -> Tuple[np.ndarray, list]:
+    # dim → (행별 코드, 라벨). 코드 -1 = 알 수 없는 값(목록 밖 / 일시 없음) → 세지 않는다
+    if dim in CATEGORIES:
+        labels = CATEGORIES[dim]
+        values = df[dim]
+        if isinstance(values.dtype, pd.CategoricalDtype) and list(values.cat.categories[: len(labels)]) == labels:
+            # 압축 형식: 고정 카테고리가 앞에 있다(뒤에 덧붙은 값은 목록 밖)
+            codes = values.cat.codes.to_numpy().astype(np.int64)
+            codes[codes >= len(labels)] = -1
+        else:
+            codes = pd.Categorical(values, categories=labels).codes.astype(np.int64)
+        return codes, labels
+
+    if dim == "시간" and "일시" not in df.columns and "시간" in df.columns:
+        # 사전 집계 테이블: 날짜는 자정이고 시간은 별도 컬럼
+        hours = pd.to_numeric(df["시간"], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        codes = np.where(np.isfinite(hours), hours, -1).astype(np.int64)
+        codes[(codes < 0) | (codes > 23)] = -1
+        return codes, HOURS
+
+    ts = times()
+    missing = np.isnat(ts)
+    if dim == "요일":
+        # 1970-01-01은 목요일 → 월요일 = 0
+        codes = (ts.astype("datetime64[D]").astype(np.int64) + 3) % 7
+        labels = WEEKDAYS
+    elif dim == "시간":
+        codes = ts.astype("datetime64[h]").astype(np.int64) % 24
+        labels = HOURS
+    elif dim == "연월":
+        # 1970-01 기준 개월 수 → 데이터에 있는 첫 달부터
+        months = ts.astype("datetime64[M]").astype(np.int64)
+        if missing.all():
+            return np.full(len(ts), -1, dtype=np.int64), []
+        first, last = months[~missing].min(), months[~missing].max()
+        codes = months - first
+        labels = [str(m) for m in np.arange(first, last + 1).astype("datetime64[M]")]
+    else:
+        raise ValueError(f"알 수 없는 차원: {dim} (가능: {', '.join(PIVOT_DIMS)})")
+    codes[missing] = -1
+    return codes, labels
+
+
+def pivot_counts(df: pd.DataFrame, dims: List[str], weights: Optional[str] = None) -> Pivot:
+    # dims 순서대로의 N차원 방문자 수. weights: 사전 집계 테이블이면 "방문자 수"
+    cache: Dict[str, np.ndarray] = {}
+
+    def times() -> np.ndarray:
+        if "ts" not in cache:
+            cache["ts"] = _time_values(df)
+        return cache["ts"]
+
+    flat = np.zeros(len(df), dtype=np.int64)
+    valid = np.ones(len(df), dtype=bool)
+    labels = []
+    for dim in dims:
+        codes, dim_labels = _codes(df, dim, times)
+        # 혼합 기수 인덱스: ((c0 * n1) + c1) * n2 + c2 ...
+        flat = flat * len(dim_labels) + codes
+        valid &= codes >= 0
+        labels.append(dim_labels)
+
+    shape = tuple(len(lab) for lab in labels)
+    size = int(np.prod(shape))
+    w = None if weights is None else df[weights].to_numpy(dtype=np.float64)[valid]
+    counts = np.bincount(flat[valid], weights=w, minlength=size)
+    return Pivot(list(dims), labels, counts.astype(np.int64).reshape(shape))
+
+
+def pivot_table(per_cell: pd.Series, dims: List[str]) -> pd.DataFrame:
+    # Pivot.series() 형태(조각별로 더한 결과) → 교차표. 마지막 차원은 열, 고정 라벨은 전부 펼친다
+    full = {d: CATEGORIES.get(d, WEEKDAYS if d == "요일" else HOURS if d == "시간" else None) for d in dims}
+    if len(dims) == 1:
+        out = per_cell.reindex(full[dims[0]], fill_value=0) if full[dims[0]] else per_cell.sort_index()
+        return out.astype(int).rename_axis(dims[0]).to_frame("방문자 수")
+    out = per_cell.unstack(dims[-1], fill_value=0)
+    if full[dims[-1]] is not None:
+        out = out.reindex(columns=full[dims[-1]], fill_value=0)
+    rows = [full[d] if full[d] is not None else sorted(out.index.unique(d)) for d in dims[:-1]]
+    rows_index = pd.MultiIndex.from_product(rows, names=dims[:-1]) if len(rows) > 1 else pd.Index(rows[0], name=dims[0])
+    return out.reindex(rows_index, fill_value=0).astype(int)
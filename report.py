@@ -0,0 +1,378 @@
+import io
+import itertools
+import json
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Callable, Hashable, Iterable, Iterator, List, Tuple, BinaryIO, Union
+
+import pandas as pd
+
+from analytics import derive_features, has_features
+from pivot import PIVOT_SHEETS, pivot_counts, pivot_table
+from schema import SITE_COLUMN
+
+# --- 엑셀 리포트 (원본 + 집계 시트) ---
+# 원본데이터 시트는 xlsxwriter constant_memory 모드로 청크 단위로 흘려 쓰고,
+# 집계 시트용 카운트는 같은 순회에서 누적한다.
+# 메모리 사용량은 청크 크기 + 집계 키 수(일/주/월)에만 비례하고 전체 행 수와 무관하다.
+EXPORT_COLS = [
+    "일시", "요일",
+    "연도", "월", "일자", "시간",
+    "월-일", "ISO연도", "ISO주차", "연-주",
+    "성별", "연령대", "이용목록",
+]
+CHUNK_ROWS = 50_000
+DATETIME_FORMAT = "YYYY-MM-DD HH:MM:SS"
+# 머리글 행: pandas to_excel 머리글과 같은 모양 (굵게, 테두리, 가운데 정렬)
+HEADER_FORMAT = {"bold": True, "border": 1, "align": "center", "valign": "top"}
+
+# (시트 이름, 키 컬럼 이름, 키 기준 정렬 여부) — 정렬하지 않는 시트는 방문자 수 내림차순
+_AGG_SHEETS = [
+    ("일자집계(월-일)", "월-일", True),
+    ("월별집계", "월", True),
+    ("주별집계(ISO)", "연-주", True),
+    ("목적집계", "이용목록", False),
+    ("성별집계", "성별", False),
+    ("연령집계", "연령대", False),
+]
+
+
+def iter_frame_chunks(df: pd.DataFrame, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    # 메모리에 있는 DataFrame을 복사 없이 구간별로 나눠 준다
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start : start + chunk_rows]
+
+
+def _write_table(ws, rows: Iterable[Iterable[Any]], header: List[str], header_format=None, start_row: int = 0) -> int:
+    if start_row == 0:
+        ws.write_row(0, 0, header, header_format)
+        start_row = 1
+    for values in rows:
+        ws.write_row(start_row, 0, values)
+        start_row += 1
+    return start_row
+
+
+def _export_frames(chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    # 원본 로그 조각 → 파생 컬럼이 붙은 조각 (캐시된 로그 조각이면 파생 컬럼이 이미 있다 → 그대로 쓴다)
+    for chunk in chunks:
+        if not chunk.empty:
+            yield chunk if has_features(chunk) else derive_features(chunk)
+
+
+def _export_cols(temp_df: pd.DataFrame) -> List[str]:
+    # 지점 컬럼은 샤드 저장소에서 읽은 조각에만 있다
+    return [c for c in EXPORT_COLS + [SITE_COLUMN] if c in temp_df.columns]
+
+
+def _add_counts(counts: Dict[str, pd.Series], temp_df: pd.DataFrame) -> None:
+    # 집계 시트용 카운트를 조각마다 누적 (aggregates를 받지 않았을 때)
+    for _, key_col, _ in _AGG_SHEETS:
+        src = "연월" if key_col == "월" else key_col
+        vc = temp_df[src].value_counts()
+        # 카테고리 컬럼은 0건 카테고리도 나오므로 제외하고, 조각 간 합산을 위해 일반 인덱스로
+        vc = vc[vc > 0]
+        vc.index = vc.index.astype(object)
+        counts[key_col] = vc if key_col not in counts else counts[key_col].add(vc, fill_value=0)
+    # 교차 시트: 조각별 bincount 결과(0이 아닌 칸)를 더한다 (연월 범위가 조각마다 달라서 배열 대신 Series)
+    for sheet_name, dims in PIVOT_SHEETS:
+        cells = pivot_counts(temp_df, dims).series()
+        counts[sheet_name] = cells if sheet_name not in counts else counts[sheet_name].add(cells, fill_value=0)
+
+
+def _agg_tables(counts: Dict[str, pd.Series]) -> List[Tuple[str, str, pd.Series]]:
+    # (시트 이름, 키 컬럼, 정렬된 방문자 수) — 모든 형식이 같은 집계 표를 쓴다
+    out = []
+    for sheet_name, key_col, by_key in _AGG_SHEETS:
+        vc = counts[key_col].astype(int)
+        vc = vc.sort_index() if by_key else vc.sort_values(ascending=False, kind="stable")
+        out.append((sheet_name, key_col, vc))
+    return out
+
+
+def _pivot_tables(counts: Dict[str, pd.Series]) -> List[Tuple[str, pd.DataFrame]]:
+    # (시트 이름, 교차표) — 행 차원은 컬럼으로 풀어 둔다. 집계에 없는 시트(외부에서 준 aggregates)는 건너뛴다
+    out = []
+    for sheet_name, dims in PIVOT_SHEETS:
+        if sheet_name in counts:
+            table = pivot_table(counts[sheet_name], dims)
+            table = table[table.sum(axis=1) > 0] if len(dims) > 2 else table
+            table.columns = [str(c) for c in table.columns]
+            out.append((sheet_name, table.reset_index()))
+    return out
+
+
+def write_excel_report(
+    chunks: Iterable[pd.DataFrame],
+    output: Union[str, BinaryIO],
+    meta: Optional[Dict[str, Any]] = None,
+    aggregates: Optional[Dict[str, pd.Series]] = None,
+) -> int:
+    # chunks: 원본 로그 조각들(시간 순). output: 파일 경로 또는 바이너리 파일 객체. 반환값: 행 수
+    # aggregates: 집계 시트 키 컬럼 → 방문자 수 (cube.excel_aggregates). 주면 행 단위 집계를 건너뛴다.
+    # xlsxwriter는 리포트를 처음 만들 때 불러온다 (키오스크 프로세스 시작 시간에서 제외)
+    import xlsxwriter
+
+    wb = xlsxwriter.Workbook(
+        output,
+        {"constant_memory": True, "default_date_format": DATETIME_FORMAT},
+    )
+    ws_raw = wb.add_worksheet("원본데이터")
+    header_fmt = wb.add_format(HEADER_FORMAT)
+
+    counts: Dict[str, pd.Series] = {}
+    row = 0
+    cols: List[str] = []
+    for temp_df in _export_frames(chunks):
+        if not cols:
+            cols = _export_cols(temp_df)
+            ws_raw.write_row(0, 0, cols, header_fmt)
+            row = 1
+
+        out = temp_df[cols].astype(object)
+        out = out.where(out.notna(), None)
+        row = _write_table(ws_raw, out.itertuples(index=False, name=None), cols, header_fmt, row)
+
+        if aggregates is None:
+            _add_counts(counts, temp_df)
+
+    if cols:
+        for sheet_name, key_col, vc in _agg_tables(aggregates if aggregates is not None else counts):
+            _write_table(
+                wb.add_worksheet(sheet_name),
+                zip(vc.index.tolist(), vc.tolist()),
+                [key_col, "방문자 수"],
+                header_fmt,
+            )
+        for sheet_name, table in _pivot_tables(aggregates if aggregates is not None else counts):
+            _write_table(
+                wb.add_worksheet(sheet_name),
+                table.itertuples(index=False, name=None),
+                list(table.columns),
+                header_fmt,
+            )
+
+    if meta:
+        _write_table(wb.add_worksheet("필터정보"), [list(meta.values())], list(meta.keys()), header_fmt)
+
+    wb.close()
+    return max(0, row - 1)
+
+
+# --- 엑셀 외 내보내기 형식 (분석용): 같은 파생 컬럼 + 같은 집계 표 ---
+# 모두 조각 단위로 흘려 쓴다(전체 행을 한 번에 변환하지 않는다).
+#  - CSV 묶음(zip): 원본데이터.csv + 집계 시트별 csv + 필터정보.csv (utf-8-sig, 엑셀에서 바로 열림)
+#  - Parquet: 원본 행(조각마다 행 그룹). 필터정보는 스키마 메타데이터, 집계 표는 파일 끝(footer) 메타데이터
+#  - Arrow IPC 스트림: 원본 행 배치. 필터정보는 스키마 메타데이터, 집계 표는 마지막 빈 배치의 메타데이터
+#    (스트림은 앞으로만 쓰므로 끝에서야 알 수 있는 집계는 마지막에 붙인다)
+CSV_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def write_csv_bundle(
+    chunks: Iterable[pd.DataFrame],
+    output: Union[str, BinaryIO],
+    meta: Optional[Dict[str, Any]] = None,
+    aggregates: Optional[Dict[str, pd.Series]] = None,
+) -> int:
+    counts: Dict[str, pd.Series] = {}
+    rows = 0
+    cols: List[str] = []
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        with io.TextIOWrapper(zf.open("원본데이터.csv", "w"), encoding="utf-8-sig", newline="") as raw:
+            for temp_df in _export_frames(chunks):
+                if not cols:
+                    cols = _export_cols(temp_df)
+                temp_df[cols].to_csv(raw, header=rows == 0, index=False, date_format=CSV_DATETIME_FORMAT)
+                rows += len(temp_df)
+                if aggregates is None:
+                    _add_counts(counts, temp_df)
+        if rows:
+            for sheet_name, key_col, vc in _agg_tables(aggregates if aggregates is not None else counts):
+                table = vc.rename_axis(key_col).reset_index(name="방문자 수")
+                zf.writestr(f"{sheet_name}.csv", table.to_csv(index=False).encode("utf-8-sig"))
+            for sheet_name, table in _pivot_tables(aggregates if aggregates is not None else counts):
+                zf.writestr(f"{sheet_name}.csv", table.to_csv(index=False).encode("utf-8-sig"))
+        if meta:
+            zf.writestr("필터정보.csv", pd.DataFrame([meta]).to_csv(index=False).encode("utf-8-sig"))
+    return rows
+
+
+def _arrow_schema(meta: Optional[Dict[str, Any]], site: bool = False):
+    import pyarrow as pa
+
+    text = pa.dictionary(pa.int32(), pa.string())
+    types = {
+        "일시": pa.timestamp("us"), "요일": text,
+        "연도": pa.int16(), "월": pa.int8(), "일자": pa.int8(), "시간": pa.int8(),
+        "월-일": text, "ISO연도": pa.int16(), "ISO주차": pa.int8(), "연-주": text,
+        "성별": text, "연령대": text, "이용목록": text, SITE_COLUMN: text,
+    }
+    metadata = {"visitor.meta": json.dumps(meta or {}, ensure_ascii=False, default=str)}
+    cols = EXPORT_COLS + [SITE_COLUMN] if site else EXPORT_COLS
+    return pa.schema([(c, types[c]) for c in cols], metadata=metadata)
+
+
+def _arrow_frames(chunks: Iterable[pd.DataFrame], meta: Optional[Dict[str, Any]]):
+    # (스키마, 조각들) — 첫 조각을 보고 지점 컬럼 여부를 정한다 (스키마는 쓰기 전에 정해야 한다)
+    frames = _export_frames(chunks)
+    first = next(frames, None)
+    if first is None:
+        return _arrow_schema(meta), iter(())
+    return _arrow_schema(meta, site=SITE_COLUMN in first.columns), itertools.chain([first], frames)
+
+
+def _arrow_table(temp_df: pd.DataFrame, schema):
+    # 파생 컬럼(카테고리/Int) → 고정 스키마. 문자열 컬럼(원본 CSV 조각)은 사전 인코딩한다
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    arrays = []
+    for field in schema:
+        arr = pa.array(temp_df[field.name], from_pandas=True)
+        if pa.types.is_dictionary(field.type) and not pa.types.is_dictionary(arr.type):
+            arr = pc.dictionary_encode(arr.cast(pa.string()))
+        arrays.append(arr.cast(field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _aggregates_json(counts: Dict[str, pd.Series]) -> str:
+    out = {
+        sheet_name: {"key": key_col, "rows": [[str(k), int(v)] for k, v in vc.items()]}
+        for sheet_name, key_col, vc in _agg_tables(counts)
+    }
+    for sheet_name, table in _pivot_tables(counts):
+        out[sheet_name] = {"columns": list(table.columns), "rows": table.astype(str).values.tolist()}
+    return json.dumps(out, ensure_ascii=False)
+
+
+def write_parquet_report(
+    chunks: Iterable[pd.DataFrame],
+    output: Union[str, BinaryIO],
+    meta: Optional[Dict[str, Any]] = None,
+    aggregates: Optional[Dict[str, pd.Series]] = None,
+) -> int:
+    import pyarrow.parquet as pq
+
+    schema, frames = _arrow_frames(chunks, meta)
+    counts: Dict[str, pd.Series] = {}
+    rows = 0
+    with pq.ParquetWriter(output, schema, compression="zstd") as writer:
+        for temp_df in frames:
+            writer.write_table(_arrow_table(temp_df, schema))
+            rows += len(temp_df)
+            if aggregates is None:
+                _add_counts(counts, temp_df)
+        if rows:
+            writer.add_key_value_metadata(
+                {"visitor.aggregates": _aggregates_json(aggregates if aggregates is not None else counts)}
+            )
+    return rows
+
+
+def write_arrow_report(
+    chunks: Iterable[pd.DataFrame],
+    output: Union[str, BinaryIO],
+    meta: Optional[Dict[str, Any]] = None,
+    aggregates: Optional[Dict[str, pd.Series]] = None,
+) -> int:
+    import pyarrow as pa
+
+    schema, frames = _arrow_frames(chunks, meta)
+    counts: Dict[str, pd.Series] = {}
+    rows = 0
+    with pa.ipc.new_stream(output, schema) as writer:
+        for temp_df in frames:
+            writer.write_table(_arrow_table(temp_df, schema))
+            rows += len(temp_df)
+            if aggregates is None:
+                _add_counts(counts, temp_df)
+        if rows:
+            writer.write_batch(
+                pa.RecordBatch.from_pylist([], schema=schema),
+                custom_metadata={
+                    "visitor.aggregates": _aggregates_json(aggregates if aggregates is not None else counts)
+                },
+            )
+    return rows
+
+
+# 형식 → (쓰는 함수, 확장자, MIME, 버튼 이름)
+EXPORT_FORMATS = {
+    "xlsx": (
+        write_excel_report,
+        "xlsx",
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "엑셀",
+    ),
+    "csv": (write_csv_bundle, "zip", "application/zip", "CSV(zip)"),
+    "parquet": (write_parquet_report, "parquet", "application/vnd.apache.parquet", "Parquet"),
+    "arrow": (write_arrow_report, "arrows", "application/vnd.apache.arrow.stream", "Arrow"),
+}
+
+
+def create_excel_report(df: pd.DataFrame, meta: Optional[Dict[str, Any]] = None) -> bytes:
+    output = io.BytesIO()
+    write_excel_report(iter_frame_chunks(df), output, meta=meta)
+    return output.getvalue()
+
+
+# --- 리포트 지연 생성 + 캐시 ---
+# 다운로드 버튼을 누를 때만 만들고, (데이터 버전, 필터) 키로 보관한다.
+# 보관 용량(max_bytes)을 넘으면 가장 오래 안 쓴 것부터 버린다.
+class ReportCache:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._bytes = 0
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.builds = 0
+        self.evictions = 0
+        # 키별 마지막 생성 시간(초)과 크기 — 캐시에서 밀려나도 화면 안내용으로 남겨 둔다
+        self._builds: "OrderedDict[Hashable, Tuple[float, int]]" = OrderedDict()
+
+    def get_or_build(self, key: Hashable, build: Callable[[], bytes]) -> bytes:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+
+        t0 = time.perf_counter()
+        data = build()
+        seconds = time.perf_counter() - t0
+
+        with self._lock:
+            self.builds += 1
+            self._builds[key] = (seconds, len(data))
+            self._builds.move_to_end(key)
+            while len(self._builds) > 256:
+                self._builds.popitem(last=False)
+            if len(data) > self.max_bytes or key in self._items:
+                return data
+            self._items[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, old = self._items.popitem(last=False)
+                self._bytes -= len(old)
+                self.evictions += 1
+        return data
+
+    def last_build(self, key: Hashable) -> Optional[Tuple[float, int]]:
+        with self._lock:
+            return self._builds.get(key)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "builds": self.builds,
+                "evictions": self.evictions,
+            }
+
+
+report_cache = ReportCache()
@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, union_categoricals
+
+# --- 방문 기록 스키마 ---
+# 저장 형식(CSV/SQLite)은 COLUMNS 그대로 두고, 메모리에서는 압축 형식을 쓴다:
+#   일시 → datetime64, 성별/연령대/이용목록 → 고정 카테고리(Categorical)
+#   요일/월 등은 저장하지 않고 읽을 때 일시에서 계산 (analytics.derive_features)
+COLUMNS = ["일시", "요일", "월", "성별", "연령대", "이용목록"]
+GENDERS = ["남성", "여성"]
+AGE_GROUPS = ["7세 이하", "초등", "중등", "고등", "만 20세~24세", "만 25세 이상"]
+PURPOSES = ["놀이", "휴식", "식사", "친목", "기타"]
+WEEKDAYS = ["월", "화", "수", "목", "금", "토", "일"]
+
+CATEGORIES = {"성별": GENDERS, "연령대": AGE_GROUPS, "이용목록": PURPOSES}
+# 샤드 저장소(지점별 로그)에서 읽을 때 붙는 컬럼. 저장 파일에는 없다(샤드 폴더가 곧 지점)
+SITE_COLUMN = "지점"
+COMPACT_COLUMNS = ["일시"] + list(CATEGORIES)
+# 파서가 문자열 object 배열을 만들지 않고 바로 카테고리로 읽도록 (저장소 로더용)
+READ_DTYPES = {c: "category" for c in list(CATEGORIES) + ["요일"]}
+
+
+def get_kst_now() -> datetime:
+    # 서버 시간대와 무관하게 한국 시각 (체크인 일시/이번 달/추출 시각 모두 이 기준)
+    return datetime.utcnow() + timedelta(hours=9)
+
+
+def as_category(values: pd.Series, categories: List[str]) -> pd.Series:
+    # 고정 카테고리 순서 유지 + 목록에 없는 값(관리자 편집 등)은 뒤에 덧붙여 잃지 않는다
+    cat = values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype("category")
+    extra = sorted(str(c) for c in cat.cat.categories if c not in categories)
+    return cat.cat.set_categories(categories + extra)
+
+
+def to_compact(df: pd.DataFrame) -> pd.DataFrame:
+    # 저장 형식 프레임 → 압축 형식 (일시 + 카테고리 3개)
+    ts = df["일시"]
+    if not is_datetime64_any_dtype(ts):
+        ts = pd.to_datetime(ts, errors="coerce")
+    out = pd.DataFrame({"일시": ts.to_numpy()}, index=df.index)
+    for col, categories in CATEGORIES.items():
+        out[col] = as_category(df[col], categories)
+    if SITE_COLUMN in df.columns:
+        out[SITE_COLUMN] = df[SITE_COLUMN].astype("category")
+    return out
+
+
+def concat_frames(parts: List[pd.DataFrame], ignore_index: bool = True) -> pd.DataFrame:
+    # Categorical 컬럼은 카테고리를 합쳐 이어 붙인다 (그냥 concat하면 카테고리가 다를 때 object로 풀린다)
+    parts = [p for p in parts if len(p)] or parts[:1]
+    if len(parts) == 1:
+        return parts[0].reset_index(drop=True) if ignore_index else parts[0]
+    out = pd.concat(parts, ignore_index=ignore_index)
+    for col in parts[0].columns:
+        if isinstance(out[col].dtype, pd.CategoricalDtype):
+            continue
+        if all(isinstance(p[col].dtype, pd.CategoricalDtype) for p in parts):
+            out[col] = union_categoricals([p[col] for p in parts])
+    return out
+
+
+def load_compact(store, chunk_rows: int = 50_000) -> pd.DataFrame:
+    # 저장소를 조각 단위로 읽어 바로 압축 형식으로 만든다 (object 전체 프레임을 만들지 않음)
+    parts = [to_compact(chunk) for chunk in store.iter_chunks(chunk_rows)]
+    if not parts:
+        return to_compact(pd.DataFrame(columns=COLUMNS))
+    df = concat_frames(parts)
+    # 조각마다 덧붙은 카테고리 순서가 다를 수 있으므로 고정 순서로 다시 맞춘다
+    for col, categories in CATEGORIES.items():
+        df[col] = as_category(df[col], categories)
+    return df
+
+
+def memory_report(store, cached: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    # 기존 방식(read_csv 그대로: 문자열 object + 일시 datetime) vs 압축 형식의 메모리 비교
+    raw = pd.concat(list(store.iter_chunks()), ignore_index=True)
+    raw = raw.astype({c: object for c in raw.columns if c != "월"})
+    raw["일시"] = pd.to_datetime(raw["일시"], errors="coerce")
+    frames = [("기존(object)", raw), ("압축(category/datetime64)", load_compact(store))]
+    if cached is not None:
+        frames.append(("압축 + 파생 컬럼(관리자 캐시)", cached))
+
+    rows = []
+    for name, frame in frames:
+        total = int(frame.memory_usage(deep=True).sum())
+        rows.append(
+            {
+                "형식": name,
+                "행 수": len(frame),
+                "컬럼 수": frame.shape[1],
+                "메모리(MB)": round(total / 1024 / 1024, 2),
+                "바이트/행": round(total / max(1, len(frame)), 1),
+            }
+        )
+    out = pd.DataFrame(rows)
+    out["기존 대비"] = (out["바이트/행"] / max(out["바이트/행"].iloc[0], 1e-9)).round(3)
+    return out
+
+
+if __name__ == "__main__":
+    from storage import get_storage
+
+    print(memory_report(get_storage()).to_string(index=False))
@@ -0,0 +1,1177 @@
+import copy
+import csv
+import io
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Optional, Dict, Any, Callable, List, Tuple, Iterator
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: 프로세스 사이 잠금 없이 프로세스 안 잠금만
+    fcntl = None
+
+from cube import add_to_cube, cube_total, empty_cube, ensure_cube, query_cube, rebuild_cube, remove_from_cube
+from schema import COLUMNS, READ_DTYPES, SITE_COLUMN, concat_frames, get_kst_now
+
+# --- 방문 기록 저장소 ---
+
+
+class CubeUpdateError(RuntimeError):
+    # 로그(저널)에는 기록됐고 사전 집계 테이블 갱신만 실패했다 → 같은 행을 다시 기록하면 안 된다.
+    # 집계 테이블은 관리자 화면의 칸별 검증(cube_matches → rebuild_cube)이 맞춘다.
+    pass
+# VISITOR_STORAGE=csv(기본) | archive | sqlite | sharded 로 백엔드를 고른다.
+DB_FILE = "visitor_log.csv"
+JOURNAL_FILE = "visitor_log.journal.csv"
+SQLITE_FILE = os.environ.get("VISITOR_SQLITE_FILE", "visitor_log.db")
+# CSV 백엔드의 사전 집계 테이블 (SQLite 백엔드는 같은 DB 안에 둔다)
+CUBE_FILE = os.environ.get("VISITOR_CUBE_FILE", "visitor_cube.db")
+STORAGE_BACKEND = os.environ.get("VISITOR_STORAGE", "csv")
+CONFLICT_MESSAGE = "편집하는 동안 다른 곳에서 로그가 정리/수정되었습니다. 새로고침 후 다시 저장해 주세요."
+
+
+def _day_bounds(start: Optional[date], end: Optional[date]) -> Tuple[Optional[str], Optional[str]]:
+    # [start 00:00:00, end+1일 00:00:00) 형태의 문자열 경계 (일시는 "YYYY-MM-DD HH:MM:SS")
+    lo = start.strftime("%Y-%m-%d") if start else None
+    hi = (end + timedelta(days=1)).strftime("%Y-%m-%d") if end else None
+    return lo, hi
+
+
+@contextmanager
+def _sqlite_connect(path: str) -> Iterator[sqlite3.Connection]:
+    # Streamlit 세션마다 스레드가 다르므로 작업 단위로 연결을 열고 닫는다
+    conn = sqlite3.connect(path, timeout=10)
+    try:
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+class _FileLock:
+    # 스레드끼리는 RLock, 프로세스끼리(python storage.py compact 등)는 잠금 파일 flock.
+    # 같은 스레드가 다시 잡으면(apply_changes → compact) flock은 바깥에서 한 번만 잡는다. fcntl이 없으면 프로세스 안에서만
+    def __init__(self, path: str, lock: Optional[threading.RLock] = None):
+        self.path = path
+        self._lock = lock if lock is not None else threading.RLock()
+        self._file = None
+        self._depth = 0
+
+    def __enter__(self) -> "_FileLock":
+        self._lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                f = open(self.path, "a")
+                fcntl.flock(f, fcntl.LOCK_EX)
+            except BaseException:
+                self._lock.release()
+                raise
+            self._file = f
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._lock.release()
+
+
+def _current_month() -> str:
+    # KST 기준 이번 달 "YYYY-MM"
+    return get_kst_now().strftime("%Y-%m")
+
+
+def _normalize_times(values: pd.Series) -> pd.Series:
+    # 파싱 가능한 일시는 "YYYY-MM-DD HH:MM:SS"로 통일, 나머지는 원문 유지
+    parsed = pd.to_datetime(values, errors="coerce")
+    out = values.astype(object).where(values.notna(), None)
+    ok = parsed.notna()
+    out[ok] = parsed[ok].dt.strftime("%Y-%m-%d %H:%M:%S")
+    return out
+
+
+class VisitorStorage:
+    # 백엔드 공통 인터페이스
+    # indexed_reads: load()가 조건에 맞는 부분만 읽는가 (True면 로그 캐시가 전체 로그 대신 load()로 질의한다)
+    indexed_reads = False
+
+    def ensure(self) -> None:
+        raise NotImplementedError
+
+    def append(self, row: Dict[str, Any]) -> None:
+        self.append_many([row])
+
+    def append_many(self, rows: List[Dict[str, Any]]) -> None:
+        # 여러 체크인을 한 번에 기록 (write_queue의 그룹 커밋)
+        raise NotImplementedError
+
+    def load(
+        self,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        genders: Optional[List[str]] = None,
+        ages: Optional[List[str]] = None,
+        purposes: Optional[List[str]] = None,
+        columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        # columns: 읽을 컬럼 (None이면 COLUMNS 전체)
+        raise NotImplementedError
+
+    def replace_all(self, df: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    def apply_changes(
+        self,
+        version: Tuple[Any, int],
+        updates: Dict[int, Dict[str, Any]],
+        deletes: List[int],
+        inserts: List[Dict[str, Any]],
+    ) -> None:
+        # 관리자 편집 결과 중 바뀐 행만 반영한다 (행 ID는 snapshot/read_tail 프레임의 index).
+        # version: 편집을 시작할 때의 state(). 그 사이 base가 바뀌었으면(다른 편집/정리) 행 ID가
+        # 달라졌을 수 있으므로 거부한다. 체크인(cursor 증가)만 있었다면 그대로 반영한다.
+        raise NotImplementedError
+
+    # 캐시용 버전 정보: (base, cursor)
+    # base가 같고 cursor만 커졌다면 그 사이에는 "뒤에 추가"만 일어난 것이다.
+    def state(self) -> Tuple[Any, int]:
+        raise NotImplementedError
+
+    def snapshot(self) -> Tuple[pd.DataFrame, Any, int]:
+        # 전체 로그와, 그것을 읽은 시점의 (base, cursor). index = 행 ID
+        raise NotImplementedError
+
+    def read_tail(self, cursor: int) -> Tuple[pd.DataFrame, int]:
+        # cursor 이후에 추가된 행만 읽는다 (index = 행 ID, snapshot에 이어지는 값)
+        raise NotImplementedError
+
+    def snapshot_with(self, prepare: Callable[[pd.DataFrame], pd.DataFrame]) -> Tuple[pd.DataFrame, Any, int]:
+        # snapshot + 전처리(로그 캐시: 압축 형식 변환). 샤드 저장소는 샤드마다 병렬로 읽고 처리한다
+        df, base, cursor = self.snapshot()
+        return prepare(df), base, cursor
+
+    def read_appended(self, cursor: int) -> Tuple[pd.DataFrame, int]:
+        # read_tail과 같되 행 ID는 맞추지 않는다 (새 행의 내용만 필요할 때: 실시간 현황)
+        return self.read_tail(cursor)
+
+    def iter_chunks(self, chunk_rows: int = 50_000) -> Iterator[pd.DataFrame]:
+        # 전체 로그를 시간(기록) 순서대로 조각내어 읽는다 (대용량 내보내기용)
+        raise NotImplementedError
+
+    # 사전 집계 테이블 (cube.py)
+    def cube(
+        self,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        genders: Optional[List[str]] = None,
+        ages: Optional[List[str]] = None,
+        purposes: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def cube_total(self) -> int:
+        raise NotImplementedError
+
+    def rebuild_cube(self, df: Optional[pd.DataFrame] = None) -> int:
+        # 원본 로그로 집계 테이블 재생성 (df를 주면 다시 읽지 않는다)
+        raise NotImplementedError
+
+    def pending_size(self) -> int:
+        # 정리(compaction) 대기 중인 바이트 수
+        return 0
+
+    def compact(self) -> int:
+        return 0
+
+    # 지점 (샤드 저장소만 여러 개. 나머지 백엔드는 지점 구분 없이 자기 자신)
+    def sites(self) -> List[str]:
+        return []
+
+    def for_sites(self, sites: Optional[List[str]]) -> "VisitorStorage":
+        return self
+
+
+# --- CSV 원본 + 추가 전용 저널 ---
+# 키오스크 체크인은 저널 파일에 한 줄만 추가하고(O(1)),
+# 정리(compaction) 단계에서 저널을 원본 visitor_log.csv 뒤에 이어 붙인다.
+class CsvStorage(VisitorStorage):
+    def __init__(self, db_path: str = DB_FILE, journal_path: str = JOURNAL_FILE, cube_path: str = CUBE_FILE):
+        self.db_path = db_path
+        self.journal_path = journal_path
+        # 정리 중인 저널(정리 도중에 들어온 체크인은 새 저널로 간다)
+        self.pending_path = journal_path + ".compacting"
+        self.cube_path = cube_path
+        # 정리가 원본에 붙이기 직전의 원본 크기 (붙이다/지우다 중단되면 여기까지 되돌리고 다시 붙인다)
+        self.offset_path = self.pending_path + ".offset"
+        # 정리/편집 저장/보관 작업끼리 겹치지 않도록 (관리자 여러 명, 백그라운드 보관)
+        self._lock = threading.RLock()
+        self._log_lock = _FileLock(db_path + ".lock", self._lock)
+        # 집계 테이블 갱신(체크인/편집)과 재생성이 겹치면 재생성이 읽은 뒤 더해진 칸이 두 번 세어지거나 사라진다
+        # 잠금 순서: 집계 → 로그
+        self._cube_lock = _FileLock(cube_path + ".lock")
+        # 행 ID = 로그 안에서의 순번. (base, 저널 위치) → 그 위치 다음 행의 ID
+        self._next_id: Tuple[Any, int, int] = (None, -1, 0)
+
+    def _locked(self) -> _FileLock:
+        # 저널/원본을 바꾸는 작업의 잠금
+        return self._log_lock
+
+    def ensure(self) -> None:
+        with self._locked():
+            self._ensure_log()
+            # 지난 정리가 중간에 끊겼으면 원본을 붙이기 전 상태로 되돌려 둔다 (정리 중 저널은 그대로 남는다)
+            self._recover_compaction()
+        with _sqlite_connect(self.cube_path) as conn:
+            ensure_cube(conn)
+
+    def _ensure_log(self) -> None:
+        if not os.path.exists(self.db_path):
+            pd.DataFrame(columns=COLUMNS).to_csv(self.db_path, index=False, encoding="utf-8-sig")
+
+    def append_many(self, rows: List[Dict[str, Any]]) -> None:
+        # 헤더 없는 CSV 줄들을 한 번의 write + fsync로 추가 (O_APPEND)
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\n").writerows([[row.get(c, "") for c in COLUMNS] for row in rows])
+        # 정리(compact)가 저널 이름을 바꾸는 동안에는 쓰지 않는다 (바뀐 파일에 쓴 줄은 사라진다)
+        with self._cube_lock:
+            with self._locked():
+                with open(self.journal_path, "a", encoding="utf-8", newline="") as f:
+                    f.write(buf.getvalue())
+                    f.flush()
+                    os.fsync(f.fileno())
+            # 집계 테이블은 별도 파일이라 로그와 한 트랜잭션은 아니다 → 관리자 화면에서 칸별로 검증
+            try:
+                with _sqlite_connect(self.cube_path) as conn:
+                    add_to_cube(conn, rows)
+            except sqlite3.Error as e:
+                raise CubeUpdateError(f"집계 테이블 갱신 실패(로그는 기록됨): {e}") from e
+
+    def _parse_journal(self, data: bytes) -> pd.DataFrame:
+        if not data:
+            return pd.DataFrame(columns=COLUMNS)
+        return pd.read_csv(io.BytesIO(data), header=None, names=COLUMNS, encoding="utf-8", dtype=READ_DTYPES)
+
+    def _read_journal_bytes(self, path: str, offset: int = 0) -> bytes:
+        # offset 이후의 "완결된 줄"만 반환 (쓰는 중인 마지막 줄은 다음 번에 읽는다)
+        if not os.path.exists(path):
+            return b""
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        return data[: data.rfind(b"\n") + 1]
+
+    def state(self) -> Tuple[Any, int]:
+        # 원본/정리 중 저널이 바뀌면 base가 바뀌고, 저널에 추가되면 cursor만 커진다
+        db = os.stat(self.db_path)
+        pending = os.stat(self.pending_path) if os.path.exists(self.pending_path) else None
+        base = (db.st_size, db.st_mtime_ns, (pending.st_size, pending.st_mtime_ns) if pending else None)
+        cursor = os.path.getsize(self.journal_path) if os.path.exists(self.journal_path) else 0
+        return base, cursor
+
+    def _read_hot(self) -> Tuple[pd.DataFrame, Any, int]:
+        # 원본 + (정리 중인 저널) + 저널 순서로 읽어 하나로 합친다. 행 ID 위치(_next_id)는 건드리지 않는다
+        base, _ = self.state()
+        df = pd.read_csv(self.db_path, dtype=READ_DTYPES)
+        journal = self._read_journal_bytes(self.journal_path)
+        tails = [
+            self._parse_journal(self._read_journal_bytes(self.pending_path)),
+            self._parse_journal(journal),
+        ]
+        return concat_frames([df] + tails), base, len(journal)
+
+    def snapshot(self) -> Tuple[pd.DataFrame, Any, int]:
+        with self._lock:
+            df, base, cursor = self._read_hot()
+            self._next_id = (base, cursor, len(df))
+        return df, base, cursor
+
+    def load_all(self) -> pd.DataFrame:
+        return self.snapshot()[0]
+
+    def read_tail(self, cursor: int) -> Tuple[pd.DataFrame, int]:
+        # _next_id는 다운로드 콜백 등 다른 스레드도 읽고 쓰므로 잠금 안에서만 다룬다
+        with self._lock:
+            base = self.state()[0]
+            first = self._first_id(base, cursor)
+            data = self._read_journal_bytes(self.journal_path, cursor)
+            tail = self._parse_journal(data)
+            tail.index = pd.RangeIndex(first, first + len(tail))
+            self._next_id = (base, cursor + len(data), first + len(tail))
+        return tail, cursor + len(data)
+
+    def read_appended(self, cursor: int) -> Tuple[pd.DataFrame, int]:
+        # 행 ID 계산(_first_id)은 다른 곳에서 더 읽었으면 전체 로그를 읽어야 하므로 건너뛴다
+        data = self._read_journal_bytes(self.journal_path, cursor)
+        return self._parse_journal(data), cursor + len(data)
+
+    def _first_id(self, base: Any, cursor: int) -> int:
+        # self._lock 안에서 부른다
+        if self._next_id[:2] == (base, cursor):
+            return self._next_id[2]
+        # 이 프로세스에서 해당 위치까지 읽은 적이 없으면 전체 행 수에서 cursor 뒤 저널 행 수를 뺀다
+        df, _, end = self.snapshot()
+        after = 0
+        if end > cursor:
+            with open(self.journal_path, "rb") as f:
+                f.seek(cursor)
+                after = f.read(end - cursor).count(b"\n")
+        return len(df) - after
+
+    def iter_chunks(self, chunk_rows: int = 50_000) -> Iterator[pd.DataFrame]:
+        with pd.read_csv(self.db_path, chunksize=chunk_rows, dtype=READ_DTYPES) as reader:
+            yield from reader
+        for path in (self.pending_path, self.journal_path):
+            data = self._read_journal_bytes(path)
+            if data:
+                with pd.read_csv(
+                    io.BytesIO(data),
+                    header=None,
+                    names=COLUMNS,
+                    encoding="utf-8",
+                    chunksize=chunk_rows,
+                    dtype=READ_DTYPES,
+                ) as reader:
+                    yield from reader
+
+    def load(self, start=None, end=None, genders=None, ages=None, purposes=None, columns=None) -> pd.DataFrame:
+        df = self.load_all()
+        if not (start is None and end is None and genders is None and ages is None and purposes is None):
+            df = filter_frame(df, start, end, genders, ages, purposes)
+        return df if columns is None else df[columns]
+
+    def replace_all(self, df: pd.DataFrame) -> None:
+        # 관리자 편집 결과로 전체 로그를 교체 (임시 파일 + 원자적 교체)
+        out = df.copy()
+        for c in COLUMNS:
+            if c not in out.columns:
+                out[c] = None
+        with self._cube_lock:
+            with self._locked():
+                self._replace_csv(out)
+                self._clear_journals()
+            self.rebuild_cube(out)
+
+    def apply_changes(self, version, updates, deletes, inserts) -> None:
+        # 행 ID = 로그 안의 순번. 편집 중에 들어온 체크인은 저널 뒤에 있으므로 ID가 겹치지 않는다.
+        with self._cube_lock:
+            with self._locked():
+                if self.state()[0] != version[0]:
+                    raise RuntimeError(CONFLICT_MESSAGE)
+                # 저널을 먼저 원본 뒤로 옮겨 두면, 편집 대상 행은 모두 원본 파일 안에 있다
+                CsvStorage.compact(self)
+                removed = self._edit_files(updates, deletes, inserts)
+            with _sqlite_connect(self.cube_path) as conn:
+                remove_from_cube(conn, removed)
+                add_to_cube(conn, list(updates.values()) + inserts)
+
+    def _edit_files(self, updates, deletes, inserts) -> List[Dict[str, Any]]:
+        # 손대지 않은 행은 읽은 문자열 그대로 다시 쓴다. 반환값: 수정/삭제 전 행
+        raw = pd.read_csv(self.db_path, dtype=str, keep_default_na=False)
+        raw, removed = _apply_rows(raw, 0, updates, deletes)
+        self._replace_csv(pd.concat([raw, _csv_frame(inserts)], ignore_index=True))
+        return removed
+
+    def _replace_csv(self, df: pd.DataFrame) -> None:
+        tmp = self.db_path + ".tmp"
+        df[COLUMNS].to_csv(tmp, index=False, encoding="utf-8-sig")
+        os.replace(tmp, self.db_path)
+
+    def _clear_journals(self) -> None:
+        # 편집본에 이미 저널 내용이 포함되어 있으므로 저널은 비운다
+        for path in (self.pending_path, self.journal_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def cube(self, start=None, end=None, genders=None, ages=None, purposes=None) -> pd.DataFrame:
+        with _sqlite_connect(self.cube_path) as conn:
+            return query_cube(conn, start, end, genders, ages, purposes)
+
+    def cube_total(self) -> int:
+        with _sqlite_connect(self.cube_path) as conn:
+            return cube_total(conn)
+
+    def rebuild_cube(self, df: Optional[pd.DataFrame] = None) -> int:
+        # 잠금 안에서 읽으면 체크인이 끼어들 수 없다. 미리 읽은 df를 받으면 그 뒤에 들어온 체크인은
+        # 빠지지만, 데이터 버전이 바뀌므로 다음 검증(app.py)이 다시 맞춘다
+        with self._cube_lock:
+            if df is None:
+                df = self.load_all()
+            with _sqlite_connect(self.cube_path) as conn:
+                return rebuild_cube(conn, df)
+
+    def pending_size(self) -> int:
+        total = 0
+        for path in (self.pending_path, self.journal_path):
+            if os.path.exists(path):
+                total += os.path.getsize(path)
+        return total
+
+    def compact(self) -> int:
+        # 저널을 원본 뒤에 바이트 단위로 이어 붙인다 (전체 재작성 없음). 반환값: 옮긴 행 수
+        # 체크인 기록(append_many)/다른 정리와 겹치지 않게 잠근다 (정리 중 저널 이름 변경 → 읽기 → 삭제)
+        with self._locked():
+            self._recover_compaction()
+            if not os.path.exists(self.pending_path):
+                if not os.path.exists(self.journal_path) or os.path.getsize(self.journal_path) == 0:
+                    return 0
+                os.replace(self.journal_path, self.pending_path)
+
+            with open(self.pending_path, "rb") as f:
+                data = f.read()
+            if data and not data.endswith(b"\n"):
+                data += b"\n"
+
+            self._ensure_log()
+            # 붙이기 전 원본 크기를 먼저 남긴다: 붙인 뒤 정리 중 저널을 지우기 전에 죽으면
+            # 다음 정리(또는 시작 시 ensure)가 여기까지 잘라 내고 다시 붙인다 → 같은 방문이 두 번 들어가지 않는다
+            self._write_offset(os.path.getsize(self.db_path))
+            with open(self.db_path, "rb+") as out:
+                out.seek(0, os.SEEK_END)
+                if out.tell() > 0:
+                    out.seek(-1, os.SEEK_END)
+                    if out.read(1) != b"\n":
+                        out.write(b"\n")
+                out.write(data)
+                out.flush()
+                os.fsync(out.fileno())
+
+            os.remove(self.pending_path)
+            os.remove(self.offset_path)
+            return data.count(b"\n")
+
+    def _write_offset(self, offset: int) -> None:
+        tmp = self.offset_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(str(offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.offset_path)
+
+    def _recover_compaction(self) -> None:
+        # _locked() 안에서 부른다. 표시가 남아 있으면 지난 정리가 끝나지 못한 것
+        if not os.path.exists(self.offset_path):
+            return
+        if os.path.exists(self.pending_path) and os.path.exists(self.db_path):
+            # 정리 중 저널이 남아 있다 = 원본에 (일부/전부) 붙였지만 지우지 못했다 → 붙인 부분을 잘라 낸다
+            with open(self.offset_path, encoding="utf-8") as f:
+                offset = int(f.read().strip() or 0)
+            if os.path.getsize(self.db_path) > offset:
+                with open(self.db_path, "rb+") as out:
+                    out.truncate(offset)
+                    out.flush()
+                    os.fsync(out.fileno())
+        # 정리 중 저널이 없으면 이미 끝난 정리(표시만 못 지웠다)
+        os.remove(self.offset_path)
+
+
+def filter_frame(
+    df: pd.DataFrame,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    genders: Optional[List[str]] = None,
+    ages: Optional[List[str]] = None,
+    purposes: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    # 관리자 상세 필터와 같은 조건을 DataFrame에 적용 (CSV 백엔드용)
+    ts = pd.to_datetime(df["일시"], errors="coerce")
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= ts >= pd.Timestamp(start)
+    if end is not None:
+        mask &= ts < pd.Timestamp(end + timedelta(days=1))
+    if genders is not None:
+        mask &= df["성별"].isin(genders)
+    if ages is not None:
+        mask &= df["연령대"].isin(ages)
+    if purposes is not None:
+        mask &= df["이용목록"].isin(purposes)
+    return df[mask]
+
+
+def to_storage_rows(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    # 편집기 프레임(일시 datetime, 카테고리, Int8 등) → 저장 형식 행 (일시 "YYYY-MM-DD HH:MM:SS", 빈 값 None)
+    out = df.reindex(columns=COLUMNS).astype(object)
+    out["일시"] = _normalize_times(out["일시"])
+    rows = []
+    for rec in out.to_dict("records"):
+        row = {}
+        for col, value in rec.items():
+            if value is None or pd.isna(value) or value == "":
+                value = None
+            elif col == "월":
+                month = pd.to_numeric(value, errors="coerce")
+                value = int(month) if pd.notna(month) else str(value)
+            else:
+                value = str(value)
+            row[col] = value
+        rows.append(row)
+    return rows
+
+
+def diff_frames(
+    before: pd.DataFrame, after: pd.DataFrame
+) -> Tuple[Dict[int, Dict[str, Any]], List[int], List[Dict[str, Any]]]:
+    # 편집 전/후 프레임(index = 행 ID) → (수정 {ID: 행}, 삭제 [ID], 추가 [행])
+    # st.data_editor가 새 행에 붙이는 index는 편집 전 최대 ID + 1 이상이라 기존 ID와 겹치지 않는다.
+    kept = after.index[after.index.isin(before.index)]
+    deletes = [int(i) for i in before.index[~before.index.isin(after.index)]]
+    old_rows = to_storage_rows(before.loc[kept])
+    new_rows = to_storage_rows(after.loc[kept])
+    updates = {int(i): new for i, old, new in zip(kept, old_rows, new_rows) if new != old}
+    # 값을 하나도 넣지 않은 빈 행은 추가하지 않는다
+    inserts = [r for r in to_storage_rows(after[~after.index.isin(before.index)]) if any(v is not None for v in r.values())]
+    return updates, deletes, inserts
+
+
+def _csv_frame(rows: List[Dict[str, Any]]) -> pd.DataFrame:
+    # 저장 형식 행 → CSV에 그대로 쓸 문자열 프레임
+    values = [["" if r.get(c) is None else str(r[c]) for c in COLUMNS] for r in rows]
+    return pd.DataFrame(values, columns=COLUMNS, dtype=object)
+
+
+def _apply_rows(
+    raw: pd.DataFrame, first_id: int, updates: Dict[int, Dict[str, Any]], deletes: List[int]
+) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+    # raw의 행 ID는 first_id부터 순번. 범위 안의 수정/삭제만 적용하고 (결과, 수정/삭제 전 행)을 돌려준다
+    raw = raw.astype(object)
+    raw.index = pd.RangeIndex(first_id, first_id + len(raw))
+    changed = [i for i in updates if i in raw.index]
+    dropped = [i for i in deletes if i in raw.index]
+    removed = raw.loc[changed + dropped, COLUMNS].to_dict("records")
+    if changed:
+        new = _csv_frame([updates[i] for i in changed])
+        raw.loc[changed, COLUMNS] = new.to_numpy()
+    return raw.drop(index=dropped).reset_index(drop=True), removed
+
+
+# --- CSV(이번 달) + 월별 Parquet 보관소(지난 달) ---
+# 체크인/저널/정리는 CsvStorage 그대로이고, 달이 바뀌면 지난 달 기록을 보관소로 옮긴다(rotate).
+# 기간 조회는 기간에 걸친 월 파티션과 이번 달 CSV만 읽는다.
+class ArchiveStorage(CsvStorage):
+    indexed_reads = True
+
+    def __init__(
+        self,
+        db_path: str = DB_FILE,
+        journal_path: str = JOURNAL_FILE,
+        cube_path: str = CUBE_FILE,
+        archive_dir: Optional[str] = None,
+    ):
+        super().__init__(db_path, journal_path, cube_path)
+        # pyarrow.dataset / parquet 는 보관소 백엔드를 쓸 때만 불러온다
+        from archive import ARCHIVE_DIR, ParquetArchive
+
+        self.archive = ParquetArchive(archive_dir or ARCHIVE_DIR)
+        self._rotated_month: Optional[str] = None
+
+    def append_many(self, rows: List[Dict[str, Any]]) -> None:
+        super().append_many(rows)
+        # 이번 달 첫 체크인이면 지난 달 기록 보관을 백그라운드로 시작 (체크인 응답은 기다리지 않는다)
+        if self._rotated_month is not None and self._rotated_month != _current_month():
+            self._rotated_month = None
+            threading.Thread(target=self.rotate, daemon=True).start()
+
+    def state(self) -> Tuple[Any, int]:
+        base, cursor = super().state()
+        return (base, self.archive.state()), cursor
+
+    def snapshot(self) -> Tuple[pd.DataFrame, Any, int]:
+        # 보관소(지난 달) → 원본 CSV(이번 달) → 저널 순서. base에는 보관소 상태도 들어간다(self.state()).
+        with self._lock:
+            archived = self.archive.read()
+            df, base, cursor = self._read_hot()
+            df = concat_frames([archived, df])
+            self._next_id = (base, cursor, len(df))
+        return df, base, cursor
+
+    def iter_chunks(self, chunk_rows: int = 50_000) -> Iterator[pd.DataFrame]:
+        yield from self.archive.iter_chunks(chunk_rows)
+        yield from super().iter_chunks(chunk_rows)
+
+    def load(self, start=None, end=None, genders=None, ages=None, purposes=None, columns=None) -> pd.DataFrame:
+        lo, hi = _day_bounds(start, end)
+        columns = list(columns or COLUMNS)
+        # 보관(rotate)이 보관소에 쓰고 원본 CSV를 줄이는 사이에 읽으면 같은 행이 두 번(또는 0번) 보인다 → snapshot처럼 잠근다
+        with self._lock:
+            archived = self.archive.read(lo, hi, genders, ages, purposes, columns)
+            # 이번 달(+미정리 저널)은 작으므로 읽어서 거른다. 행 ID 위치는 보관소 행까지 센 snapshot()만 정한다
+            hot = filter_frame(self._read_hot()[0], start, end, genders, ages, purposes)
+        return concat_frames([archived, hot[columns]])
+
+    def _split(self, df: pd.DataFrame, month: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        # (이번 달 이후 + 일시를 알 수 없는 행, 지난 달 행 — 일시는 정규화된 문자열)
+        parsed = pd.to_datetime(df["일시"], errors="coerce")
+        cold = parsed.notna() & (parsed < pd.Timestamp(f"{month}-01"))
+        old = df[cold].copy()
+        old["일시"] = parsed[cold].dt.strftime("%Y-%m-%d %H:%M:%S")
+        return df[~cold], old
+
+    def rotate(self, month: Optional[str] = None) -> int:
+        # month(기본: 이번 달) 이전 기록을 원본 CSV에서 보관소로 옮긴다. 반환값: 옮긴 행 수
+        month = month or _current_month()
+        with self._locked():
+            CsvStorage.compact(self)
+            stat = os.stat(self.db_path)
+            hot, cold = self._split(pd.read_csv(self.db_path, dtype=READ_DTYPES), month)
+            if not cold.empty:
+                # 파일 이름을 원본 CSV 상태로 정하면, CSV를 줄이기 전에 중단되어도 재시도가 덮어쓴다
+                self.archive.write(cold, f"{stat.st_size}-{stat.st_mtime_ns}")
+                self._replace_csv(hot)
+            self._rotated_month = month
+        return len(cold)
+
+    def compact(self) -> int:
+        with self._locked():
+            moved = super().compact()
+            if self._rotated_month != _current_month():
+                self.rotate()
+        return moved
+
+    def _edit_files(self, updates, deletes, inserts) -> List[Dict[str, Any]]:
+        # 행 ID: 보관소 행이 먼저(0..), 그 뒤가 원본 CSV
+        archived = self.archive.read()
+        first_hot = len(archived)
+        removed = []
+        if any(i < first_hot for i in list(updates) + list(deletes)):
+            # 지난 달 기록을 고친 경우에만 보관소를 다시 쓴다 (바뀐 일시가 이번 달이면 원본 CSV 앞으로)
+            archived["월"] = pd.to_numeric(archived["월"], errors="coerce").astype("Int64")
+            archived, removed = _apply_rows(archived, 0, updates, deletes)
+            hot_from_archive, archived = self._split(archived, _current_month())
+            self.archive.replace(archived, f"edit-{datetime.utcnow():%Y%m%d%H%M%S}")
+        else:
+            hot_from_archive = None
+        raw = pd.read_csv(self.db_path, dtype=str, keep_default_na=False)
+        raw, removed_hot = _apply_rows(raw, first_hot, updates, deletes)
+        parts = [p for p in (hot_from_archive, raw, _csv_frame(inserts)) if p is not None]
+        self._replace_csv(pd.concat(parts, ignore_index=True))
+        # 지난 달 일시로 추가/수정된 행은 바로 보관소로
+        self._rotated_month = None
+        self.rotate()
+        return removed + removed_hot
+
+    def replace_all(self, df: pd.DataFrame) -> None:
+        out = df.copy()
+        for c in COLUMNS:
+            if c not in out.columns:
+                out[c] = None
+        with self._cube_lock:
+            with self._locked():
+                month = _current_month()
+                hot, cold = self._split(out, month)
+                self.archive.replace(cold, f"edit-{datetime.utcnow():%Y%m%d%H%M%S}")
+                self._replace_csv(hot)
+                self._clear_journals()
+                self._rotated_month = month
+            self.rebuild_cube(out)
+
+
+# --- SQLite (WAL + 일시 인덱스) ---
+# 컬럼명은 SQL에서 영문, DataFrame으로 나갈 때 한글 COLUMNS로 바꾼다.
+_SQL_COLUMNS = {
+    "일시": "ts",
+    "요일": "weekday",
+    "월": "month",
+    "성별": "gender",
+    "연령대": "age",
+    "이용목록": "purpose",
+}
+
+
+class SqliteStorage(VisitorStorage):
+    indexed_reads = True
+
+    def __init__(self, path: str = SQLITE_FILE):
+        self.path = path
+
+    def _connect(self):
+        return _sqlite_connect(self.path)
+
+    def ensure(self) -> None:
+        with self._connect() as conn:
+            # WAL: 관리자 조회(읽기)가 키오스크 INSERT를 막지 않는다
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS visits (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ts TEXT,
+                    weekday TEXT,
+                    month INTEGER,
+                    gender TEXT,
+                    age TEXT,
+                    purpose TEXT
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_visits_ts ON visits(ts)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            ensure_cube(conn)
+
+    def count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM visits").fetchone()[0]
+
+    def append_many(self, rows: List[Dict[str, Any]]) -> None:
+        with self._connect() as conn:
+            self._insert(conn, rows)
+            # 같은 트랜잭션에서 집계 테이블도 갱신 (둘 다 반영되거나 둘 다 안 된다)
+            add_to_cube(conn, rows)
+
+    def _insert(self, conn: sqlite3.Connection, rows: List[Dict[str, Any]]) -> None:
+        sql_cols = list(_SQL_COLUMNS.values())
+        conn.executemany(
+            f"INSERT INTO visits ({', '.join(sql_cols)}) VALUES ({', '.join('?' * len(sql_cols))})",
+            [tuple(r.get(c) for c in COLUMNS) for r in rows],
+        )
+
+    def apply_changes(self, version, updates, deletes, inserts) -> None:
+        # 행 ID = visits.id. 수정/삭제/추가와 집계 테이블 갱신을 한 트랜잭션으로
+        select = ", ".join(f'{sql} AS "{ko}"' for ko, sql in _SQL_COLUMNS.items())
+        assignments = ", ".join(f"{sql} = ?" for sql in _SQL_COLUMNS.values())
+        ids = list(updates) + list(deletes)
+        with self._connect() as conn:
+            if self._generation(conn) != version[0]:
+                raise RuntimeError(CONFLICT_MESSAGE)
+            removed = []
+            if ids:
+                removed = pd.read_sql_query(
+                    f"SELECT {select} FROM visits WHERE id IN ({', '.join('?' * len(ids))})", conn, params=ids
+                ).to_dict("records")
+            conn.executemany(
+                f"UPDATE visits SET {assignments} WHERE id = ?",
+                [tuple(row.get(c) for c in COLUMNS) + (i,) for i, row in updates.items()],
+            )
+            conn.executemany("DELETE FROM visits WHERE id = ?", [(i,) for i in deletes])
+            self._insert(conn, inserts)
+            remove_from_cube(conn, removed)
+            add_to_cube(conn, list(updates.values()) + inserts)
+            if ids:
+                self._bump_generation(conn)
+
+    def load(self, start=None, end=None, genders=None, ages=None, purposes=None, columns=None) -> pd.DataFrame:
+        columns = list(columns or COLUMNS)
+        where, params = [], []
+        lo, hi = _day_bounds(start, end)
+        # ts 범위 조건 → idx_visits_ts 인덱스 탐색
+        if lo is not None:
+            where.append("ts >= ?")
+            params.append(lo)
+        if hi is not None:
+            where.append("ts < ?")
+            params.append(hi)
+        for col, values in (("gender", genders), ("age", ages), ("purpose", purposes)):
+            if values is None:
+                continue
+            if not values:
+                return pd.DataFrame(columns=columns)
+            where.append(f"{col} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+
+        select = ", ".join(f'{_SQL_COLUMNS[ko]} AS "{ko}"' for ko in columns)
+        query = f"SELECT {select} FROM visits"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY id"
+        with self._connect() as conn:
+            return pd.read_sql_query(query, conn, params=params)
+
+    def iter_chunks(self, chunk_rows: int = 50_000) -> Iterator[pd.DataFrame]:
+        select = ", ".join(f'{sql} AS "{ko}"' for ko, sql in _SQL_COLUMNS.items())
+        with self._connect() as conn:
+            yield from pd.read_sql_query(f"SELECT {select} FROM visits ORDER BY id", conn, chunksize=chunk_rows)
+
+    def _generation(self, conn: sqlite3.Connection) -> int:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0]) if row else 0
+
+    def state(self) -> Tuple[Any, int]:
+        # base = 수정/삭제 세대 번호, cursor = 마지막 id (INSERT만 있으면 cursor만 커진다)
+        with self._connect() as conn:
+            cursor = conn.execute("SELECT COALESCE(MAX(id), 0) FROM visits").fetchone()[0]
+            return self._generation(conn), cursor
+
+    def _read_since(self, conn: sqlite3.Connection, cursor: int) -> Tuple[pd.DataFrame, int]:
+        select = ", ".join(f'{sql} AS "{ko}"' for ko, sql in _SQL_COLUMNS.items())
+        df = pd.read_sql_query(
+            f"SELECT id, {select} FROM visits WHERE id > ? ORDER BY id", conn, params=[cursor]
+        )
+        new_cursor = int(df["id"].max()) if not df.empty else cursor
+        return df.set_index("id").rename_axis(None), new_cursor
+
+    def snapshot(self) -> Tuple[pd.DataFrame, Any, int]:
+        with self._connect() as conn:
+            generation = self._generation(conn)
+            df, cursor = self._read_since(conn, 0)
+        return df, generation, cursor
+
+    def read_tail(self, cursor: int) -> Tuple[pd.DataFrame, int]:
+        with self._connect() as conn:
+            return self._read_since(conn, cursor)
+
+    def replace_all(self, df: pd.DataFrame) -> None:
+        out = df.copy()
+        for c in COLUMNS:
+            if c not in out.columns:
+                out[c] = None
+        out["일시"] = _normalize_times(out["일시"])
+        out = out[COLUMNS].astype(object).where(out[COLUMNS].notna(), None)
+        with self._connect() as conn:
+            conn.execute("DELETE FROM visits")
+            self._bump_generation(conn)
+            self._insert(conn, out.to_dict("records"))
+            rebuild_cube(conn, out)
+
+    def cube(self, start=None, end=None, genders=None, ages=None, purposes=None) -> pd.DataFrame:
+        with self._connect() as conn:
+            return query_cube(conn, start, end, genders, ages, purposes)
+
+    def cube_total(self) -> int:
+        with self._connect() as conn:
+            return cube_total(conn)
+
+    def rebuild_cube(self, df: Optional[pd.DataFrame] = None) -> int:
+        with self._connect() as conn:
+            if df is None:
+                # 쓰기 잠금을 먼저 잡고 같은 트랜잭션에서 읽는다 (읽은 뒤 들어온 체크인이 지워지지 않게)
+                conn.execute("BEGIN IMMEDIATE")
+                cols = ", ".join(f'{sql} AS "{ko}"' for ko, sql in _SQL_COLUMNS.items())
+                df = pd.read_sql_query(f"SELECT {cols} FROM visits", conn)
+            return rebuild_cube(conn, df)
+
+    def _bump_generation(self, conn: sqlite3.Connection) -> None:
+        # 기존 행이 바뀌었음을 캐시에 알린다 (INSERT는 id 증가로 충분)
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('generation', 1) "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+
+    def pending_size(self) -> int:
+        wal = self.path + "-wal"
+        return os.path.getsize(wal) if os.path.exists(wal) else 0
+
+    def compact(self) -> int:
+        # WAL 내용을 본 DB 파일에 반영하고 WAL을 비운다
+        with self._connect() as conn:
+            busy, log_frames, _ = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        return 0 if busy else log_frames
+
+
+# --- 지점/키오스크별 샤드: <VISITOR_SHARD_DIR>/<지점>/visitor_log.csv (+ 저널, 집계 테이블) ---
+# 프로세스마다 VISITOR_SITE 샤드(CsvStorage 하나)에만 쓴다 → 지점끼리 같은 파일/락을 두고 다투지 않는다.
+# 읽을 때는 샤드 폴더를 찾아 스레드 풀로 나눠 읽고(파일 읽기 + 파싱), 일시 순으로 합쳐 하나의 로그로 본다.
+# 합친 로그에는 지점 컬럼(SITE_COLUMN)이 붙는다.
+#   행 ID = 샤드 번호 << SHARD_ID_BITS | 샤드 안의 행 ID → 편집 결과는 해당 샤드로 돌려보낸다
+#   state() = ((지점, 샤드 base) 튜플, 샤드별 cursor 튜플) → 뒤에 추가만 있었다면 cursor 원소는 커지기만 한다
+#   지점 필터는 고른 샤드만 담은 보기(for_sites) → 고르지 않은 샤드는 열지도 않는다
+SHARD_DIR = os.environ.get("VISITOR_SHARD_DIR", "sites")
+SITE_ID = os.environ.get("VISITOR_SITE", "main")
+SHARD_WORKERS = int(os.environ.get("VISITOR_SHARD_WORKERS", "8"))
+SHARD_ID_BITS = 40
+
+
+class ShardedStorage(VisitorStorage):
+    def __init__(self, root: str = SHARD_DIR, site: str = SITE_ID):
+        if not re.fullmatch(r"[\w.-]+", site):
+            raise ValueError(f"지점 ID에는 글자/숫자/._- 만 쓸 수 있습니다: {site!r}")
+        self.root = root
+        self.site = site
+        # None = 전체 지점, 아니면 for_sites로 고른 지점
+        self.only: Optional[frozenset] = None
+        # 보기(for_sites)끼리 공유: 샤드 객체 / 보기 객체 (같은 선택 → 같은 객체 → 로그 캐시 재사용)
+        self._shards: Dict[str, CsvStorage] = {}
+        self._views: Dict[frozenset, "ShardedStorage"] = {}
+        self._lock = threading.Lock()
+
+    def shard(self, site: str) -> CsvStorage:
+        with self._lock:
+            if site not in self._shards:
+                folder = os.path.join(self.root, site)
+                os.makedirs(folder, exist_ok=True)
+                self._shards[site] = CsvStorage(
+                    os.path.join(folder, DB_FILE),
+                    os.path.join(folder, JOURNAL_FILE),
+                    os.path.join(folder, os.path.basename(CUBE_FILE)),
+                )
+            return self._shards[site]
+
+    def sites(self) -> List[str]:
+        # 원본 CSV가 있는 하위 폴더 = 지점 (이 프로세스의 지점은 항상 포함). 번호(행 ID)는 이 순서
+        found = {self.site}
+        if os.path.isdir(self.root):
+            with os.scandir(self.root) as entries:
+                found.update(e.name for e in entries if e.is_dir() and os.path.exists(os.path.join(e.path, DB_FILE)))
+        return sorted(found)
+
+    def for_sites(self, sites: Optional[List[str]]) -> "ShardedStorage":
+        if sites is None:
+            return self
+        key = frozenset(sites)
+        with self._lock:
+            if key not in self._views:
+                view = copy.copy(self)
+                view.only = key
+                self._views[key] = view
+            return self._views[key]
+
+    def _selected(self) -> List[Tuple[int, str]]:
+        return [(no, site) for no, site in enumerate(self.sites()) if self.only is None or site in self.only]
+
+    def _map(self, fn: Callable[[Tuple[int, str]], Any], selected: List[Tuple[int, str]]) -> List[Any]:
+        if len(selected) <= 1:
+            return [fn(item) for item in selected]
+        with ThreadPoolExecutor(max_workers=min(len(selected), SHARD_WORKERS)) as pool:
+            return list(pool.map(fn, selected))
+
+    @staticmethod
+    def _tag(df: pd.DataFrame, no: int, site: str) -> pd.DataFrame:
+        df.index = df.index + (no << SHARD_ID_BITS)
+        df[SITE_COLUMN] = site
+        return df
+
+    @staticmethod
+    def _merge(parts: List[pd.DataFrame], selected: List[Tuple[int, str]]) -> pd.DataFrame:
+        # 샤드 조각들 → 일시 순 하나의 프레임 (같은 시각이면 지점 순, 샤드 안에서는 기록 순. 일시 없는 행은 뒤로)
+        if not parts:
+            return pd.DataFrame(columns=COLUMNS + [SITE_COLUMN])
+        df = concat_frames(parts, ignore_index=False)
+        df[SITE_COLUMN] = pd.Categorical(df[SITE_COLUMN], categories=[site for _, site in selected])
+        if len(parts) > 1:
+            df = df.sort_values("일시", kind="stable", na_position="last")
+        return df
+
+    def ensure(self) -> None:
+        for site in self.sites():
+            self.shard(site).ensure()
+
+    def append_many(self, rows: List[Dict[str, Any]]) -> None:
+        self.shard(self.site).append_many(rows)
+
+    def state(self) -> Tuple[Any, Any]:
+        selected = self._selected()
+        states = [self.shard(site).state() for _, site in selected]
+        return tuple((site, b) for (_, site), (b, _) in zip(selected, states)), tuple(c for _, c in states)
+
+    def snapshot_with(self, prepare: Callable[[pd.DataFrame], pd.DataFrame]) -> Tuple[pd.DataFrame, Any, Any]:
+        selected = self._selected()
+
+        def read(item: Tuple[int, str]):
+            no, site = item
+            raw, base, cursor = self.shard(site).snapshot()
+            return self._tag(prepare(raw), no, site), base, cursor
+
+        parts = self._map(read, selected)
+        df = self._merge([p[0] for p in parts], selected)
+        return df, tuple((site, p[1]) for (_, site), p in zip(selected, parts)), tuple(p[2] for p in parts)
+
+    def snapshot(self) -> Tuple[pd.DataFrame, Any, Any]:
+        return self.snapshot_with(lambda raw: raw)
+
+    def _read_since(self, cursor: Tuple[int, ...], appended: bool) -> Tuple[pd.DataFrame, Tuple[int, ...]]:
+        # cursor가 커진 샤드만 읽는다 (base가 같으면 샤드 구성도 같다)
+        selected = self._selected()
+        parts, new = [], []
+        for (no, site), old in zip(selected, cursor):
+            shard = self.shard(site)
+            if shard.state()[1] > old:
+                tail, old = shard.read_appended(old) if appended else shard.read_tail(old)
+                parts.append(self._tag(tail, no, site))
+            new.append(old)
+        return self._merge(parts, selected), tuple(new)
+
+    def read_tail(self, cursor: Tuple[int, ...]) -> Tuple[pd.DataFrame, Tuple[int, ...]]:
+        return self._read_since(cursor, appended=False)
+
+    def read_appended(self, cursor: Tuple[int, ...]) -> Tuple[pd.DataFrame, Tuple[int, ...]]:
+        return self._read_since(cursor, appended=True)
+
+    def iter_chunks(self, chunk_rows: int = 50_000) -> Iterator[pd.DataFrame]:
+        # 지점별 조각을 일시 순으로 병합 (_merge와 같은 순서: 같은 시각이면 지점 순, 일시 없는 행은 맨 뒤)
+        # 샤드 안은 기록 순(= 거의 시간 순)이므로, 샤드마다 읽어 둔 조각 중 모든 샤드가 지나간 시각
+        # (샤드별 마지막 일시 중 가장 이른 것)까지만 내보낸다 → 메모리는 샤드 수 × 조각 크기
+        readers: Dict[str, Iterator[pd.DataFrame]] = {}
+        for _, site in self._selected():
+            readers[site] = iter(self.shard(site).iter_chunks(chunk_rows))
+        buffers: Dict[str, pd.DataFrame] = {}
+        undated: List[pd.DataFrame] = []
+        while readers or any(len(b) for b in buffers.values()):
+            for site in list(readers):
+                while site not in buffers or buffers[site].empty:
+                    chunk = next(readers[site], None)
+                    if chunk is None:
+                        del readers[site]
+                        break
+                    chunk = chunk.assign(**{SITE_COLUMN: site})
+                    ts = pd.to_datetime(chunk["일시"], errors="coerce")
+                    undated.append(chunk[ts.isna()])
+                    buffers[site] = chunk[ts.notna()].assign(_ts=ts[ts.notna()])
+            live = [buffers[site]["_ts"].max() for site in readers if site in buffers]
+            bound = min(live) if live else None
+            ready = []
+            for site in list(buffers):
+                buf = buffers[site]
+                take = buf["_ts"] <= bound if bound is not None else pd.Series(True, index=buf.index)
+                ready.append(buf[take])
+                buffers[site] = buf[~take]
+            merged = concat_frames(ready).sort_values("_ts", kind="stable").drop(columns="_ts")
+            for start in range(0, len(merged), chunk_rows):
+                yield merged.iloc[start : start + chunk_rows].reset_index(drop=True)
+        rest = concat_frames(undated) if undated else pd.DataFrame()
+        for start in range(0, len(rest), chunk_rows):
+            yield rest.iloc[start : start + chunk_rows].reset_index(drop=True)
+
+    def load(self, start=None, end=None, genders=None, ages=None, purposes=None, columns=None) -> pd.DataFrame:
+        # 지점 컬럼은 columns와 상관없이 붙는다
+        selected = self._selected()
+
+        def read(item: Tuple[int, str]) -> pd.DataFrame:
+            no, site = item
+            return self._tag(self.shard(site).load(start, end, genders, ages, purposes).copy(), no, site)
+
+        df = self._merge(self._map(read, selected), selected)
+        return df if columns is None else df[list(columns) + [SITE_COLUMN]]
+
+    def replace_all(self, df: pd.DataFrame) -> None:
+        # 지점 컬럼이 있으면 지점별로 나눠 쓰고, 없으면 전부 이 프로세스의 지점으로 (나머지 샤드는 비운다)
+        if SITE_COLUMN in df.columns:
+            groups = {str(site): part for site, part in df.groupby(SITE_COLUMN, observed=True)}
+        else:
+            groups = {self.site: df}
+        for site in sorted(set(s for _, s in self._selected()) | set(groups)):
+            shard = self.shard(site)
+            shard.ensure()
+            shard.replace_all(groups.get(site, df.iloc[:0]).drop(columns=SITE_COLUMN, errors="ignore"))
+
+    def apply_changes(self, version, updates, deletes, inserts) -> None:
+        # 행 ID의 샤드 번호로 나눠 각 샤드에 반영 (각 샤드가 자기 base로 다시 충돌 검사)
+        # 새로 추가한 행은 이 프로세스의 지점으로 간다
+        bases = dict(version[0])
+        if tuple(bases) != tuple(site for _, site in self._selected()):
+            raise RuntimeError(CONFLICT_MESSAGE)
+        mask = (1 << SHARD_ID_BITS) - 1
+        for no, site in self._selected():
+            local_updates = {i & mask: row for i, row in updates.items() if i >> SHARD_ID_BITS == no}
+            local_deletes = [i & mask for i in deletes if i >> SHARD_ID_BITS == no]
+            local_inserts = inserts if site == self.site else []
+            if local_updates or local_deletes or local_inserts:
+                self.shard(site).apply_changes((bases[site], None), local_updates, local_deletes, local_inserts)
+
+    def cube(self, start=None, end=None, genders=None, ages=None, purposes=None) -> pd.DataFrame:
+        # 지점별 집계 테이블을 이어 붙인다 (같은 칸이 여러 번 나와도 요약은 합계라 그대로 쓴다)
+        parts = [self.shard(site).cube(start, end, genders, ages, purposes) for _, site in self._selected()]
+        parts = [p for p in parts if not p.empty]
+        return pd.concat(parts, ignore_index=True) if parts else empty_cube()
+
+    def cube_total(self) -> int:
+        return sum(self.shard(site).cube_total() for _, site in self._selected())
+
+    def rebuild_cube(self, df: Optional[pd.DataFrame] = None) -> int:
+        # df는 지점 컬럼이 있을 때만 쓰고, 없으면 샤드마다 자기 로그로 다시 만든다
+        total = 0
+        for _, site in self._selected():
+            part = None
+            if df is not None and SITE_COLUMN in df.columns:
+                part = df[df[SITE_COLUMN] == site]
+            total += self.shard(site).rebuild_cube(part)
+        return total
+
+    def pending_size(self) -> int:
+        return sum(self.shard(site).pending_size() for _, site in self._selected())
+
+    def compact(self) -> int:
+        return sum(self.shard(site).compact() for _, site in self._selected())
+
+
+def migrate_csv_to_sqlite(csv_store: CsvStorage, sqlite_store: SqliteStorage) -> int:
+    # 기존 CSV(+저널)를 SQLite로 한 번만 옮긴다. 반환값: 옮긴 행 수
+    sqlite_store.ensure()
+    with sqlite_store._connect() as conn:
+        done = conn.execute("SELECT value FROM meta WHERE key = 'migrated_from'").fetchone()
+    if done or sqlite_store.count() > 0 or not os.path.exists(csv_store.db_path):
+        return 0
+    df = csv_store.load_all()
+    sqlite_store.replace_all(df)
+    with sqlite_store._connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from', ?)",
+            (os.path.abspath(csv_store.db_path),),
+        )
+    return len(df)
+
+
+def migrate_csv_to_shard(csv_store: CsvStorage, store: ShardedStorage) -> int:
+    # 기존 단일 CSV(+저널)를 이 프로세스 지점의 샤드로 한 번만 옮긴다. 반환값: 옮긴 행 수
+    marker = os.path.join(store.root, "migrated_from")
+    if os.path.exists(marker) or not os.path.exists(csv_store.db_path):
+        return 0
+    shard = store.shard(store.site)
+    shard.ensure()
+    moved = 0
+    if not len(shard.load_all()):
+        df = csv_store.load_all()
+        shard.replace_all(df)
+        moved = len(df)
+    with open(marker, "w", encoding="utf-8") as f:
+        f.write(os.path.abspath(csv_store.db_path))
+    return moved
+
+
+_STORES: Dict[str, VisitorStorage] = {}
+
+
+def get_storage(backend: str = STORAGE_BACKEND) -> VisitorStorage:
+    # 프로세스당 한 번만 준비(스키마 생성/이관)하고 이후에는 재사용
+    if backend in _STORES:
+        return _STORES[backend]
+    if backend == "sqlite":
+        store = SqliteStorage()
+        store.ensure()
+        migrate_csv_to_sqlite(CsvStorage(), store)
+    elif backend == "csv":
+        store = CsvStorage()
+        store.ensure()
+    elif backend == "sharded":
+        store = ShardedStorage()
+        store.ensure()
+        migrate_csv_to_shard(CsvStorage(), store)
+    elif backend == "archive":
+        store = ArchiveStorage()
+        store.ensure()
+        # 기존 CSV에 남아 있는 지난 달 기록을 보관소로 (이미 옮겼으면 CSV만 확인하고 끝)
+        store.rotate()
+    else:
+        raise ValueError(f"알 수 없는 저장소 백엔드: {backend}")
+    _STORES[backend] = store
+    return store
+
+
+if __name__ == "__main__":
+    import sys
+
+    cmd = sys.argv[1:]
+    if cmd == ["compact"]:
+        print(f"정리 완료: {get_storage().compact()}건")
+    elif cmd == ["rebuild-cube"]:
+        print(f"집계 테이블 재생성 완료: {get_storage().rebuild_cube()}칸")
+    elif cmd == ["rotate"]:
+        if STORAGE_BACKEND != "archive":
+            print("rotate는 VISITOR_STORAGE=archive 에서만 사용합니다.")
+        else:
+            store = ArchiveStorage()
+            store.ensure()
+            print(f"보관 완료: {store.rotate()}건 → {store.archive.root}")
+    elif cmd == ["migrate"]:
+        moved = migrate_csv_to_sqlite(CsvStorage(), SqliteStorage())
+        print(f"이관 완료: {moved}건 → {SQLITE_FILE}")
+    else:
+        print("사용법: python storage.py compact | rebuild-cube | rotate | migrate")
@@ -0,0 +1,105 @@
+import argparse
+import os
+from datetime import date, timedelta
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from schema import AGE_GROUPS, COLUMNS, GENDERS, PURPOSES, WEEKDAYS
+
+# --- 합성 방문 로그 생성기 (벤치마크용) ---
+# 실제 운영 패턴을 흉내 낸다: 10~21시 운영, 오후/방과 후 피크, 주말 방문 많음,
+# 연령대별로 이용 목적 비중이 다름(어린 연령은 놀이, 성인은 휴식/친목).
+# 결과는 앱이 쓰는 visitor_log.csv 형식 그대로(시간 순, utf-8-sig).
+HOUR_WEIGHTS = {
+    10: 3, 11: 4, 12: 6, 13: 7, 14: 8, 15: 10,
+    16: 12, 17: 12, 18: 9, 19: 6, 20: 4, 21: 2,
+}
+# 월 ~ 일
+WEEKDAY_WEIGHTS = [0.8, 0.8, 0.9, 0.9, 1.1, 1.8, 1.6]
+AGE_WEIGHTS = [0.10, 0.30, 0.25, 0.20, 0.08, 0.07]
+# 연령대(AGE_GROUPS 순서) → 이용 목적(PURPOSES 순서: 놀이, 휴식, 식사, 친목, 기타) 비중
+PURPOSE_WEIGHTS = [
+    [0.70, 0.10, 0.10, 0.05, 0.05],
+    [0.55, 0.10, 0.15, 0.15, 0.05],
+    [0.35, 0.20, 0.15, 0.25, 0.05],
+    [0.20, 0.30, 0.15, 0.30, 0.05],
+    [0.10, 0.35, 0.15, 0.30, 0.10],
+    [0.10, 0.40, 0.15, 0.20, 0.15],
+]
+WRITE_CHUNK_ROWS = 1_000_000
+
+
+def default_days(rows: int) -> int:
+    # 하루 150명 안팎 → 1만 행 ≈ 두 달, 100만 행 이상은 10년으로 고정(하루 방문 수가 커진다)
+    return int(min(3650, max(30, rows // 150)))
+
+
+def generate(rows: int, days: Optional[int] = None, end: Optional[date] = None, seed: int = 0) -> pd.DataFrame:
+    # 저장 형식(COLUMNS) DataFrame. 일시는 datetime64 (to_csv에서 문자열로)
+    rng = np.random.default_rng(seed)
+    days = days or default_days(rows)
+    end = end or date.today()
+    start = pd.Timestamp(end - timedelta(days=days - 1))
+
+    day_index = pd.date_range(start, periods=days, freq="D")
+    day_p = np.asarray(WEEKDAY_WEIGHTS)[day_index.weekday]
+    day = rng.choice(days, size=rows, p=day_p / day_p.sum())
+
+    hours = np.fromiter(HOUR_WEIGHTS, dtype=np.int64)
+    hour_p = np.fromiter(HOUR_WEIGHTS.values(), dtype=np.float64)
+    hour = rng.choice(hours, size=rows, p=hour_p / hour_p.sum())
+    seconds = day * 86_400 + hour * 3_600 + rng.integers(0, 3_600, size=rows)
+    seconds.sort()
+    ts = start + pd.to_timedelta(seconds, unit="s")
+
+    age = rng.choice(len(AGE_GROUPS), size=rows, p=AGE_WEIGHTS)
+    # 연령대별 목적 분포: 누적 확률에서 한 번에 뽑는다
+    cum = np.cumsum(np.asarray(PURPOSE_WEIGHTS), axis=1)
+    purpose = (rng.random(rows)[:, None] > cum[age]).sum(axis=1).clip(max=len(PURPOSES) - 1)
+    gender = rng.integers(0, len(GENDERS), size=rows)
+
+    return pd.DataFrame(
+        {
+            "일시": ts,
+            "요일": pd.Categorical.from_codes(ts.weekday, categories=WEEKDAYS),
+            "월": ts.month,
+            "성별": pd.Categorical.from_codes(gender, categories=GENDERS),
+            "연령대": pd.Categorical.from_codes(age, categories=AGE_GROUPS),
+            "이용목록": pd.Categorical.from_codes(purpose, categories=PURPOSES),
+        },
+        columns=COLUMNS,
+    )
+
+
+def write_csv(path: str, rows: int, days: Optional[int] = None, end: Optional[date] = None, seed: int = 0) -> str:
+    # 큰 파일은 나눠서 기록한다 (생성은 한 번에, 문자열 변환/쓰기는 조각 단위)
+    df = generate(rows, days, end, seed)
+    tmp = path + ".tmp"
+    for i, lo in enumerate(range(0, max(len(df), 1), WRITE_CHUNK_ROWS)):
+        df.iloc[lo : lo + WRITE_CHUNK_ROWS].to_csv(
+            tmp,
+            mode="w" if i == 0 else "a",
+            header=i == 0,
+            index=False,
+            encoding="utf-8-sig" if i == 0 else "utf-8",
+            date_format="%Y-%m-%d %H:%M:%S",
+        )
+    os.replace(tmp, path)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="합성 방문 로그(visitor_log.csv 형식) 생성")
+    parser.add_argument("rows", type=int)
+    # 기본 출력은 운영 로그(visitor_log.csv)와 다른 이름 — 앱 폴더에서 실행해도 실제 기록을 덮어쓰지 않는다
+    parser.add_argument("-o", "--output", default="synthetic_visitor_log.csv")
+    parser.add_argument("--days", type=int, default=None, help="기간(일). 기본: 행 수에 따라 30~3650")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--force", action="store_true", help="이미 있는 파일을 덮어쓴다")
+    args = parser.parse_args()
+    if os.path.exists(args.output) and not args.force:
+        parser.error(f"{args.output} 이(가) 이미 있습니다. 덮어쓰려면 --force")
+    write_csv(args.output, args.rows, args.days, seed=args.seed)
+    print(f"{args.rows:,}행 → {args.output}")
@@ -0,0 +1,61 @@
+import os
+import threading
+import time
+
+import pandas as pd
+
+from archive import ParquetArchive
+
+# --- 보관소 전체 교체(관리자 편집 저장) ---
+
+
+def _frame(n, month="2024-04"):
+    return pd.DataFrame(
+        {
+            "일시": [f"{month}-01 10:00:{i % 60:02d}" for i in range(n)],
+            "요일": "월",
+            "월": int(month[-2:]),
+            "성별": "여성",
+            "연령대": "초등",
+            "이용목록": "놀이",
+        }
+    )
+
+
+def test_replace_keeps_legacy_layout_readable(tmp_path):
+    archive = ParquetArchive(str(tmp_path / "archive"))
+    archive.write(_frame(3), "old")
+    assert archive.count() == 3
+    archive.replace(_frame(5, "2024-03"), "edit-1")
+    assert archive.months() == ["2024-03"]
+    assert len(archive.read()) == 5
+    archive.replace(_frame(2), "edit-2")
+    assert len(archive.read()) == 2
+    # 지금 버전 + 바로 전 버전만 남는다 (처음의 month=... 폴더는 지워졌다)
+    assert sorted(e for e in os.listdir(archive.root) if e != "CURRENT") == sorted(
+        e for e in os.listdir(archive.root) if e.startswith("v-")
+    )
+    assert len(os.listdir(archive.root)) == 3
+
+
+def test_readers_never_see_empty_archive(tmp_path):
+    archive = ParquetArchive(str(tmp_path / "archive"))
+    archive.replace(_frame(4), "edit-0")
+    seen, stop = set(), threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            try:
+                seen.add(len(archive.read()))
+            except OSError as e:
+                seen.add(repr(e))
+
+    t = threading.Thread(target=reader)
+    t.start()
+    for i in range(30):
+        archive.replace(_frame(4), f"edit-{i + 1}")
+        # 바로 전 버전은 다음 교체 때까지 남는다 → 읽기 한 번이 교체 두 번에 걸치지 않게
+        time.sleep(0.01)
+    stop.set()
+    t.join()
+    assert seen == {4}
@@ -0,0 +1,75 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import storage
+from storage import CsvStorage
+
+# --- 저널 정리(compact) 회귀 테스트 ---
+# 원본에 붙인 뒤 정리 중 저널을 지우기 전에 죽어도, 다시 정리하면 같은 방문이 두 번 들어가면 안 된다.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _row(i):
+    return {"일시": f"2024-05-01 10:{i // 60:02d}:{i % 60:02d}", "요일": "수", "월": 5, "성별": "여성", "연령대": "초등", "이용목록": "놀이"}
+
+
+def _crash_before_cleanup(monkeypatch, store):
+    real_remove = os.remove
+
+    def remove(path):
+        if path == store.pending_path:
+            raise OSError("crash")
+        real_remove(path)
+
+    monkeypatch.setattr(storage.os, "remove", remove)
+    with pytest.raises(OSError):
+        store.compact()
+    monkeypatch.setattr(storage.os, "remove", real_remove)
+
+
+def test_compact_retry_after_crash(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = CsvStorage()
+    store.ensure()
+    store.append_many([_row(i) for i in range(5)])
+    _crash_before_cleanup(monkeypatch, store)
+    store.append_many([_row(i) for i in range(5, 8)])
+
+    assert store.compact() == 5
+    assert store.compact() == 3
+    assert len(store.load_all()) == 8
+
+
+def test_restart_after_crash(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = CsvStorage()
+    store.ensure()
+    store.append_many([_row(i) for i in range(4)])
+    _crash_before_cleanup(monkeypatch, store)
+
+    # 새 프로세스 시작: ensure가 붙인 부분을 되돌리고, 정리 중 저널은 읽기에 그대로 들어간다
+    restarted = CsvStorage()
+    restarted.ensure()
+    assert len(restarted.load_all()) == 4
+    restarted.compact()
+    assert len(restarted.load_all()) == 4
+
+
+def test_cli_compact_while_appending(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = CsvStorage()
+    store.ensure()
+    env = dict(os.environ, PYTHONPATH=ROOT, VISITOR_STORAGE="csv")
+    cli = [sys.executable, os.path.join(ROOT, "storage.py"), "compact"]
+    procs = []
+    for batch in range(10):
+        store.append_many([_row(batch * 10 + i) for i in range(10)])
+        procs.append(subprocess.Popen(cli, cwd=tmp_path, env=env, stdout=subprocess.DEVNULL))
+    for p in procs:
+        assert p.wait() == 0
+    store.compact()
+    assert len(store.load_all()) == 100
@@ -0,0 +1,60 @@
+import sqlite3
+
+import pandas as pd
+
+from cube import add_to_cube, cube_matches, ensure_cube, query_cube, rebuild_cube
+from storage import CsvStorage
+
+# --- 사전 집계 테이블 검증 ---
+
+
+def _log():
+    return pd.DataFrame(
+        {
+            "일시": ["2024-05-01 10:00:00", "2024-05-01 10:30:00", "2024-05-02 11:00:00"],
+            "성별": ["여성", None, "남성"],
+            "연령대": ["초등", "초등", float("nan")],
+            "이용목록": ["놀이", "놀이", "휴식"],
+        }
+    )
+
+
+def _cube(df=None, rows=None):
+    conn = sqlite3.connect(":memory:")
+    ensure_cube(conn)
+    if df is not None:
+        rebuild_cube(conn, df)
+    if rows is not None:
+        add_to_cube(conn, rows)
+    return query_cube(conn)
+
+
+def test_missing_values_same_cell():
+    # 체크인(dict의 None)과 재생성(DataFrame의 NaN)이 같은 칸이 되어야 한다
+    df = _log()
+    rows = df.astype(object).where(df.notna(), None).to_dict("records")
+    assert cube_matches(_cube(rows=rows), df)
+    assert cube_matches(_cube(df=df), df)
+    assert "nan" not in set(_cube(df=df)["연령대"])
+
+
+def test_mismatch_within_category():
+    # 합계는 같지만 한 행의 성별만 바뀐 경우
+    df = _log()
+    edited = df.copy()
+    edited.loc[0, "성별"] = "남성"
+    assert not cube_matches(_cube(df=df), edited)
+    assert not cube_matches(_cube(df=df), df.iloc[:0])
+    assert cube_matches(_cube(), df.iloc[:0])
+
+
+def test_csv_store_rebuild_from_frame(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = CsvStorage()
+    store.ensure()
+    store.append_many(_log().to_dict("records"))
+    df = store.load_all()
+    assert cube_matches(store.cube(), df)
+    df.loc[0, "이용목록"] = "휴식"
+    store.replace_all(df)
+    assert cube_matches(store.cube(), store.load_all())
@@ -0,0 +1,74 @@
+import re
+
+import pandas as pd
+import pytest
+
+from cube import cube_matches
+from log_cache import LogCache
+from schema import COLUMNS
+from storage import CONFLICT_MESSAGE, ArchiveStorage, CsvStorage, SqliteStorage, diff_frames
+
+# --- 관리자 편집 저장 (diff_frames → apply_changes) ---
+# app.py 편집 섹션과 같은 순서: 공유 캐시로 읽은 (로그, 데이터 버전) → 편집기 → 저장
+
+BACKENDS = {"csv": CsvStorage, "archive": ArchiveStorage, "sqlite": SqliteStorage}
+
+
+def _row(minute, gender="여성"):
+    return {"일시": f"2024-05-01 10:{minute:02d}:00", "요일": "수", "월": 5, "성별": gender, "연령대": "초등", "이용목록": "놀이"}
+
+
+@pytest.fixture(params=list(BACKENDS))
+def store(request, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    s = BACKENDS[request.param]()
+    s.ensure()
+    s.append_many([_row(i) for i in range(4)])
+    return s
+
+
+def _edit(df):
+    # 첫 행 성별 수정, 두 번째 행 삭제, 새 행 하나 + 값 없는 빈 행 하나 추가
+    before = df[COLUMNS]
+    after = before.drop(index=before.index[1])
+    after.loc[before.index[0], "성별"] = "남성"
+    new_id = int(before.index.max()) + 1
+    added = pd.DataFrame([{"일시": pd.Timestamp("2024-05-02 09:00:00"), "성별": "남성"}, {}], index=[new_id, new_id + 1])
+    return before, pd.concat([after, added])
+
+
+def test_diff_frames(store):
+    df, _ = LogCache().load_with_version(store)
+    before, after = _edit(df)
+    updates, deletes, inserts = diff_frames(before, after)
+    assert list(updates) == [int(before.index[0])]
+    assert updates[int(before.index[0])]["성별"] == "남성"
+    assert updates[int(before.index[0])]["일시"] == "2024-05-01 10:00:00"
+    assert deletes == [int(before.index[1])]
+    assert [r["일시"] for r in inserts] == ["2024-05-02 09:00:00"]
+
+
+def test_check_in_during_save(store):
+    # 편집기를 여는 사이에 들어온 체크인은 충돌이 아니고, 저장 뒤에도 그대로 남아야 한다
+    df, version = LogCache().load_with_version(store)
+    store.append_many([_row(30)])
+    store.apply_changes(version, *diff_frames(*_edit(df)))
+
+    out, _ = LogCache().load_with_version(store)
+    rows = sorted(zip(out["일시"].dt.strftime("%d %H:%M"), out["성별"].astype(str)))
+    assert rows == [("01 10:00", "남성"), ("01 10:02", "여성"), ("01 10:03", "여성"), ("01 10:30", "여성"), ("02 09:00", "남성")]
+    assert cube_matches(store.cube(), out)
+
+
+def test_conflicting_edits(store):
+    # 두 관리자가 같은 버전을 열고 차례로 저장하면 두 번째 저장은 거절된다 (먼저 저장한 편집을 덮어쓰지 않게)
+    df, version = LogCache().load_with_version(store)
+    first = df[COLUMNS].copy()
+    first.loc[first.index[2], "성별"] = "남성"
+    store.apply_changes(version, *diff_frames(df[COLUMNS], first))
+
+    with pytest.raises(RuntimeError, match=re.escape(CONFLICT_MESSAGE)):
+        store.apply_changes(version, *diff_frames(*_edit(df)))
+    out, _ = LogCache().load_with_version(store)
+    assert len(out) == 4
+    assert (out["성별"] == "남성").sum() == 1
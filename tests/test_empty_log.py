@@ -0,0 +1,38 @@
+import pandas as pd
+
+from analytics import date_features, derive_features
+from cube import excel_aggregates
+from log_cache import parse_log
+from schema import COLUMNS
+from storage import CsvStorage
+
+# --- 빈 로그 회귀 테스트 ---
+# 새로 설치해 visitor_log.csv가 비어 있을 때(날짜가 하나도 없을 때) 파생 컬럼/집계가 예외 없이 빈 결과를 내야 한다.
+
+
+def test_date_features_without_days():
+    feats = date_features(pd.DatetimeIndex([]))
+    assert feats.empty
+    assert list(feats.columns) == ["월-일", "연월", "ISO연도", "ISO주차", "연-주", "주(기간)"]
+
+
+def test_parse_empty_log():
+    df = parse_log(pd.DataFrame(columns=COLUMNS))
+    assert df.empty
+    assert "주(기간)" in df.columns
+
+
+def test_unparseable_timestamps():
+    # 일시를 하나도 읽지 못한 저널 조각
+    df = derive_features(pd.DataFrame({c: ["?"] for c in COLUMNS}))
+    assert len(df) == 1
+    assert pd.isna(df["날짜"].iloc[0]) and pd.isna(df["주(기간)"].iloc[0])
+
+
+def test_empty_csv_store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = CsvStorage()
+    store.ensure()
+    assert parse_log(store.load_all()).empty
+    aggregates = excel_aggregates(store.cube())
+    assert all(len(v) == 0 for v in aggregates.values())
@@ -0,0 +1,72 @@
+from datetime import date
+from itertools import product
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from filter_index import FilterIndex
+from log_cache import parse_log
+from schema import AGE_GROUPS, GENDERS, PURPOSES
+from storage import filter_frame
+from synth import generate
+
+# --- FilterIndex.select/frame 과 storage.filter_frame 이 같은 행을 고르는지 ---
+
+
+def _log(in_order: bool) -> pd.DataFrame:
+    raw = generate(3000, days=60, end=date(2024, 5, 31), seed=1)
+    if not in_order:
+        raw = raw.sample(frac=1, random_state=2)
+    raw = raw.reset_index(drop=True).astype(object)
+    # 일시를 알 수 없는 행, 빈 값, 목록에 없는 값(관리자 편집)도 섞는다
+    raw.loc[[5, 50], "일시"] = "?"
+    raw.loc[[7, 70], "성별"] = None
+    raw.loc[[9, 90], "이용목록"] = "산책"
+    raw.loc[[11], "연령대"] = None
+    return parse_log(raw)
+
+
+LOGS = {"sorted": _log(True), "shuffled": _log(False)}
+
+RANGES = [
+    (None, None),
+    (date(2024, 5, 1), None),
+    (None, date(2024, 4, 15)),
+    (date(2024, 4, 10), date(2024, 4, 10)),
+    (date(2024, 4, 20), date(2024, 5, 10)),
+    (date(2025, 1, 1), date(2025, 1, 31)),
+]
+SELECTIONS = [
+    {},
+    {"genders": GENDERS},
+    {"genders": ["여성"]},
+    {"ages": AGE_GROUPS[:2], "purposes": ["놀이", "식사"]},
+    {"genders": ["남성"], "ages": ["고등"], "purposes": PURPOSES},
+    {"purposes": PURPOSES},
+    {"purposes": ["산책"]},
+    {"purposes": PURPOSES + ["산책"]},
+    {"genders": []},
+]
+
+
+@pytest.mark.parametrize("order", list(LOGS))
+@pytest.mark.parametrize("start,end", RANGES)
+@pytest.mark.parametrize("selected", SELECTIONS, ids=range(len(SELECTIONS)))
+def test_select_matches_filter_frame(order, start, end, selected):
+    df = LOGS[order]
+    expected = filter_frame(df, start, end, **selected)
+    index = FilterIndex(df)
+    positions = index.select(start=start, end=end, **selected)
+    assert np.all(np.diff(positions) > 0)
+    assert df.index[positions].tolist() == expected.index.tolist()
+    assert index.frame(df, start=start, end=end, **selected).index.tolist() == expected.index.tolist()
+
+
+@pytest.mark.parametrize("start,end", [r for r in RANGES if r != (None, None)])
+def test_include_undated(start, end):
+    # 편집기: 날짜 조건이 있어도 일시를 알 수 없는 행을 함께 보여준다
+    df = LOGS["shuffled"]
+    undated = df.index[df["일시"].isna()].tolist()
+    expected = sorted(filter_frame(df, start, end).index.tolist() + undated)
+    assert FilterIndex(df).frame(df, start=start, end=end, include_undated=True).index.tolist() == expected
@@ -0,0 +1,35 @@
+import pandas as pd
+
+from schema import SITE_COLUMN
+from storage import ShardedStorage
+from synth import generate
+
+# --- 지점별 샤드 저장소: 전체 내보내기(iter_chunks)는 지점을 섞어 일시 순 ---
+
+
+def _store(tmp_path):
+    store = ShardedStorage(str(tmp_path / "sites"), "A")
+    for no, site in enumerate(["A", "B", "C"]):
+        rows = generate(500 + 300 * no, days=20, seed=no).to_dict("records")
+        if site == "B":
+            rows[10]["일시"] = "?"
+        local = ShardedStorage(store.root, site)
+        local.shard(site).ensure()
+        local.append_many(rows)
+    return store
+
+
+def test_iter_chunks_merged_by_time(tmp_path):
+    store = _store(tmp_path)
+    chunks = list(store.iter_chunks(chunk_rows=128))
+    assert all(0 < len(c) <= 128 for c in chunks)
+    out = pd.concat(chunks, ignore_index=True)
+
+    # snapshot(관리자 화면)과 같은 행, 같은 순서
+    expected = store.snapshot()[0]
+    assert len(out) == len(expected) == 500 + 800 + 1100
+    assert out["일시"].astype(str).tolist() == expected["일시"].astype(str).tolist()
+    assert out[SITE_COLUMN].astype(str).tolist() == expected[SITE_COLUMN].astype(str).tolist()
+    # 일시 없는 행은 맨 뒤
+    assert out["일시"].iloc[-1] == "?"
+    assert pd.to_datetime(out["일시"].iloc[:-1]).is_monotonic_increasing
@@ -0,0 +1,103 @@
+import logging
+import threading
+import time
+
+import pytest
+
+import write_queue
+from storage import CubeUpdateError
+from write_queue import WriteQueue
+
+# --- 체크인 쓰기 큐 ---
+# 저장소 대신 append_many 호출만 기록하는 가짜 저장소로 묶음/재시도/종료 동작을 본다.
+
+
+class FakeStore:
+    def __init__(self, error=None, gate=None):
+        self.batches = []
+        self.calls = 0
+        self.error = error
+        self.gate = gate
+
+    def append_many(self, rows):
+        self.calls += 1
+        if self.gate is not None:
+            self.gate.wait()
+        if self.error is not None:
+            raise self.error
+        self.batches.append(list(rows))
+
+
+def _row(i):
+    return {"일시": f"2024-05-01 10:00:{i:02d}", "성별": "여성"}
+
+
+@pytest.fixture(autouse=True)
+def fast_retry(monkeypatch):
+    monkeypatch.setattr(write_queue, "RETRY_SECONDS", 0.0)
+    monkeypatch.setattr(write_queue, "MAX_ATTEMPTS", 3)
+
+
+def test_group_commit():
+    store = FakeStore()
+    wq = WriteQueue(store, commit_ms=200, max_batch=4)
+    for i in range(10):
+        wq.submit(_row(i))
+    assert wq.flush(timeout=5)
+    # 한 묶음에 max_batch까지, 제출 순서 그대로
+    assert [len(b) for b in store.batches] == [4, 4, 2]
+    assert [r for b in store.batches for r in b] == [_row(i) for i in range(10)]
+    stats = wq.stats()
+    assert (stats["submitted"], stats["committed"], stats["commits"], stats["failed"]) == (10, 10, 3, 0)
+    wq.close()
+
+
+def test_flush_waits_for_commit():
+    gate = threading.Event()
+    store = FakeStore(gate=gate)
+    wq = WriteQueue(store, commit_ms=0)
+    wq.submit(_row(0))
+    assert not wq.flush(timeout=0.2)
+    gate.set()
+    assert wq.flush(timeout=5)
+    assert store.batches == [[_row(0)]]
+    wq.close()
+
+
+def test_drop_after_max_attempts(caplog):
+    store = FakeStore(error=OSError("disk full"))
+    wq = WriteQueue(store, commit_ms=0)
+    with caplog.at_level(logging.ERROR, logger="visitor.write_queue"):
+        wq.submit(_row(7))
+        assert wq.flush(timeout=5)
+    stats = wq.stats()
+    assert store.calls == 3
+    assert (stats["committed"], stats["failed"], stats["errors"]) == (0, 1, 3)
+    assert "OSError: disk full" == stats["last_error"]
+    # 버린 행은 복구할 수 있게 로그에 남는다
+    assert "2024-05-01 10:00:07" in caplog.text
+    wq.close()
+
+
+def test_cube_error_not_retried():
+    # 로그에는 기록됐다 → 다시 쓰면 중복 체크인
+    store = FakeStore(error=CubeUpdateError("cube locked"))
+    wq = WriteQueue(store, commit_ms=0)
+    wq.submit(_row(1))
+    assert wq.flush(timeout=5)
+    stats = wq.stats()
+    assert store.calls == 1
+    assert (stats["committed"], stats["failed"], stats["errors"]) == (1, 0, 1)
+    wq.close()
+
+
+def test_close_with_full_queue():
+    gate = threading.Event()
+    wq = WriteQueue(FakeStore(gate=gate), commit_ms=0, max_pending=1)
+    wq.submit(_row(0))
+    time.sleep(0.1)  # 기록 스레드가 첫 건을 꺼내 저장소에서 멈춘다
+    wq.submit(_row(1))
+    t0 = time.monotonic()
+    wq.close(timeout=0.3)
+    assert time.monotonic() - t0 < 2
+    gate.set()
@@ -0,0 +1,198 @@
+import cProfile
+import io
+import json
+import logging
+import marshal
+import os
+import pstats
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Iterator, MutableMapping
+
+# --- 재실행 구간별 계측 ---
+# app.py 한 번의 재실행을 이름 붙인 구간(로그 로드 / 편집기 / 집계 / 그래프 …)으로 나눠 경과 시간과 행 수를 잰다.
+# 재실행 밖에서 도는 작업(엑셀 생성, 체크인 기록)은 이벤트로 따로 잰다.
+# 기록마다 JSON 한 줄을 visitor.timing 로거로 남기고(VISITOR_TIMING_LOG=0 이면 끔),
+# 최근 기록은 프로세스 안에 보관해 사이드바 진단 패널에서 보여준다.
+LOG_ENABLED = os.environ.get("VISITOR_TIMING_LOG", "1") != "0"
+HISTORY = 200
+PROFILE_LINES = 40
+
+logger = logging.getLogger("visitor.timing")
+if LOG_ENABLED and not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_TIMER_KEY = "_rerun_timer"
+
+
+class RerunTimer:
+    def __init__(self, page: str, profile: bool = False):
+        self.page = page
+        self.started_at = datetime.now()
+        self._t0 = self._last = time.perf_counter()
+        self.sections: List[Dict[str, Any]] = []
+        self.finished = False
+        self.profiler: Optional[cProfile.Profile] = None
+        if profile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def lap(self, name: str, rows: Optional[int] = None) -> None:
+        # 직전 lap 이후 걸린 시간을 name 구간으로 기록 (스크립트를 위에서 아래로 따라가며 찍는다)
+        now = time.perf_counter()
+        self.sections.append({"name": name, "ms": (now - self._last) * 1000, "rows": rows})
+        self._last = now
+
+    def record(self, interrupted: bool) -> Dict[str, Any]:
+        # st.rerun()/st.stop()으로 중간에 끝난 재실행은 마지막 lap까지만 센다
+        end = self._last if interrupted else time.perf_counter()
+        return {
+            "event": "rerun",
+            "ts": self.started_at.isoformat(timespec="milliseconds"),
+            "page": self.page,
+            "total_ms": round((end - self._t0) * 1000, 2),
+            "interrupted": interrupted,
+            "sections": [dict(s, ms=round(s["ms"], 2)) for s in self.sections],
+        }
+
+
+class TimingRecorder:
+    def __init__(self, history: int = HISTORY):
+        self._lock = threading.Lock()
+        self.reruns: "deque[Dict[str, Any]]" = deque(maxlen=history)
+        self.events: "deque[Dict[str, Any]]" = deque(maxlen=history)
+
+    def start(self, state: MutableMapping, page: str, profile: bool = False) -> RerunTimer:
+        # 세션의 이전 재실행이 st.rerun() 등으로 끝까지 못 갔으면 여기서 마무리한다
+        if _TIMER_KEY in state:
+            self.finish(state, interrupted=True)
+        timer = RerunTimer(page, profile)
+        state[_TIMER_KEY] = timer
+        return timer
+
+    def finish(self, state: MutableMapping, interrupted: bool = False) -> Optional[Dict[str, Any]]:
+        timer: Optional[RerunTimer] = state.get(_TIMER_KEY)
+        if timer is None or timer.finished:
+            return None
+        timer.finished = True
+        record = timer.record(interrupted)
+        if timer.profiler is not None:
+            timer.profiler.disable()
+            state["profile_report"] = profile_report(timer.profiler, record)
+        with self._lock:
+            self.reruns.append(record)
+        _emit(record)
+        return record
+
+    @contextmanager
+    def fragment(self, state: MutableMapping, page: str) -> Iterator[RerunTimer]:
+        # st.fragment 구간: 전체 재실행 중이면 그 타이머에 이어서 lap을 찍고,
+        # 조각만 다시 돌 때(위젯 변경)는 page(예: "admin/trend") 이름의 재실행 기록을 따로 남긴다
+        timer: Optional[RerunTimer] = state.get(_TIMER_KEY)
+        if timer is not None and not timer.finished:
+            yield timer
+            return
+        timer = self.start(state, page)
+        done = False
+        try:
+            yield timer
+            done = True
+        finally:
+            self.finish(state, interrupted=not done)
+
+    def add_event(self, name: str, ms: float, rows: Optional[int] = None, **extra) -> None:
+        record = {
+            "event": name,
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "ms": round(ms, 2),
+            "rows": rows,
+            **extra,
+        }
+        with self._lock:
+            self.events.append(record)
+        _emit(record)
+
+    @contextmanager
+    def event(self, name: str, **extra) -> Iterator[Dict[str, Any]]:
+        # with recorder.event("xlsx_report") as ev: ... ev["rows"] = n
+        info: Dict[str, Any] = {"rows": None, **extra}
+        t0 = time.perf_counter()
+        try:
+            yield info
+        finally:
+            self.add_event(name, (time.perf_counter() - t0) * 1000, **info)
+
+    def section_stats(self) -> List[Dict[str, Any]]:
+        # 최근 재실행 구간 + 이벤트를 이름별로: 횟수 / 중앙값 / 최대 / 마지막 행 수
+        with self._lock:
+            samples = [(s["name"], s["ms"], s["rows"]) for r in self.reruns for s in r["sections"]]
+            samples += [(e["event"], e["ms"], e["rows"]) for e in self.events]
+        by_name: Dict[str, List[tuple]] = {}
+        for name, ms, rows in samples:
+            by_name.setdefault(name, []).append((ms, rows))
+        return [
+            {
+                "구간": name,
+                "횟수": len(values),
+                "중앙값(ms)": round(statistics.median(ms for ms, _ in values), 1),
+                "최대(ms)": round(max(ms for ms, _ in values), 1),
+                "행 수": values[-1][1],
+            }
+            for name, values in by_name.items()
+        ]
+
+    def page_stats(self) -> List[Dict[str, Any]]:
+        # 페이지별 재실행 전체 시간: 전체 재실행("admin")과 조각만 다시 돈 재실행("admin/trend" …)을 나란히 비교
+        with self._lock:
+            samples = [(r["page"], r["total_ms"]) for r in self.reruns if not r["interrupted"]]
+        by_page: Dict[str, List[float]] = {}
+        for page, ms in samples:
+            by_page.setdefault(page, []).append(ms)
+        return [
+            {
+                "페이지": page,
+                "횟수": len(values),
+                "중앙값(ms)": round(statistics.median(values), 1),
+                "최대(ms)": round(max(values), 1),
+            }
+            for page, values in sorted(by_page.items())
+        ]
+
+
+def profile_report(profiler: cProfile.Profile, record: Dict[str, Any]) -> Dict[str, Any]:
+    # 누적 시간 상위 PROFILE_LINES개 텍스트 + .prof 파일(snakeviz 등에서 열 수 있는 pstats 형식)
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(PROFILE_LINES)
+    profiler.create_stats()
+    return {
+        "page": record["page"],
+        "ts": record["ts"],
+        "total_ms": record["total_ms"],
+        "text": text.getvalue(),
+        "prof": marshal.dumps(profiler.stats),
+    }
+
+
+def quiet_by_default() -> None:
+    # 벤치마크/부하 테스트용: 체크인 단계마다 쏟아지는 계측 로그를 끈다 (VISITOR_TIMING_LOG를 직접 주면 그 값대로).
+    # 이미 불러온 이 모듈에도, 환경 변수를 물려받는 하위 프로세스(키오스크/측정 프로세스)에도 적용된다
+    global LOG_ENABLED
+    os.environ.setdefault("VISITOR_TIMING_LOG", "0")
+    LOG_ENABLED = os.environ["VISITOR_TIMING_LOG"] != "0"
+
+
+def _emit(record: Dict[str, Any]) -> None:
+    if LOG_ENABLED:
+        logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+# 프로세스 공유 (모든 세션의 기록이 진단 패널에 모인다)
+recorder = TimingRecorder()
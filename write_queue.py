@@ -0,0 +1,196 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Optional, Dict, Any, List
+
+from storage import CubeUpdateError, VisitorStorage
+from timing import recorder
+
+# --- 체크인 쓰기 큐 (단일 기록 스레드 + 그룹 커밋) ---
+# 키오스크 세션은 큐에 넣기만 하고 바로 돌아간다. 기록 스레드 하나가 COMMIT_MS 동안 모인 체크인을
+# store.append_many() 한 번(저널 write+fsync 1회 / SQLite 트랜잭션 1회)으로 기록한다.
+# 큐가 가득 차면 submit()이 최대 SUBMIT_TIMEOUT초까지 기다리고(백프레셔), 그래도 자리가 없으면 queue.Full.
+COMMIT_MS = int(os.environ.get("VISITOR_COMMIT_MS", "50"))
+MAX_BATCH = int(os.environ.get("VISITOR_COMMIT_BATCH", "500"))
+MAX_PENDING = int(os.environ.get("VISITOR_QUEUE_MAX", "1000"))
+SUBMIT_TIMEOUT = 2.0
+RETRY_SECONDS = 0.5
+# 같은 묶음을 이만큼 실패하면 포기하고(로그에 행을 남긴다) 다음 묶음으로 넘어간다 → 큐가 멈추지 않는다
+MAX_ATTEMPTS = int(os.environ.get("VISITOR_COMMIT_ATTEMPTS", "10"))
+
+logger = logging.getLogger("visitor.write_queue")
+
+
+class WriteQueue:
+    def __init__(
+        self,
+        store: VisitorStorage,
+        commit_ms: int = COMMIT_MS,
+        max_batch: int = MAX_BATCH,
+        max_pending: int = MAX_PENDING,
+    ):
+        self.store = store
+        self.commit_ms = commit_ms
+        self.max_batch = max_batch
+        # (제출 시각, 행). None은 종료 신호
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._in_flight = 0
+        self.submitted = 0
+        self.committed = 0
+        self.commits = 0
+        self.rejected = 0
+        self.errors = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+        self.last_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+        self._latency_total_ms = 0.0
+        self._thread = threading.Thread(target=self._run, name="visitor-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, row: Dict[str, Any], timeout: float = SUBMIT_TIMEOUT) -> None:
+        with self._lock:
+            self._in_flight += 1
+        try:
+            self._queue.put((time.monotonic(), row), timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self._in_flight -= 1
+                self.rejected += 1
+            raise
+        with self._lock:
+            self.submitted += 1
+
+    def _next_batch(self) -> List[tuple]:
+        # 첫 건이 오면 commit_ms 동안(또는 max_batch까지) 더 모은다
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.commit_ms / 1000
+        while batch[-1] is not None and len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is None
+            items = [item for item in batch if item is not None]
+            t0 = time.perf_counter()
+            written = self._commit(items) if items else True
+            now = time.monotonic()
+            if items and written:
+                # 기록 1회(묶음) 시간 + 제출~기록 완료 지연(가장 오래 기다린 체크인 기준)
+                recorder.add_event(
+                    "checkin_commit",
+                    (time.perf_counter() - t0) * 1000,
+                    rows=len(items),
+                    latency_ms=round((now - items[0][0]) * 1000, 2),
+                )
+            with self._lock:
+                if items and written:
+                    for submitted_at, _ in items:
+                        latency = (now - submitted_at) * 1000
+                        self._latency_total_ms += latency
+                        self.max_latency_ms = max(self.max_latency_ms, latency)
+                        self.last_latency_ms = latency
+                    self.commits += 1
+                    self.committed += len(items)
+                elif items:
+                    self.failed += len(items)
+                self._in_flight -= len(items)
+                self._idle.notify_all()
+            if stop:
+                return
+
+    def _commit(self, items: List[tuple]) -> bool:
+        # 묶음 하나 기록. 반환값: 로그에 기록됐는지 (MAX_ATTEMPTS번 모두 실패하면 False)
+        rows = [row for _, row in items]
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                self.store.append_many(rows)
+                return True
+            except CubeUpdateError as e:
+                # 로그는 이미 기록됐다 → 다시 쓰면 같은 체크인이 중복된다. 오류만 남긴다
+                self._note_error(e)
+                return True
+            except Exception as e:
+                self._note_error(e)
+                if attempt < MAX_ATTEMPTS:
+                    time.sleep(RETRY_SECONDS)
+        # 버린 체크인은 복구할 수 있게 행 그대로 남긴다
+        logger.error(
+            "체크인 %d건 기록 실패(%d회 시도): %s",
+            len(rows),
+            MAX_ATTEMPTS,
+            json.dumps(rows, ensure_ascii=False, default=str),
+        )
+        recorder.add_event("checkin_failed", 0.0, rows=len(rows), error=self.last_error)
+        return False
+
+    def _note_error(self, e: Exception) -> None:
+        with self._lock:
+            self.errors += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        # 지금까지 제출된 체크인이 모두 기록될 때까지 기다린다. 반환값: 다 기록됐는지
+        with self._lock:
+            return self._idle.wait_for(lambda: self._in_flight == 0, timeout=timeout)
+
+    def close(self, timeout: float = 10.0) -> None:
+        # 남은 체크인을 기록하고 기록 스레드를 끝낸다 (프로세스 종료 시 atexit)
+        if not self._thread.is_alive():
+            return
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            # 기록 스레드가 저장소 장애로 재시도 중이라 큐가 비지 않는다 → 종료 신호 없이 남은 시간만 기다린다
+            # (데몬 스레드라 프로세스 종료를 막지 않는다)
+            logger.warning("종료 신호를 넣지 못했습니다(큐 가득 참, %d건 대기)", self._queue.qsize())
+        self._thread.join(max(0.0, deadline - time.monotonic()))
+        if self._thread.is_alive():
+            logger.error("종료 시간 초과: 체크인 %d건을 기록하지 못했습니다", self._queue.qsize())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "depth": self._queue.qsize(),
+                "submitted": self.submitted,
+                "committed": self.committed,
+                "commits": self.commits,
+                "rejected": self.rejected,
+                "errors": self.errors,
+                "failed": self.failed,
+                "last_error": self.last_error,
+                "avg_batch": self.committed / self.commits if self.commits else 0.0,
+                "last_latency_ms": self.last_latency_ms,
+                "avg_latency_ms": self._latency_total_ms / self.committed if self.committed else 0.0,
+                "max_latency_ms": self.max_latency_ms,
+            }
+
+
+_QUEUES: Dict[int, WriteQueue] = {}
+_QUEUES_LOCK = threading.Lock()
+
+
+def get_write_queue(store: VisitorStorage) -> WriteQueue:
+    # 저장소당 기록 스레드 하나 (프로세스 전체 공유)
+    with _QUEUES_LOCK:
+        wq = _QUEUES.get(id(store))
+        if wq is None:
+            wq = WriteQueue(store)
+            _QUEUES[id(store)] = wq
+            atexit.register(wq.close)
+        return wq